@@ -0,0 +1,129 @@
+import os
+import socket
+import asyncio
+
+from datetime import timedelta
+from config.settings import logger, BACKFILL_CONFIG
+from core.metrics import metrics
+from core.sql import (
+    CREATE_BACKFILL_TABLE, ENQUEUE_BACKFILL, FAIL_EXPIRED_BACKFILL, CLAIM_BACKFILL,
+    HEARTBEAT_BACKFILL, COMPLETE_BACKFILL, FAIL_BACKFILL, BACKFILL_PROGRESS
+)
+
+
+class LeaseLost(Exception):
+    """Аренду элемента забрал другой воркер"""
+
+
+def split_date_range(start_date, end_date, days):
+    """Делит [start_date, end_date] на диапазоны не длиннее days дней, от новых к старым"""
+    ranges = []
+    while end_date >= start_date:
+        range_start = max(start_date, end_date - timedelta(days=days - 1))
+        ranges.append((range_start, end_date))
+        end_date = range_start - timedelta(days=1)
+    return ranges
+
+
+class AsyncBackfillQueue:
+    """Очередь догрузки истории в PostgreSQL.
+
+    Элементы - диапазоны дат; воркер берет элемент в аренду через
+    SELECT ... FOR UPDATE SKIP LOCKED, продлевает ее, пока обрабатывает
+    элемент, а аренду остановившегося воркера забирает другой.
+    """
+
+    def __init__(self, db, config=None):
+        self.db = db
+        self.config = config or BACKFILL_CONFIG
+        self.worker_id = self.config.get('worker_id') or f"{socket.gethostname()}-{os.getpid()}"
+        self.logger = logger.getChild('AsyncBackfillQueue')
+
+    async def create_table(self):
+        """Создает таблицу очереди если она не существует"""
+        async with self.db.acquire() as conn:
+            await conn.execute(CREATE_BACKFILL_TABLE)
+
+    async def enqueue(self, start_date, end_date):
+        """Ставит диапазон в очередь; уже поставленные элементы не дублируются"""
+        ranges = split_date_range(start_date, end_date, self.config['item_days'])
+        async with self.db.acquire() as conn:
+            await conn.execute(ENQUEUE_BACKFILL, [r[0] for r in ranges], [r[1] for r in ranges])
+        self.logger.info(f"Диапазон {start_date} - {end_date} в очереди: элементов {len(ranges)}")
+        return len(ranges)
+
+    async def claim(self):
+        """Берет в аренду следующий элемент, возвращает dict или None, если свободных нет"""
+        async with self.db.acquire() as conn:
+            await conn.execute(FAIL_EXPIRED_BACKFILL, self.config['lease_timeout'], self.config['max_attempts'])
+            row = await conn.fetchrow(CLAIM_BACKFILL, self.worker_id, self.config['lease_timeout'])
+        return dict(row) if row else None
+
+    async def heartbeat(self, item_id):
+        """Продлевает аренду, возвращает False, если ее уже забрал другой воркер"""
+        async with self.db.acquire() as conn:
+            return await conn.fetchval(HEARTBEAT_BACKFILL, item_id, self.worker_id) is not None
+
+    async def complete(self, item_id, files, rows):
+        async with self.db.acquire() as conn:
+            await conn.execute(COMPLETE_BACKFILL, item_id, self.worker_id, files, rows)
+
+    async def fail(self, item_id, error):
+        async with self.db.acquire() as conn:
+            await conn.execute(FAIL_BACKFILL, item_id, self.worker_id, error, self.config['max_attempts'])
+
+    async def progress(self):
+        """Число элементов по статусам"""
+        async with self.db.acquire() as conn:
+            return {status: count for status, count in await conn.fetch(BACKFILL_PROGRESS)}
+
+    async def hold(self, item, work):
+        """Выполняет work, продлевая аренду; при потере аренды отменяет работу и бросает LeaseLost"""
+        task = asyncio.ensure_future(work)
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=self.config['heartbeat_interval'])
+                if done:
+                    return task.result()
+                if not await self.heartbeat(item['id']):
+                    raise LeaseLost(f"Аренда элемента {item['id']} потеряна")
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+    async def run(self, process):
+        """Обрабатывает элементы, пока очередь не опустеет.
+
+        process(start_date, end_date) возвращает сводку с числом файлов
+        'loaded' и строк 'rows' или бросает исключение, и тогда элемент
+        возвращается в очередь.
+        """
+        stats = {'done': 0, 'failed': 0, 'lost': 0}
+        while True:
+            item = await self.claim()
+            if item is None:
+                if not (await self.progress()).get('running'):
+                    return stats
+                # Свободных нет, но чужие элементы еще в работе: ждем их или истечения аренды
+                await asyncio.sleep(self.config['heartbeat_interval'])
+                continue
+
+            self.logger.info(f"Элемент {item['id']}: {item['start_date']} - {item['end_date']}, "
+                             f"попытка {item['attempts']}")
+            try:
+                summary = await self.hold(item, process(item['start_date'], item['end_date']))
+            except LeaseLost as e:
+                self.logger.warning(str(e))
+                stats['lost'] += 1
+                continue
+            except Exception as e:
+                self.logger.error(f"Ошибка элемента {item['id']}: {e}", exc_info=True)
+                await self.fail(item['id'], str(e))
+                stats['failed'] += 1
+                metrics.inc('spimex_backfill_items_total', result='failed')
+                continue
+
+            await self.complete(item['id'], summary['loaded'], summary['rows'])
+            stats['done'] += 1
+            metrics.inc('spimex_backfill_items_total', result='done')
@@ -0,0 +1,107 @@
+import time
+import signal
+import asyncio
+
+from datetime import datetime, timedelta, timezone
+from config.settings import logger, DAEMON_CONFIG
+from core.metrics import metrics
+
+
+def next_poll_at(now, last_trade_date, config):
+    """Время следующей проверки листинга.
+
+    После публикации, пока бюллетень дня не загружен, проверка идет каждые
+    poll_interval секунд в течение poll_window; в остальное время - раз в
+    idle_interval, но не позже следующей публикации.
+    """
+    hours, minutes = map(int, config['publish_time'].split(':'))
+    publish = now.replace(hour=hours, minute=minutes, second=0, microsecond=0)
+    window_end = publish + timedelta(seconds=config['poll_window'])
+    if last_trade_date != now.date() and publish <= now < window_end:
+        return now + timedelta(seconds=config['poll_interval'])
+
+    next_publish = publish if now < publish else publish + timedelta(days=1)
+    return min(next_publish, now + timedelta(seconds=config['idle_interval']))
+
+
+class AsyncIngestDaemon:
+    """Служба загрузки новых бюллетеней.
+
+    Вызывает poll() по расписанию публикаций биржи, пока не получит SIGTERM
+    или SIGINT; текущая проверка при остановке доводится до конца. poll
+    возвращает дату торгов последнего загруженного бюллетеня.
+    """
+
+    def __init__(self, poll, config=None):
+        self.poll = poll
+        self.config = config or DAEMON_CONFIG
+        self.tz = timezone(timedelta(hours=self.config['utc_offset_hours']))
+        self.logger = logger.getChild('AsyncIngestDaemon')
+        self.state = {
+            'status': 'starting',
+            'started_at': datetime.now(self.tz),
+            'polls': 0,
+            'failures': 0,
+            'last_poll_at': None,
+            'last_success_at': None,
+            'last_trade_date': None,
+            'next_poll_at': None,
+            'last_error': None,
+        }
+        self._stopping = None
+
+    def health(self):
+        """Состояние службы для /health"""
+        state = dict(self.state)
+        if state['status'] == 'running' and state['failures'] >= self.config['max_failures']:
+            state['status'] = 'degraded'
+        elif state['status'] == 'running':
+            state['status'] = 'ok'
+        return state
+
+    def stop(self):
+        """Запрашивает остановку после текущей проверки"""
+        if self._stopping is not None and not self._stopping.is_set():
+            self.logger.info("Получен сигнал остановки, завершаем после текущей проверки")
+            self.state['status'] = 'stopping'
+            self._stopping.set()
+
+    async def poll_once(self):
+        """Одна проверка листинга; ошибка не останавливает службу"""
+        self.state['last_poll_at'] = datetime.now(self.tz)
+        self.state['polls'] += 1
+        try:
+            last_trade_date = await self.poll()
+        except Exception as e:
+            self.logger.error(f"Ошибка проверки листинга: {e}", exc_info=True)
+            self.state['failures'] += 1
+            self.state['last_error'] = str(e)
+            metrics.inc('spimex_daemon_polls_total', result='failed')
+            return
+        self.state.update(failures=0, last_error=None, last_success_at=datetime.now(self.tz),
+                          last_trade_date=last_trade_date)
+        metrics.inc('spimex_daemon_polls_total', result='ok')
+        metrics.set_gauge('spimex_daemon_last_success_timestamp', time.time())
+
+    async def run(self):
+        """Работает до сигнала остановки"""
+        self._stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self.stop)
+        self.state['status'] = 'running'
+        try:
+            while not self._stopping.is_set():
+                await self.poll_once()
+                now = datetime.now(self.tz)
+                self.state['next_poll_at'] = next_poll_at(now, self.state['last_trade_date'], self.config)
+                delay = (self.state['next_poll_at'] - now).total_seconds()
+                self.logger.debug(f"Следующая проверка: {self.state['next_poll_at']}")
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                loop.remove_signal_handler(sig)
+            self.state['status'] = 'stopped'
@@ -1,19 +1,78 @@
+import time
 import asyncpg
-from config.settings import logger, ASYNC_DB_CONFIG
 
+from contextlib import asynccontextmanager
+from config.settings import logger, ASYNC_DB_CONFIG, DB_LOAD_CONFIG, DB_SCHEMA_CONFIG, DB_POOL_CONFIG
+from core.metrics import metrics, Histogram
+from core.sql import (
+    TRADING_RESULTS_COLUMNS, STAGING_TABLE, CREATE_STAGING_TABLE, MERGE_FROM_STAGING,
+    UPSERT_ROW, COUNT_CHANGES_BY_KEYS, change_counts, latest_rows,
+    TABLE_EXISTS, TABLE_IS_PARTITIONED, CREATE_PARTITIONED_TABLE, partition_months, create_partition,
+    FACTS_TABLE, FACTS_TABLE_EXISTS, CREATE_NORMALIZED_SCHEMA, SELECT_PRODUCTS, SELECT_DELIVERY_BASES,
+    INTERN_PRODUCTS, INTERN_DELIVERY_BASES, UPSERT_FACTS
+)
+from core.dimensions import DimensionCache
 
 
 class AsyncDatabaseManager:
-    def __init__(self, config=None):
+    def __init__(self, config=None, load_config=None, schema_config=None, pool_config=None):
         self.config = config or ASYNC_DB_CONFIG
+        self.load_config = load_config or DB_LOAD_CONFIG
+        self.schema_config = schema_config or DB_SCHEMA_CONFIG
+        self.pool_config = pool_config or DB_POOL_CONFIG
+        self.pool_waits = Histogram()
+        self._partitions = set()
+        self.dimensions = DimensionCache()
+        self.changes = {'inserted': 0, 'updated': 0, 'unchanged': 0}
         self.pool = None
+        self._transaction_conn = None
         self.logger = logger.getChild('AsyncDatabaseManager')
 
     async def connect(self):
         """Устанавливает соединение с базой данных"""
-        self.pool = await asyncpg.create_pool(**self.config)
+        self.pool = await asyncpg.create_pool(
+            **self.config,
+            min_size=self.pool_config['min_size'],
+            max_size=self.pool_config['max_size'],
+            max_inactive_connection_lifetime=self.pool_config['max_inactive_lifetime'],
+            statement_cache_size=self.pool_config['statement_cache_size'],
+            command_timeout=self.pool_config['command_timeout'] or None
+        )
         return self
 
+    @asynccontextmanager
+    async def acquire(self):
+        """Выдает соединение из пула, замеряя ожидание свободного соединения"""
+        if self._transaction_conn is not None:
+            yield self._transaction_conn
+            return
+        start_time = time.perf_counter()
+        async with self.pool.acquire() as conn:
+            waited = time.perf_counter() - start_time
+            self.pool_waits.observe(waited)
+            metrics.observe('spimex_db_pool_wait_seconds', waited, manager='async')
+            yield conn
+
+    @asynccontextmanager
+    async def transaction(self):
+        """Выполняет очистку таблицы и загрузку пачек одной транзакцией на одном соединении.
+
+        Операции внутри должны идти последовательно; транзакции отдельных
+        пачек становятся точками сохранения.
+        """
+        async with self.acquire() as conn:
+            try:
+                async with conn.transaction():
+                    self._transaction_conn = conn
+                    yield self
+            except BaseException:
+                # Секции и ключи справочников из откаченной транзакции недействительны
+                self._partitions = set()
+                self.dimensions = DimensionCache()
+                raise
+            finally:
+                self._transaction_conn = None
+
     async def close(self):
         """Закрывает соединение с базой данных"""
         if self.pool:
@@ -21,15 +80,20 @@ class AsyncDatabaseManager:
 
     async def create_table(self):
         """Создает таблицу если она не существует"""
-        async with self.pool.acquire() as conn:
-            table_exists = await conn.fetchval("""
-                SELECT EXISTS (
-                    SELECT 1 FROM information_schema.tables
-                    WHERE table_name = 'spimex_trading_results'
-                );
-            """)
-
-            if not table_exists:
+        async with self.acquire() as conn:
+            if self.schema_config.get('layout') == 'normalized':
+                await self._create_normalized_schema(conn)
+                return
+            table_exists = await conn.fetchval(TABLE_EXISTS)
+
+            if table_exists:
+                if self.schema_config.get('layout') == 'partitioned' and not await conn.fetchval(TABLE_IS_PARTITIONED):
+                    raise RuntimeError(
+                        "Таблица spimex_trading_results не секционирована, перенесите ее: main.py --migrate-to-partitioned")
+                return
+            if self.schema_config.get('layout') == 'partitioned':
+                await conn.execute(CREATE_PARTITIONED_TABLE)
+            else:
                 await conn.execute("""
                     CREATE TABLE spimex_trading_results (
                         id SERIAL PRIMARY KEY,
@@ -55,25 +119,111 @@ class AsyncDatabaseManager:
                     CREATE INDEX idx_spimex_product_id ON spimex_trading_results (exchange_product_id);
                 """)
 
+    async def _create_normalized_schema(self, conn):
+        """Создает справочники, таблицу фактов и представление spimex_trading_results"""
+        if await conn.fetchval(FACTS_TABLE_EXISTS):
+            return
+        if await conn.fetchval(TABLE_EXISTS):
+            raise RuntimeError(
+                "Таблица spimex_trading_results уже существует, перенесите ее: main.py --migrate-to-normalized")
+        await conn.execute(CREATE_NORMALIZED_SCHEMA)
+
+    async def ensure_partitions(self, data):
+        """Создает недостающие месячные секции для вставляемых строк"""
+        months = partition_months(data) - self._partitions
+        if not months:
+            return
+        async with self.acquire() as conn:
+            for month in sorted(months):
+                async with conn.transaction():
+                    await conn.execute(create_partition(month))
+                self._partitions.add(month)
+
+    async def truncate_table(self):
+        """Очищает таблицу перед полной пересборкой"""
+        async with self.acquire() as conn:
+            table = FACTS_TABLE if self.schema_config.get('layout') == 'normalized' else 'spimex_trading_results'
+            await conn.execute(f"TRUNCATE TABLE {table} RESTART IDENTITY")
+
     async def insert_data(self, data):
-        """Вставляет данные в таблицу"""
-        query = """
-            INSERT INTO spimex_trading_results (
-                exchange_product_id, exchange_product_name, oil_id, 
-                delivery_basis_id, delivery_basis_name, delivery_type_id,
-                volume, total, count, date
-            ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
-            ON CONFLICT (exchange_product_id, date) 
-            DO UPDATE SET
-                exchange_product_name = EXCLUDED.exchange_product_name,
-                oil_id = EXCLUDED.oil_id,
-                delivery_basis_id = EXCLUDED.delivery_basis_id,
-                delivery_basis_name = EXCLUDED.delivery_basis_name,
-                delivery_type_id = EXCLUDED.delivery_type_id,
-                volume = EXCLUDED.volume,
-                total = EXCLUDED.total,
-                count = EXCLUDED.count,
-                updated_on = CURRENT_TIMESTAMP
+        """Вставляет данные в таблицу выбранным в конфигурации способом.
+
+        Возвращает число вставленных, обновленных и не изменившихся строк.
         """
-        async with self.pool.acquire() as conn:
-            await conn.executemany(query, data)
\ No newline at end of file
+        data = latest_rows(data)
+        start_time = time.perf_counter()
+        if self.schema_config.get('layout') == 'partitioned':
+            await self.ensure_partitions(data)
+        mode = self.load_config.get('insert_mode', 'executemany')
+        if self.schema_config.get('layout') == 'normalized':
+            mode = 'normalized'
+            counts = await self.upsert_normalized(data)
+        elif mode == 'copy':
+            counts = await self.copy_data(data)
+        else:
+            counts = await self.upsert_data(data)
+        elapsed = time.perf_counter() - start_time
+        metrics.inc('spimex_rows_upserted_total', len(data), manager='async', mode=mode)
+        metrics.observe('spimex_insert_seconds', elapsed, manager='async', mode=mode)
+        metrics.set_gauge('spimex_db_pool_connections', self.pool.get_size(), manager='async', state='open')
+        metrics.set_gauge('spimex_db_pool_connections', self.pool.get_size() - self.pool.get_idle_size(),
+                          manager='async', state='busy')
+        self._record_changes(counts)
+        self._log_throughput(len(data), elapsed)
+        return counts
+
+    async def upsert_data(self, data):
+        """Построчный upsert через executemany"""
+        async with self.acquire() as conn:
+            async with conn.transaction():
+                await conn.executemany(UPSERT_ROW, data)
+                inserted, updated = await conn.fetchrow(
+                    COUNT_CHANGES_BY_KEYS, [row[0] for row in data], [row[9] for row in data])
+        return change_counts(data, inserted, updated)
+
+    async def upsert_normalized(self, data):
+        """Пополняет справочники новыми строками и загружает факты одним upsert по массивам"""
+        async with self.acquire() as conn:
+            if not self.dimensions.loaded:
+                products = await conn.fetch(SELECT_PRODUCTS)
+                self.dimensions.load(map(tuple, products), map(tuple, await conn.fetch(SELECT_DELIVERY_BASES)))
+
+            # Ключи из откаченной транзакции в кеш не попадают
+            async with conn.transaction():
+                products, bases = self.dimensions.missing(data)
+                new_products, new_bases = [], []
+                if products:
+                    rows = await conn.fetch(INTERN_PRODUCTS, *[list(column) for column in zip(*products)])
+                    new_products = list(map(tuple, rows))
+                if bases:
+                    new_bases = list(map(tuple, await conn.fetch(INTERN_DELIVERY_BASES, bases)))
+                facts = self.dimensions.to_facts(
+                    data, DimensionCache.product_keys(new_products), DimensionCache.base_keys(new_bases))
+                inserted, updated = await conn.fetchrow(UPSERT_FACTS, *facts)
+        self.dimensions.add_products(new_products)
+        self.dimensions.add_bases(new_bases)
+        return change_counts(data, inserted, updated)
+
+    async def copy_data(self, data):
+        """Загружает данные через COPY во временную таблицу и merge в основную"""
+        async with self.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(CREATE_STAGING_TABLE)
+                await conn.copy_records_to_table(
+                    STAGING_TABLE,
+                    records=data,
+                    columns=list(TRADING_RESULTS_COLUMNS)
+                )
+                inserted, updated = await conn.fetchrow(MERGE_FROM_STAGING)
+        return change_counts(data, inserted, updated)
+
+    def _record_changes(self, counts):
+        """Накапливает сводку upsert за запуск"""
+        for result, rows in counts.items():
+            self.changes[result] += rows
+            metrics.inc('spimex_row_changes_total', rows, manager='async', result=result)
+
+    def _log_throughput(self, rows, elapsed):
+        """Логирует скорость загрузки в строках в секунду"""
+        rate = rows / elapsed if elapsed > 0 else float(rows)
+        self.logger.info(f"Загружено {rows} строк за {elapsed:.3f} с ({rate:.0f} строк/с)")
@@ -1,15 +1,55 @@
 import os
 import re
+import time
 import asyncio
 import pandas as pd
 
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from config.settings import logger
+from config.settings import logger, PROCESSING_CONFIG
+from core.metrics import metrics
+
+
+RESULT_COLUMNS = (
+    'exchange_product_id',
+    'exchange_product_name',
+    'oil_id',
+    'delivery_basis_id',
+    'delivery_basis_name',
+    'delivery_type_id',
+    'volume',
+    'total',
+    'count',
+)
+
+
+def _parse_file(file_path):
+    """Читает и очищает файл в процессе-воркере, возвращает компактные массивы"""
+    df = AsyncFileProcessor()._transform(pd.read_excel(file_path, header=None), file_path)
+    arrays = {}
+    for col in RESULT_COLUMNS:
+        if col in ('volume', 'total'):
+            arrays[col] = df[col].to_numpy(dtype='float64')
+        elif col == 'count':
+            arrays[col] = df[col].to_numpy(dtype='int64')
+        else:
+            arrays[col] = df[col].to_numpy(dtype=str)
+    return arrays, df['date'].iloc[0] if len(df) else None
+
+
+def _from_arrays(arrays, trade_date):
+    """Собирает DataFrame из массивов, полученных от процесса-воркера"""
+    df = pd.DataFrame(arrays)
+    df['date'] = trade_date
+    return df
 
 
 class AsyncFileProcessor:
-    def __init__(self):
+    def __init__(self, config=None, cache=None):
+        self.config = config or PROCESSING_CONFIG
+        self.cache = cache
         self.logger = logger.getChild('AsyncFileProcessor')
+        self._executor = None
 
     @staticmethod
     def _clean_column_name(col):
@@ -35,77 +75,117 @@ class AsyncFileProcessor:
                 return i
         raise ValueError("Не найдена строка с 'Метрическая тонна'")
 
+    def _get_executor(self):
+        """Лениво создает пул процессов для разбора файлов"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.config.get('parse_workers'))
+        return self._executor
+
+    def close(self):
+        """Останавливает пул процессов"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
     async def process_file(self, file_path):
         """Асинхронно обрабатывает файл Excel и возвращает данные"""
+        start_time = time.perf_counter()
         try:
             loop = asyncio.get_running_loop()
 
-            def read_excel():
-                return pd.read_excel(file_path, header=None)
-
-            df = await loop.run_in_executor(None, read_excel)
-
-            start_idx = self._find_data_start(df)
-            df = df.iloc[start_idx + 1:].reset_index(drop=True)
-
-            df.columns = df.iloc[0]
-            df = df.iloc[1:].reset_index(drop=True)
-
-            df.columns = [self._clean_column_name(str(col)) for col in df.columns]
-            df = df.loc[:, ~df.columns.str.startswith('Unnamed')]
-            df = df.loc[:, ~df.columns.str.contains('nan', case=False, na=False)]
-
-            required_columns = [
-                'код инструмента',
-                'наименование инструмента',
-                'базис поставки',
-                'объем договоров в единицах измерения',
-                'объем договоров, руб.',
-                'количество договоров, шт.'
-            ]
-
-            missing = set(required_columns) - set(df.columns)
-            if missing:
-                raise ValueError(f"Отсутствуют столбцы: {missing}")
-
-            df['количество договоров, шт.'] = pd.to_numeric(
-                df['количество договоров, шт.'], errors='coerce').fillna(0)
-            df = df[df['количество договоров, шт.'] > 0]
-
-            string_columns = [
-                'код инструмента',
-                'наименование инструмента',
-                'базис поставки'
-            ]
-            for col in string_columns:
-                if col in df.columns:
-                    df[col] = df[col].fillna('').astype(str)
-
-            df = df.rename(columns={
-                'код инструмента': 'exchange_product_id',
-                'наименование инструмента': 'exchange_product_name',
-                'базис поставки': 'delivery_basis_name',
-                'объем договоров в единицах измерения': 'volume',
-                'объем договоров, руб.': 'total',
-                'количество договоров, шт.': 'count'
-            })
-
-            file_name = os.path.basename(file_path)
-            df['oil_id'] = df['exchange_product_id'].str[:4]
-            df['delivery_basis_id'] = df['exchange_product_id'].str[4:7]
-            df['delivery_type_id'] = df['exchange_product_id'].str[-1]
-            df['volume'] = pd.to_numeric(df['volume'], errors='coerce').fillna(0)
-            df['total'] = pd.to_numeric(df['total'], errors='coerce').fillna(0)
-            df['count'] = pd.to_numeric(df['count'], errors='coerce').fillna(0).astype(int)
-
-            date_match = re.search(r'(\d{8})', file_name)
-            if not date_match:
-                raise ValueError(f"Не удалось извлечь дату из имени файла: {file_name}")
-            df['date'] = datetime.strptime(date_match.group(1), '%Y%m%d').date()
-
+            digest = None
+            if self.cache is not None and self.cache.enabled:
+                cached, digest = await loop.run_in_executor(None, self.cache.get, file_path)
+                if cached is not None:
+                    self.logger.info(f"Файл взят из колоночного кеша: {file_path}")
+                    self._record(start_time, 'cache')
+                    return cached
+
+            if self.config.get('parse_mode') == 'process':
+                arrays, trade_date = await loop.run_in_executor(
+                    self._get_executor(), _parse_file, file_path)
+                df = _from_arrays(arrays, trade_date)
+            else:
+                def read_excel():
+                    return pd.read_excel(file_path, header=None)
+
+                df = await loop.run_in_executor(None, read_excel)
+                df = self._transform(df, file_path)
+
+            if digest is not None:
+                await loop.run_in_executor(None, self.cache.put, digest, df)
             self.logger.info(f"Файл успешно обработан: {file_path}")
+            self._record(start_time, self.config.get('parse_mode', 'thread'))
             return df
 
         except Exception as e:
             self.logger.error(f"Ошибка обработки файла {file_path}: {e}", exc_info=True)
-            return None
\ No newline at end of file
+            metrics.inc('spimex_parse_failures_total', processor='async')
+            return None
+
+    def _record(self, start_time, source):
+        """Записывает время обработки файла в метрики"""
+        metrics.inc('spimex_files_parsed_total', processor='async', source=source)
+        metrics.observe('spimex_parse_seconds', time.perf_counter() - start_time,
+                        processor='async', source=source)
+
+    def _transform(self, df, file_path):
+        """Очищает прочитанный лист и приводит его к формату таблицы БД"""
+        start_idx = self._find_data_start(df)
+        df = df.iloc[start_idx + 1:].reset_index(drop=True)
+
+        df.columns = df.iloc[0]
+        df = df.iloc[1:].reset_index(drop=True)
+
+        df.columns = [self._clean_column_name(str(col)) for col in df.columns]
+        df = df.loc[:, ~df.columns.str.startswith('Unnamed')]
+        df = df.loc[:, ~df.columns.str.contains('nan', case=False, na=False)]
+
+        required_columns = [
+            'код инструмента',
+            'наименование инструмента',
+            'базис поставки',
+            'объем договоров в единицах измерения',
+            'объем договоров, руб.',
+            'количество договоров, шт.'
+        ]
+
+        missing = set(required_columns) - set(df.columns)
+        if missing:
+            raise ValueError(f"Отсутствуют столбцы: {missing}")
+
+        df['количество договоров, шт.'] = pd.to_numeric(
+            df['количество договоров, шт.'], errors='coerce').fillna(0)
+        df = df[df['количество договоров, шт.'] > 0]
+
+        string_columns = [
+            'код инструмента',
+            'наименование инструмента',
+            'базис поставки'
+        ]
+        for col in string_columns:
+            if col in df.columns:
+                df[col] = df[col].fillna('').astype(str)
+
+        df = df.rename(columns={
+            'код инструмента': 'exchange_product_id',
+            'наименование инструмента': 'exchange_product_name',
+            'базис поставки': 'delivery_basis_name',
+            'объем договоров в единицах измерения': 'volume',
+            'объем договоров, руб.': 'total',
+            'количество договоров, шт.': 'count'
+        })
+
+        file_name = os.path.basename(file_path)
+        df['oil_id'] = df['exchange_product_id'].str[:4]
+        df['delivery_basis_id'] = df['exchange_product_id'].str[4:7]
+        df['delivery_type_id'] = df['exchange_product_id'].str[-1]
+        df['volume'] = pd.to_numeric(df['volume'], errors='coerce').fillna(0)
+        df['total'] = pd.to_numeric(df['total'], errors='coerce').fillna(0)
+        df['count'] = pd.to_numeric(df['count'], errors='coerce').fillna(0).astype(int)
+
+        date_match = re.search(r'(\d{8})', file_name)
+        if not date_match:
+            raise ValueError(f"Не удалось извлечь дату из имени файла: {file_name}")
+        df['date'] = datetime.strptime(date_match.group(1), '%Y%m%d').date()
+        return df
\ No newline at end of file
@@ -1,22 +1,33 @@
 import os
 import aiohttp
+import aiofiles
+import aiofiles.os
 import asyncio
 
-from bs4 import BeautifulSoup
 from datetime import datetime, date
-from urllib.parse import urljoin
 from config.settings import logger, PARSER_CONFIG
+from core.http_cache import HttpCache
+from core.metrics import metrics
+from core.html_extract import SITE_URL, extract_file_links, extract_total_pages
+from async_core.async_request_controller import AsyncRequestController
 
 
 class AsyncSpimexParser:
-    def __init__(self, config=None):
+    def __init__(self, config=None, on_file=None):
         self.config = config or PARSER_CONFIG
+        self.on_file = on_file
         self.config['start_date'] = self._ensure_date(self.config['start_date'])
         self.config['end_date'] = self._ensure_date(self.config['end_date'])
 
         os.makedirs(self.config['download_dir'], exist_ok=True)
         self.logger = logger.getChild('AsyncSpimexParser')
         self._should_stop = False
+        self._page_tasks = {}
+        self._page_links = {}
+        cache_path = self.config.get('http_cache_path')
+        self.http_cache = HttpCache(cache_path) if cache_path else None
+        self.http = AsyncRequestController()
+        self.failed_downloads = []
         self.session = None
 
     def _ensure_date(self, dt):
@@ -27,24 +38,42 @@ class AsyncSpimexParser:
             return dt
         raise ValueError(f"Неподдерживаемый тип даты: {type(dt)}")
 
+    async def _fetch_page(self, url, kind, parse):
+        """Загружает страницу условным запросом и разбирает ее, только если она изменилась"""
+        key = f"{kind}:{url}"
+        headers = self.http_cache.request_headers(key) if self.http_cache else {}
+        async with self.http.request(self.session, 'GET', url, headers=headers, timeout=10) as response:
+            metrics.inc('spimex_pages_fetched_total', parser='async')
+            if headers and response.status == 304:
+                metrics.inc('spimex_pages_not_modified_total', parser='async')
+                return self.http_cache.not_modified(key)
+            response.raise_for_status()
+            text = await response.text()
+
+            if self.http_cache:
+                found, result = self.http_cache.lookup(key, text)
+                if found:
+                    metrics.inc('spimex_pages_not_modified_total', parser='async')
+                else:
+                    result = parse(text)
+                self.http_cache.store(key, response.headers, text, result)
+                return result
+            return parse(text)
+
+    def _parse_total_pages(self, text):
+        """Извлекает количество страниц из пагинации"""
+        total_pages = extract_total_pages(text, self.config.get('html_engine', 'fast'))
+        if total_pages is not None:
+            self.logger.debug(f"Найдено страниц: {total_pages}")
+            return total_pages
+
+        self.logger.debug("Пагинация не найдена, предполагаем 1 страницу")
+        return 1
+
     async def get_total_pages(self):
         """Получает общее количество страниц асинхронно"""
         try:
-            async with self.session.get(self.config['base_url'], timeout=10) as response:
-                response.raise_for_status()
-                text = await response.text()
-
-                soup = BeautifulSoup(text, 'html.parser')
-                pagination = soup.find('div', class_='bx-pagination')
-
-                if pagination:
-                    last_page = pagination.find_all('li')[-2].find('a')
-                    total_pages = int(last_page.find('span').text.strip())
-                    self.logger.debug(f"Найдено страниц: {total_pages}")
-                    return total_pages
-
-                self.logger.debug("Пагинация не найдена, предполагаем 1 страницу")
-                return 1
+            return await self._fetch_page(self.config['base_url'], 'pages', self._parse_total_pages)
         except Exception as e:
             self.logger.error(f"Ошибка получения количества страниц: {e}", exc_info=True)
             return 1
@@ -75,83 +104,251 @@ class AsyncSpimexParser:
                 self._should_stop = True
                 return False
 
-            if os.path.exists(file_name):
-                self.logger.debug(f"Файл существует: {file_name}")
+            if file_date > self.config['end_date']:
+                self.logger.debug(f"Пропуск {file_name}: дата {file_date} > end_date {self.config['end_date']}")
                 return True
 
-            async with self.session.get(url, timeout=10) as response:
-                response.raise_for_status()
-                content = await response.read()
+            if os.path.exists(file_name) and not self._should_revalidate(url):
+                self.logger.debug(f"Файл существует: {file_name}")
+                await self._emit(file_name)
+                return True
 
-                with open(file_name, 'wb') as f:
-                    f.write(content)
+            with metrics.timer('spimex_download_seconds', parser='async'):
+                downloaded = await self._stream_to_file(url, file_name)
+            if not downloaded:
+                self.logger.debug(f"Файл не изменился: {file_name}")
+                await self._emit(file_name)
+                return True
+            await aiofiles.os.replace(f"{file_name}.part", file_name)
 
+            metrics.inc('spimex_files_downloaded_total', parser='async')
             self.logger.info(f"Скачан файл: {file_name}")
+            await self._emit(file_name)
             return True
 
         except aiohttp.ClientError as e:
             self.logger.error(f"Ошибка сети: {str(e)}")
+            self.failed_downloads.append(url)
+            metrics.inc('spimex_download_failures_total', parser='async')
             return True
         except Exception as e:
             self.logger.error(f"Ошибка загрузки: {str(e)}")
+            self.failed_downloads.append(url)
+            metrics.inc('spimex_download_failures_total', parser='async')
             return True
 
-    async def parse_page(self, page_url):
-        """Парсит страницу асинхронно, возвращает список URL файлов"""
-        if self._should_stop:
-            return []
+    async def _emit(self, file_name):
+        """Передает готовый файл следующему этапу конвейера"""
+        if self.on_file is not None:
+            await self.on_file(file_name)
+
+    def _should_revalidate(self, url):
+        """Нужно ли проверить уже скачанный файл условным запросом"""
+        return bool(self.config.get('revalidate_files') and self.http_cache
+                    and f"file:{url}" in self.http_cache.entries)
+
+    async def _stream_to_file(self, url, file_name):
+        """Скачивает файл частями в .part, докачивая его через Range после обрыва.
+
+        Возвращает False, если сервер ответил 304 на проверку скачанного файла.
+        """
+        key = f"file:{url}"
+        part_name = f"{file_name}.part"
+        offset = os.path.getsize(part_name) if os.path.exists(part_name) else 0
+        headers = {'Range': f"bytes={offset}-"} if offset else {}
+        if os.path.exists(file_name) and self._should_revalidate(url):
+            headers.update(self.http_cache.request_headers(key))
+
+        async with self.http.request(self.session, 'GET', url, headers=headers, timeout=10) as response:
+            if 'If-None-Match' in headers or 'If-Modified-Since' in headers:
+                if response.status == 304:
+                    self.http_cache.not_modified(key)
+                    return False
+                self.http_cache.record_miss()
 
-        try:
-            async with self.session.get(page_url, timeout=10) as response:
+            restart = offset and response.status == 416
+            if not restart:
                 response.raise_for_status()
-                text = await response.text()
 
-                soup = BeautifulSoup(text, 'html.parser')
-                files = []
+                mode = 'ab' if offset and response.status == 206 else 'wb'
+                size = 0
+                async with aiofiles.open(part_name, mode) as f:
+                    async for chunk in response.content.iter_chunked(self.config.get('chunk_size', 65536)):
+                        await f.write(chunk)
+                        size += len(chunk)
+                metrics.inc('spimex_bytes_downloaded_total', size, parser='async')
 
-                for link in soup.find_all('a', href=True):
-                    href = link['href']
-                    if href.startswith('/upload/reports/oil_xls/oil_xls_'):
-                        full_url = urljoin("https://spimex.com", href.split('?')[0])
-                        files.append(full_url)
-                        self.logger.debug(f"Найдена ссылка: {full_url}")
+                if self.http_cache:
+                    self.http_cache.store(key, response.headers, None, True)
+                return True
+
+        # Сервер не может отдать продолжение: начинаем загрузку заново,
+        # уже освободив слот лимита запросов
+        await aiofiles.os.remove(part_name)
+        return await self._stream_to_file(url, file_name)
 
-                return files
+    async def parse_page(self, page_url):
+        """Парсит страницу асинхронно, возвращает список URL файлов"""
+        if self._should_stop:
+            return []
+        return await self._fetch_links(page_url)
 
+    async def _fetch_links(self, page_url):
+        """Загружает страницу и извлекает ссылки на файлы"""
+        try:
+            return await self._fetch_page(page_url, 'links', self._extract_links)
         except Exception as e:
             self.logger.error(f"Ошибка парсинга страницы: {str(e)}")
             return []
 
+    def _extract_links(self, text):
+        """Извлекает ссылки на файлы бюллетеней"""
+        files = extract_file_links(text, self.config.get('html_engine', 'fast'),
+                                   self.config.get('site_url', SITE_URL))
+        self.logger.debug(f"Найдено ссылок: {len(files)}")
+        return files
+
+    async def _get_page_links(self, page):
+        """Возвращает ссылки страницы, загружая каждую страницу не более одного раза"""
+        links = self._page_links.get(page)
+        if links is None:
+            links = await self._fetch_links(f"{self.config['base_url']}?page=page-{page}")
+            # Пустой результат (ошибка загрузки или пустая страница) не кешируем: обход запросит страницу снова
+            if links:
+                self._page_links[page] = links
+        return links
+
+    async def _reaches_end_date(self, page):
+        """Проверяет, есть ли на странице файлы не новее end_date"""
+        links = await self._get_page_links(page)
+        dates = [d for d in map(self.parse_date_from_filename, links) if d]
+        # Страницу без распознанных дат не пропускаем
+        return not dates or min(dates) <= self.config['end_date']
+
+    async def find_first_page(self, total_pages):
+        """Бинарным поиском находит первую страницу, пересекающую диапазон дат"""
+        if total_pages <= 1 or await self._reaches_end_date(1):
+            return 1
+
+        low, high = 2, total_pages
+        while low < high:
+            middle = (low + high) // 2
+            if await self._reaches_end_date(middle):
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    def _stop_after(self, page):
+        """Останавливает обход: отменяет обработку страниц после указанной"""
+        self._should_stop = True
+        for other_page, task in self._page_tasks.items():
+            if other_page > page and not task.done():
+                task.cancel()
+
+    async def _crawl_page(self, page, total_pages, queue):
+        """Собирает ссылки со страницы и ставит файлы в очередь загрузки"""
+        self.logger.info(f"Страница {page}/{total_pages}")
+        file_urls = await self._get_page_links(page)
+        self._page_links.pop(page, None)
+        if not file_urls:
+            self.logger.debug("Нет файлов на странице")
+
+        for file_url in file_urls:
+            file_date = self.parse_date_from_filename(file_url)
+            if file_date is not None and file_date < self.config['start_date']:
+                self.logger.info(f"Найдена дата {file_date} < start_date {self.config['start_date']}. Остановка.")
+                self._stop_after(page)
+                return
+            if file_date is not None and file_date > self.config['end_date']:
+                continue
+            await queue.put(file_url)
+            metrics.set_gauge('spimex_queue_depth', queue.qsize(), pipeline='async', queue='download')
+
+    async def _download_worker(self, queue):
+        """Скачивает файлы из очереди до получения None"""
+        while True:
+            file_url = await queue.get()
+            try:
+                if file_url is None:
+                    return
+                await self.download_file(file_url)
+            finally:
+                queue.task_done()
+
+    async def _crawl(self, total_pages, first_page=1):
+        """Обходит страницы ограниченным пулом и передает файлы пулу загрузчиков"""
+        queue = asyncio.Queue(maxsize=self.config.get('download_queue_size', 50))
+        download_workers = self.config.get('download_concurrency', 5)
+        page_semaphore = asyncio.Semaphore(self.config.get('page_concurrency', 3))
+        workers = [asyncio.create_task(self._download_worker(queue)) for _ in range(download_workers)]
+        self._page_tasks = {}
+
+        try:
+            for page in range(first_page, total_pages + 1):
+                await page_semaphore.acquire()
+                if self._should_stop:
+                    page_semaphore.release()
+                    break
+                task = asyncio.create_task(self._crawl_page(page, total_pages, queue))
+                task.add_done_callback(lambda _: page_semaphore.release())
+                self._page_tasks[page] = task
+
+            await asyncio.gather(*self._page_tasks.values(), return_exceptions=True)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in [*self._page_tasks.values(), *workers]:
+                task.cancel()
+
+    async def open(self):
+        """Открывает сессию, которую переиспользуют все последующие запуски run"""
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
+        return self
+
+    async def close(self):
+        """Закрывает открытую через open сессию"""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
     async def run(self):
         """Основной асинхронный метод запуска парсера"""
+        warm = self.session is not None
         try:
-            async with aiohttp.ClientSession() as self.session:
-                total_pages = await self.get_total_pages()
+            if not warm:
+                await self.open()
+            try:
+                self._should_stop = False
+                self.failed_downloads = []
+                # max_pages ограничивает обход первыми страницами листинга (новые бюллетени)
+                max_pages = self.config.get('max_pages')
+                total_pages = 1 if max_pages == 1 else await self.get_total_pages()
+                if max_pages:
+                    total_pages = min(total_pages, max_pages)
                 if total_pages == 0:
                     self.logger.warning("Нет страниц для обработки")
                     return False
 
-                tasks = []
-                for page in range(1, total_pages + 1):
-                    if self._should_stop:
-                        break
-
-                    self.logger.info(f"Страница {page}/{total_pages}")
-                    page_url = f"{self.config['base_url']}?page=page-{page}"
-
-                    file_urls = await self.parse_page(page_url)
-                    if not file_urls:
-                        self.logger.debug("Нет файлов на странице")
-                        continue
-
-                    for file_url in file_urls:
-                        if self._should_stop:
-                            break
-                        tasks.append(asyncio.create_task(self.download_file(file_url)))
-                await asyncio.gather(*tasks)
+                self._page_links = {}
+                first_page = await self.find_first_page(total_pages)
+                if first_page > 1:
+                    self.logger.info(f"Пропущено страниц новее end_date: {first_page - 1}")
+                await self._crawl(total_pages, first_page)
+            finally:
+                if not warm:
+                    await self.close()
+
+            if self.http_cache:
+                self.http_cache.report()
+            if self.failed_downloads:
+                self.logger.error(
+                    f"Не удалось скачать файлов: {len(self.failed_downloads)}: {self.failed_downloads}")
 
             return not self._should_stop
 
         except Exception as e:
             self.logger.critical(f"Критическая ошибка: {str(e)}", exc_info=True)
-            return False
\ No newline at end of file
+            return False
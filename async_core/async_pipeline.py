@@ -0,0 +1,98 @@
+import asyncio
+
+from config.settings import logger, PIPELINE_CONFIG
+from core.metrics import metrics
+
+
+class AsyncPipeline:
+    """Конвейер обработка файла -> загрузка в БД на ограниченных asyncio-очередях"""
+
+    def __init__(self, process, load, config=None):
+        self.config = config or PIPELINE_CONFIG
+        self.process = process
+        self.load = load
+        self.logger = logger.getChild('AsyncPipeline')
+        self.parse_queue = asyncio.Queue(maxsize=self.config['queue_size'])
+        self.load_queue = asyncio.Queue(maxsize=self.config['queue_size'])
+        self.stats = {'submitted': 0, 'parsed': 0, 'loaded': 0, 'failed': 0, 'rows': 0}
+        self._seen = set()
+        self._parse_tasks = []
+        self._load_tasks = []
+
+    def _report_depth(self):
+        """Публикует глубину очередей между этапами"""
+        metrics.set_gauge('spimex_queue_depth', self.parse_queue.qsize(), pipeline='async', queue='parse')
+        metrics.set_gauge('spimex_queue_depth', self.load_queue.qsize(), pipeline='async', queue='load')
+
+    def start(self):
+        """Запускает обработчиков этапов обработки и загрузки"""
+        self._parse_tasks = [
+            asyncio.create_task(self._parse_worker())
+            for _ in range(self.config['parse_concurrency'])
+        ]
+        self._load_tasks = [
+            asyncio.create_task(self._load_worker())
+            for _ in range(self.config['load_concurrency'])
+        ]
+        return self
+
+    async def submit(self, file_path):
+        """Ставит файл в очередь обработки, ожидая при заполненной очереди"""
+        if file_path in self._seen:
+            return False
+        self._seen.add(file_path)
+        self.stats['submitted'] += 1
+        await self.parse_queue.put(file_path)
+        self._report_depth()
+        return True
+
+    async def join(self):
+        """Дожидается обработки всех файлов и возвращает сводку"""
+        for _ in self._parse_tasks:
+            await self.parse_queue.put(None)
+        await asyncio.gather(*self._parse_tasks)
+        for _ in self._load_tasks:
+            await self.load_queue.put(None)
+        await asyncio.gather(*self._load_tasks)
+        return dict(self.stats)
+
+    async def cancel(self):
+        """Останавливает обработчиков, не дожидаясь файлов в очередях"""
+        tasks = [*self._parse_tasks, *self._load_tasks]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _parse_worker(self):
+        while True:
+            file_path = await self.parse_queue.get()
+            self._report_depth()
+            if file_path is None:
+                return
+            try:
+                result = await self.process(file_path)
+            except Exception as e:
+                self.logger.error(f"Ошибка обработки файла {file_path}: {e}", exc_info=True)
+                result = None
+
+            if result is None:
+                self.stats['failed'] += 1
+                continue
+            self.stats['parsed'] += 1
+            await self.load_queue.put((file_path, result))
+
+    async def _load_worker(self):
+        while True:
+            item = await self.load_queue.get()
+            self._report_depth()
+            if item is None:
+                return
+            file_path, result = item
+            try:
+                rows = await self.load(file_path, result)
+            except Exception as e:
+                self.logger.error(f"Ошибка загрузки файла {file_path} в БД: {e}", exc_info=True)
+                self.stats['failed'] += 1
+                continue
+            self.stats['loaded'] += 1
+            self.stats['rows'] += rows or 0
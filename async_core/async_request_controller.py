@@ -0,0 +1,67 @@
+import time
+import asyncio
+import aiohttp
+
+from contextlib import asynccontextmanager
+from config.settings import logger, HTTP_CONFIG
+from core.request_controller import RETRY_STATUSES, AimdLimiter, backoff_delay, parse_retry_after
+
+
+class AsyncRequestController:
+    """Повторы с экспоненциальной задержкой и адаптивный лимит параллельности для aiohttp"""
+
+    def __init__(self, config=None):
+        self.config = config or HTTP_CONFIG
+        self.logger = logger.getChild('AsyncRequestController')
+        self.limiter = AimdLimiter(self.config)
+        self._active = 0
+        self._condition = None
+
+    async def _acquire(self):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._active < int(self.limiter.limit))
+            self._active += 1
+
+    async def _release(self):
+        async with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    @asynccontextmanager
+    async def request(self, session, method, url, **kwargs):
+        """Контекстный менеджер ответа с повторами при 429/5xx и сетевых ошибках.
+
+        Слот лимита занят, пока тело ответа читается внутри блока.
+        """
+        max_retries = self.config['max_retries']
+        for attempt in range(max_retries + 1):
+            await self._acquire()
+            try:
+                start = time.perf_counter()
+                try:
+                    response = await session.request(method, url, **kwargs)
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                    self.limiter.on_overload()
+                    if attempt == max_retries:
+                        raise
+                    delay = backoff_delay(attempt, self.config)
+                    self.logger.warning(f"Ошибка сети для {url}: {e!r}. Повтор через {delay:.1f} с")
+                else:
+                    if response.status in RETRY_STATUSES and attempt < max_retries:
+                        self.limiter.on_overload()
+                        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                        delay = backoff_delay(attempt, self.config, retry_after)
+                        self.logger.warning(f"Ответ {response.status} для {url}. Повтор через {delay:.1f} с")
+                        response.release()
+                    else:
+                        try:
+                            yield response
+                        finally:
+                            response.release()
+                        self.limiter.on_success(time.perf_counter() - start)
+                        return
+            finally:
+                await self._release()
+            await asyncio.sleep(delay)
@@ -0,0 +1,106 @@
+import asyncio
+
+from config.settings import logger
+from core.query_cache import QueryCache
+
+RESULT_FIELDS = (
+    'exchange_product_id', 'exchange_product_name', 'oil_id',
+    'delivery_basis_id', 'delivery_basis_name', 'delivery_type_id',
+    'volume', 'total', 'count', 'date',
+)
+
+FILTER_FIELDS = ('exchange_product_id', 'oil_id', 'delivery_type_id', 'delivery_basis_id')
+
+LAST_TRADING_DATES = """
+    SELECT DISTINCT date FROM spimex_trading_results
+    WHERE date IS NOT NULL
+    ORDER BY date DESC
+    LIMIT $1
+"""
+
+DYNAMICS = f"""
+    SELECT {', '.join(RESULT_FIELDS)}
+    FROM spimex_trading_results
+    WHERE ($1::date IS NULL OR date >= $1)
+        AND ($2::date IS NULL OR date <= $2)
+        AND ($3::text IS NULL OR oil_id = $3)
+        AND ($4::text IS NULL OR delivery_type_id = $4)
+        AND ($5::text IS NULL OR delivery_basis_id = $5)
+    ORDER BY date, exchange_product_id
+"""
+
+
+class AsyncTradingResults:
+    """Запросы на чтение итогов торгов через read-through кеш"""
+
+    def __init__(self, db, cache=None):
+        self.db = db
+        self.cache = cache or QueryCache()
+        self.logger = logger.getChild('AsyncTradingResults')
+        self._inflight = {}
+
+    async def _cached(self, name, params, fetch):
+        """Возвращает результат из кеша или выполняет запрос, объединяя одинаковые запросы"""
+        key = self.cache.make_key(name, params)
+        found, value = self.cache.get(key)
+        if found:
+            return value
+
+        generation = self.cache.generation
+        task = self._inflight.get((generation, key))
+        if task is None:
+            async def load():
+                result = await fetch()
+                # Результат, полученный до сброса кеша, не сохраняем
+                if self.cache.generation == generation:
+                    self.cache.set(key, result)
+                return result
+
+            task = asyncio.ensure_future(load())
+            self._inflight[generation, key] = task
+            task.add_done_callback(lambda _: self._inflight.pop((generation, key), None))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, query, *args):
+        async with self.db.acquire() as conn:
+            return [dict(record) for record in await conn.fetch(query, *args)]
+
+    async def get_last_trading_dates(self, n):
+        """Последние n дат торгов, от новых к старым"""
+        async def fetch():
+            return [row['date'] for row in await self._fetch(LAST_TRADING_DATES, n)]
+        return await self._cached('last_trading_dates', [n], fetch)
+
+    async def get_dynamics(self, oil_id=None, delivery_type_id=None, delivery_basis_id=None,
+                           start_date=None, end_date=None):
+        """Итоги торгов за период; пустые фильтры не ограничивают выборку"""
+        params = [oil_id, delivery_type_id, delivery_basis_id, start_date, end_date]
+
+        async def fetch():
+            return await self._fetch(DYNAMICS, start_date, end_date,
+                                     oil_id, delivery_type_id, delivery_basis_id)
+        return await self._cached('dynamics', params, fetch)
+
+    async def get_trading_results(self, filters=None):
+        """Итоги последнего дня торгов с фильтрами по полям из FILTER_FIELDS"""
+        filters = {k: v for k, v in (filters or {}).items() if v is not None}
+        unknown = set(filters) - set(FILTER_FIELDS)
+        if unknown:
+            raise ValueError(f"Неподдерживаемые фильтры: {sorted(unknown)}")
+
+        conditions = ["date = (SELECT max(date) FROM spimex_trading_results)"]
+        args = []
+        for field in FILTER_FIELDS:
+            if field in filters:
+                args.append(filters[field])
+                conditions.append(f"{field} = ${len(args)}")
+        query = (f"SELECT {', '.join(RESULT_FIELDS)} FROM spimex_trading_results "
+                 f"WHERE {' AND '.join(conditions)} ORDER BY exchange_product_id")
+
+        async def fetch():
+            return await self._fetch(query, *args)
+        return await self._cached('trading_results', filters, fetch)
+
+    def invalidate(self):
+        """Сбрасывает кеш после загрузки новых бюллетеней"""
+        self.cache.invalidate()
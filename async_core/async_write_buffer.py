@@ -0,0 +1,96 @@
+import time
+import asyncio
+
+from config.settings import logger, WRITE_BUFFER_CONFIG
+from core.metrics import metrics
+
+
+class AsyncWriteBuffer:
+    """Буфер отложенной записи перед AsyncDatabaseManager.
+
+    Объединяет строки нескольких файлов в одну вставку и подтверждает
+    каждый файл через on_durable(file_path, rows) только после фиксации
+    транзакции с его строками.
+    """
+
+    def __init__(self, db, on_durable=None, config=None):
+        self.db = db
+        self.on_durable = on_durable
+        self.config = config or WRITE_BUFFER_CONFIG
+        self.logger = logger.getChild('AsyncWriteBuffer')
+        self.stats = {'flushes': 0, 'rows': 0, 'files': 0, 'failed_files': 0}
+        self._rows = []
+        self._files = []
+        self._first_at = None
+        self._flush_lock = asyncio.Lock()
+        self._stopped = asyncio.Event()
+        self._timer = None
+
+    def start(self):
+        """Запускает задачу сброса буфера по времени"""
+        self._timer = asyncio.create_task(self._flush_periodically())
+        return self
+
+    async def add(self, file_path, rows):
+        """Добавляет строки файла; при наборе max_rows строк сбрасывает буфер"""
+        if self._first_at is None:
+            self._first_at = time.monotonic()
+        self._rows.extend(rows)
+        self._files.append((file_path, len(rows)))
+        if len(self._rows) >= self.config['max_rows']:
+            await self.flush('size')
+
+    async def flush(self, reason='manual'):
+        """Записывает накопленные строки одной транзакцией и подтверждает их файлы"""
+        async with self._flush_lock:
+            rows, files = self._rows, self._files
+            self._rows, self._files, self._first_at = [], [], None
+            if not files:
+                return
+
+            try:
+                if rows:
+                    await self.db.insert_data(rows)
+            except Exception as e:
+                self.logger.error(f"Ошибка записи пачки из {len(files)} файлов ({len(rows)} строк): {e}",
+                                  exc_info=True)
+                self.stats['failed_files'] += len(files)
+                return
+
+            self.stats['flushes'] += 1
+            self.stats['rows'] += len(rows)
+            self.stats['files'] += len(files)
+            metrics.inc('spimex_buffer_flushes_total', reason=reason)
+            self.logger.debug(f"Записана пачка: файлов {len(files)}, строк {len(rows)} ({reason})")
+            if self.on_durable is not None:
+                for file_path, file_rows in files:
+                    self.on_durable(file_path, file_rows)
+
+    async def _flush_periodically(self):
+        max_delay = self.config['max_delay']
+        while not self._stopped.is_set():
+            try:
+                await asyncio.wait_for(self._stopped.wait(), timeout=max_delay / 4)
+            except asyncio.TimeoutError:
+                pass
+            if self._first_at is not None and time.monotonic() - self._first_at >= max_delay:
+                await self.flush('timer')
+
+    async def close(self):
+        """Останавливает сброс по времени, дождавшись текущей записи, и записывает остаток буфера"""
+        self._stopped.set()
+        if self._timer is not None:
+            await self._timer
+        await self.flush('close')
+        return dict(self.stats)
+
+    async def abort(self):
+        """Останавливает буфер без записи: неподтвержденные файлы остаются незагруженными"""
+        self._stopped.set()
+        if self._timer is not None and not self._timer.done():
+            self._timer.cancel()
+            await asyncio.gather(self._timer, return_exceptions=True)
+        dropped = len(self._files)
+        self._rows, self._files, self._first_at = [], [], None
+        if dropped:
+            self.logger.warning(f"Буфер остановлен, не записаны файлы: {dropped}")
@@ -1,78 +1,294 @@
 import os
 import asyncio
 import time
+import argparse
 
+from datetime import date
+from async_core.async_backfill import AsyncBackfillQueue
+from async_core.async_daemon import AsyncIngestDaemon
 from async_core.async_database import AsyncDatabaseManager
-from config.settings import logger, PARSER_CONFIG
+from config.settings import (
+    logger, PARSER_CONFIG, DB_LOAD_CONFIG, CACHE_CONFIG, WRITE_BUFFER_CONFIG, METRICS_CONFIG, DAEMON_CONFIG
+)
+from core.columnar_cache import ColumnarCache
+from core.manifest import IngestionManifest, file_hash
+from core.metrics import metrics
+from core.query_cache import QueryCache
+from core.row_converter import RowConverter
 from async_core.async_parser import AsyncSpimexParser
 from async_core.async_file_processor import AsyncFileProcessor
+from async_core.async_pipeline import AsyncPipeline
+from async_core.async_write_buffer import AsyncWriteBuffer
 
 
-async def process_single_file(file_processor, db, file_path):
-    """Обрабатывает один файл и загружает данные в БД"""
-    try:
-        logger.info(f"Обработка файла: {os.path.basename(file_path)}")
-
-        df = await file_processor.process_file(file_path)
-        if df is not None and not df.empty:
-            data = []
-            for _, row in df.iterrows():
-                try:
-                    data.append((
-                        str(row['exchange_product_id']),
-                        str(row['exchange_product_name']),
-                        str(row['oil_id']),
-                        str(row['delivery_basis_id']),
-                        str(row['delivery_basis_name']),
-                        str(row['delivery_type_id']),
-                        float(row['volume']),
-                        float(row['total']),
-                        int(row['count']),
-                        row['date']
-                    ))
-                except Exception as e:
-                    logger.error(f"Ошибка обработки строки: {row.to_dict()} - {str(e)}")
-                    continue
-
-            if data:
-                await db.insert_data(data)
+def parse_args():
+    parser = argparse.ArgumentParser(description="Асинхронная загрузка итогов торгов Spimex в PostgreSQL")
+    parser.add_argument('--full-reload', action='store_true',
+                        help="обработать все файлы, игнорируя манифест загрузок")
+    parser.add_argument('--rebuild-from-cache', action='store_true',
+                        help="пересобрать таблицу из колоночного кеша без обращения к Spimex")
+    parser.add_argument('--backfill', nargs=2, metavar=('START', 'END'), type=date.fromisoformat,
+                        help="поставить диапазон дат (ГГГГ-ММ-ДД) в общую очередь догрузки и обрабатывать ее")
+    parser.add_argument('--backfill-worker', action='store_true',
+                        help="присоединиться к догрузке истории из общей очереди")
+    parser.add_argument('--daemon', action='store_true',
+                        help="работать службой: проверять новые бюллетени по расписанию публикаций")
+    return parser.parse_args()
 
-    except Exception as e:
-        logger.error(f"Ошибка при обработке файла {file_path}: {e}", exc_info=True)
+
+async def load_dataframe(db, converter, df):
+    """Загружает обработанный DataFrame в БД, возвращает число строк"""
+    rows = 0
+    for batch in converter.iter_batches(df):
+        await db.insert_data(batch)
+        rows += len(batch)
+    return rows
 
 
-async def async_main():
+async def rebuild_from_cache():
+    """Пересобирает spimex_trading_results из колоночного кеша загруженных файлов"""
     start_time = time.time()
-    logger.info("Запуск асинхронного приложения spimex_parser")
+    logger.info("Пересборка таблицы из колоночного кеша")
+    loop = asyncio.get_running_loop()
+    cache = ColumnarCache()
+    file_processor = AsyncFileProcessor(cache=cache)
+    converter = RowConverter(batch_size=DB_LOAD_CONFIG['batch_size'])
+    manifest = IngestionManifest()
+    from_cache = reparsed = 0
+
+    db = await AsyncDatabaseManager().connect()
     try:
-        logger.info("Этап 1/2: Загрузка файлов с Spimex")
-        parser = AsyncSpimexParser()
-        await parser.run()
+        await db.create_table()
 
-        logger.info("Этап 2/2: Обработка файлов и загрузка в БД")
-        file_processor = AsyncFileProcessor()
-        db = await AsyncDatabaseManager().connect()
+        # Очистка и загрузка одной транзакцией: при ошибке таблица остается прежней
+        async with db.transaction():
+            await db.truncate_table()
 
-        await db.create_table()
+            for file_name, entry in sorted(manifest.entries.items()):
+                df = await loop.run_in_executor(None, cache.get_by_hash, entry['sha256'])
+                if df is not None:
+                    from_cache += 1
+                else:
+                    # Файла нет в кеше: разбираем исходный .xls, если он сохранился
+                    file_path = os.path.join(PARSER_CONFIG['download_dir'], file_name)
+                    df = await file_processor.process_file(file_path) if os.path.exists(file_path) else None
+                    if df is None:
+                        logger.warning(f"Файл {file_name} отсутствует и в кеше, и на диске")
+                        continue
+                    reparsed += 1
 
-        files = [f for f in os.listdir(PARSER_CONFIG['download_dir']) if f.endswith('.xls')]
-        sem = asyncio.Semaphore(5)
+                await load_dataframe(db, converter, df)
+    finally:
+        file_processor.close()
+        await db.close()
 
-        async def process_with_semaphore(file_path):
-            async with sem:
-                await process_single_file(file_processor, db, file_path)
+    QueryCache().invalidate()
+    logger.info(f"Из кеша: {from_cache}, разобрано заново: {reparsed}")
+    logger.info(f"Строки в БД (вставлено/обновлено/без изменений): {db.changes}")
+    logger.info(f"Время пересборки: {time.time() - start_time}")
 
-        tasks = [process_with_semaphore(os.path.join(PARSER_CONFIG['download_dir'], f))
-                 for f in files]
 
-        await asyncio.gather(*tasks)
+async def ingest(db, file_processor, manifest, query_cache, parser_config=None, full_reload=False, parser=None):
+    """Обходит Spimex и загружает новые файлы конвейером, возвращает сводку.
 
-        await db.close()
+    parser - уже открытый AsyncSpimexParser для повторных запусков. Без
+    parser_config и parser также догружает файлы, скачанные ранее и не
+    попавшие в обход.
+    """
+    loop = asyncio.get_running_loop()
+    converter = RowConverter(batch_size=DB_LOAD_CONFIG['batch_size'])
+    # sha256 файлов считается в пуле потоков, чтобы не блокировать event loop
+    hashes = {}
+
+    def on_durable(file_path, rows):
+        manifest.mark_loaded(file_path, rows, hashes.pop(file_path, None))
+        if rows:
+            query_cache.invalidate()
+
+    # Файл отмечается загруженным только после фиксации пачки с его строками
+    buffer = AsyncWriteBuffer(db, on_durable).start() if WRITE_BUFFER_CONFIG['max_rows'] else None
+
+    async def load(file_path, df):
+        hashes[file_path] = await loop.run_in_executor(None, file_hash, file_path)
+        if buffer is not None:
+            rows = converter.to_rows(df)
+            await buffer.add(file_path, rows)
+            return len(rows)
+        rows = await load_dataframe(db, converter, df)
+        on_durable(file_path, rows)
+        return rows
+
+    pipeline = AsyncPipeline(file_processor.process_file, load).start()
+    handled = set()
+    skipped = 0
+
+    async def submit(file_path):
+        nonlocal skipped
+        if file_path in handled:
+            return
+        handled.add(file_path)
+        if full_reload or await loop.run_in_executor(None, manifest.needs_loading, file_path):
+            logger.info(f"Обработка файла: {os.path.basename(file_path)}")
+            await pipeline.submit(file_path)
+        else:
+            skipped += 1
+
+    logger.info("Конвейер: загрузка с Spimex -> обработка файлов -> загрузка в БД")
+    scan_downloads = parser_config is None and parser is None
+    if parser is None:
+        parser = AsyncSpimexParser(config=parser_config)
+    parser.on_file = submit
+    try:
+        await parser.run()
+
+        if scan_downloads:
+            # Файлы, скачанные ранее и не попавшие в текущий обход
+            for file_name in sorted(os.listdir(PARSER_CONFIG['download_dir'])):
+                if file_name.endswith('.xls'):
+                    await submit(os.path.join(PARSER_CONFIG['download_dir'], file_name))
+
+        summary = await pipeline.join()
+        if buffer is not None:
+            buffer_stats = await buffer.close()
+            logger.info(f"Буфер записи: {buffer_stats}")
+            summary['failed'] += buffer_stats['failed_files']
+    except BaseException:
+        # Прерванная загрузка (ошибка или отмена при потере аренды элемента догрузки)
+        # не должна продолжаться в фоне: незаписанные файлы остаются неподтвержденными
+        await pipeline.cancel()
+        if buffer is not None:
+            await buffer.abort()
+        raise
+    finally:
+        manifest.flush()
+    summary['skipped'] = skipped
+    summary['failed_downloads'] = len(parser.failed_downloads)
+    return summary
+
+
+async def async_main(full_reload=False):
+    start_time = time.time()
+    logger.info("Запуск асинхронного приложения spimex_parser")
+    metrics.serve()
+    try:
+        cache = ColumnarCache() if CACHE_CONFIG['columnar_cache'] else None
+        file_processor = AsyncFileProcessor(cache=cache)
+        manifest = IngestionManifest()
+        query_cache = QueryCache()
+        db = await AsyncDatabaseManager().connect()
+        try:
+            await db.create_table()
+            summary = await ingest(db, file_processor, manifest, query_cache, full_reload=full_reload)
+        finally:
+            file_processor.close()
+            await db.close()
+        logger.info(f"Пропущено ранее загруженных файлов: {summary.pop('skipped')}")
+        logger.info(f"Итоги конвейера: {summary}")
+        logger.info(f"Строки в БД (вставлено/обновлено/без изменений): {db.changes}")
+        logger.info(f"Ожидание соединений пула, с: {db.pool_waits.summary()}")
         logger.info(f"Время выполнения асинхронного кода: {time.time() - start_time}")
     except Exception as e:
         logger.critical(f"Критическая ошибка в приложении: {e}", exc_info=True)
         raise
+    finally:
+        metrics.publish()
+
+
+async def backfill(start_date=None, end_date=None, full_reload=False):
+    """Догружает историю из общей очереди в PostgreSQL вместе с воркерами на других машинах.
+
+    С диапазоном дат сначала ставит его в очередь; без него только присоединяется к догрузке.
+    """
+    start_time = time.time()
+    logger.info("Запуск воркера догрузки истории")
+    metrics.serve()
+    try:
+        cache = ColumnarCache() if CACHE_CONFIG['columnar_cache'] else None
+        file_processor = AsyncFileProcessor(cache=cache)
+        manifest = IngestionManifest()
+        query_cache = QueryCache()
+        db = await AsyncDatabaseManager().connect()
+        try:
+            await db.create_table()
+            queue = AsyncBackfillQueue(db)
+            await queue.create_table()
+            if start_date is not None:
+                await queue.enqueue(start_date, end_date)
+
+            async def process(item_start, item_end):
+                parser_config = {**PARSER_CONFIG, 'start_date': item_start, 'end_date': item_end}
+                summary = await ingest(db, file_processor, manifest, query_cache, parser_config, full_reload)
+                if summary['failed'] or summary['failed_downloads']:
+                    raise RuntimeError(f"Диапазон загружен не полностью: {summary}")
+                return summary
+
+            stats = await queue.run(process)
+            logger.info(f"Воркер {queue.worker_id}: {stats}, очередь: {await queue.progress()}")
+        finally:
+            file_processor.close()
+            await db.close()
+        logger.info(f"Строки в БД (вставлено/обновлено/без изменений): {db.changes}")
+        logger.info(f"Время догрузки: {time.time() - start_time}")
+    except Exception as e:
+        logger.critical(f"Критическая ошибка в приложении: {e}", exc_info=True)
+        raise
+    finally:
+        metrics.publish()
+
+
+async def serve():
+    """Режим службы: проверяет первую страницу листинга по расписанию публикаций.
+
+    Сессия HTTP, пул соединений и справочники остаются открытыми все время работы.
+    """
+    logger.info("Запуск службы spimex_parser")
+    # Служба без /health не видна оркестратору: эндпоинт включен всегда
+    metrics.serve(METRICS_CONFIG['port'] or DAEMON_CONFIG['metrics_port'])
+    cache = ColumnarCache() if CACHE_CONFIG['columnar_cache'] else None
+    file_processor = AsyncFileProcessor(cache=cache)
+    manifest = IngestionManifest()
+    query_cache = QueryCache()
+    parser = AsyncSpimexParser(config={**PARSER_CONFIG, 'max_pages': 1})
+    db = await AsyncDatabaseManager().connect()
+    try:
+        await db.create_table()
+        await parser.open()
+
+        async def poll():
+            parser.config['end_date'] = date.today()
+            try:
+                summary = await ingest(db, file_processor, manifest, query_cache, parser=parser)
+            finally:
+                # Файловые отчеты обновляются после каждой проверки, а не только при остановке
+                metrics.publish()
+            if summary['loaded']:
+                logger.info(f"Загружены новые файлы: {summary}")
+            if summary['failed'] or summary['failed_downloads']:
+                raise RuntimeError(f"Бюллетени загружены не полностью: {summary}")
+            trade_dates = [entry['trade_date'] for entry in manifest.entries.values() if entry.get('trade_date')]
+            return date.fromisoformat(max(trade_dates)) if trade_dates else None
+
+        daemon = AsyncIngestDaemon(poll)
+        metrics.health_check = daemon.health
+        await daemon.run()
+    finally:
+        metrics.health_check = None
+        await parser.close()
+        file_processor.close()
+        await db.close()
+        metrics.publish()
+        logger.info(f"Служба остановлена. Строки в БД (вставлено/обновлено/без изменений): {db.changes}")
 
 
 if __name__ == "__main__":
-    asyncio.run(async_main())
\ No newline at end of file
+    args = parse_args()
+    if args.rebuild_from_cache:
+        asyncio.run(rebuild_from_cache())
+    elif args.backfill:
+        asyncio.run(backfill(*args.backfill, full_reload=args.full_reload))
+    elif args.backfill_worker:
+        asyncio.run(backfill(full_reload=args.full_reload))
+    elif args.daemon:
+        asyncio.run(serve())
+    else:
+        asyncio.run(async_main(full_reload=args.full_reload))
@@ -0,0 +1,86 @@
+"""Сравнение обычной и секционированной по месяцам таблицы.
+
+Требует доступный PostgreSQL из DB_CONFIG. Каждый вариант создается в
+отдельной временной схеме, которая удаляется после замера.
+
+    python -m benchmarks.bench_partitioning --years 3 --products 300
+"""
+import time
+import random
+import argparse
+from datetime import date, timedelta
+
+from core.database import DatabaseManager
+
+RANGE_QUERY = """
+    SELECT count(*), sum(volume)
+    FROM spimex_trading_results
+    WHERE date BETWEEN %s AND %s
+"""
+
+
+def synthetic_rows(years, products):
+    """Строки итогов торгов за каждый рабочий день периода"""
+    rng = random.Random(42)
+    ids = [f"A{n:03d}ANK{rng.randint(1, 999):03d}F" for n in range(products)]
+    day = date(2024, 1, 1) - timedelta(days=365 * years)
+    while day < date(2024, 1, 1):
+        if day.weekday() < 5:
+            for product_id in ids:
+                yield (product_id, 'Бензин', product_id[:4], product_id[4:7], 'Ангарск',
+                       product_id[-1], rng.uniform(1, 500), rng.uniform(1e4, 1e7), rng.randint(1, 20), day)
+        day += timedelta(days=1)
+
+
+def run_layout(layout, rows, batch_size):
+    """Загружает строки в схему с заданной раскладкой и замеряет запросы по датам"""
+    schema = f"bench_{layout}"
+    with DatabaseManager(load_config={'insert_mode': 'copy'}, schema_config={'layout': layout}) as db:
+        db.cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE; CREATE SCHEMA {schema}")
+        db.cursor.execute(f"SET search_path TO {schema}")
+        db.connection.commit()
+        try:
+            db.create_table()
+
+            start = time.perf_counter()
+            for i in range(0, len(rows), batch_size):
+                db.insert_data(rows[i:i + batch_size])
+            insert_time = time.perf_counter() - start
+
+            db.cursor.execute("ANALYZE spimex_trading_results")
+            last_day = rows[-1][9]
+            timings = {}
+            for label, days in (('неделя', 7), ('месяц', 31), ('год', 365)):
+                start = time.perf_counter()
+                db.cursor.execute(RANGE_QUERY, (last_day - timedelta(days=days), last_day))
+                db.cursor.fetchall()
+                timings[label] = time.perf_counter() - start
+
+            db.cursor.execute("SELECT pg_total_relation_size(c.oid) FROM pg_class c "
+                              "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                              "WHERE n.nspname = %s AND c.relkind = 'i'", (schema,))
+            index_size = sum(size for (size,) in db.cursor.fetchall())
+        finally:
+            db.connection.rollback()
+            db.cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+            db.connection.commit()
+    return insert_time, timings, index_size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--products', type=int, default=300)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    rows = list(synthetic_rows(args.years, args.products))
+    print(f"Строк: {len(rows)}")
+    for layout in ('heap', 'partitioned'):
+        insert_time, timings, index_size = run_layout(layout, rows, args.batch_size)
+        queries = ', '.join(f"{label} {elapsed * 1000:.1f} мс" for label, elapsed in timings.items())
+        print(f"{layout:12} вставка {insert_time:.2f} с; индексы {index_size / 1024:.0f} КБ; {queries}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Генератор синтетических бюллетеней oil_xls в формате spimex.com (требует xlwt)"""
+import io
+import random
+
+HEADER = (
+    'Код\nИнструмента', 'Наименование\nИнструмента', 'Базис\nпоставки',
+    'Обьем\nДоговоров\nв единицах\nизмерения', 'Обьем\nДоговоров,\nруб.',
+    'Изменение рыночной\nцены к цене\nпредыдуего дня', 'Изменение рыночной\nцены к цене\nпредыдуего дня, %',
+    'Цена (за единицу измерения), руб.\nМинимальная', 'Средневзвешенная', 'Максимальная', 'Рыночная',
+    'Цена в Заявках (за единицу\nизмерения)\nЛучшее\nпредложение', 'Лучший\nспрос',
+    'Количество\nДоговоров,\nшт.',
+)
+PRODUCTS = ('Бензин (АИ-92-К5)', 'Бензин (АИ-95-К5)', 'ДТ ЕВРО сорт С', 'Мазут топочный М-100', 'ТС-1')
+BASES = (('ANK', 'ст. Ангарск-сорт.'), ('ACH', 'ст. Ачинск'), ('UFA', 'ст. Уфа'),
+         ('PRM', 'НБ Пермь'), ('KRS', 'ст. Кириши'))
+DELIVERY_TYPES = 'AFJ'
+
+
+def bulletin_rows(trade_date, rows=300, seed=None):
+    """Строки таблицы в метрических тоннах; часть инструментов без сделок ('-')"""
+    rng = random.Random(seed if seed is not None else trade_date.toordinal())
+    result = []
+    for n in range(rows):
+        basis_id, basis = BASES[n % len(BASES)]
+        product = f"{'ADMT'[n % 4]}{n % 1000:03d}{basis_id}{rng.randint(1, 999):03d}{rng.choice(DELIVERY_TYPES)}"
+        name = rng.choice(PRODUCTS)
+        if rng.random() < 0.3:
+            result.append([product, name, basis, '-', '-', '-', '-', '-', '-', '-', '-', '-', '-', '-'])
+            continue
+        price = rng.uniform(30000, 90000)
+        count = rng.randint(1, 20)
+        volume = count * rng.choice((60, 65, 120))
+        result.append([product, name, basis, volume, round(volume * price), round(rng.uniform(-500, 500)),
+                       round(rng.uniform(-1, 1), 2), round(price * 0.98), round(price), round(price * 1.02),
+                       round(price), round(price * 1.03), round(price * 0.97), count])
+    return result
+
+
+def write_bulletin(target, trade_date, rows=300, seed=None):
+    """Записывает бюллетень в файл или файловый объект"""
+    import xlwt
+
+    workbook = xlwt.Workbook(encoding='utf-8')
+    sheet = workbook.add_sheet('TRADE_SUMMARY')
+    sheet.write(0, 1, 'Бюллетень по итогам торгов в Секции «Нефтепродукты» АО «СПбМТСБ»')
+    sheet.write(1, 1, f"Дата торгов: {trade_date:%d.%m.%Y}")
+    sheet.write(3, 1, 'Единица измерения: Метрическая тонна')
+    for j, title in enumerate(HEADER, start=1):
+        sheet.write(4, j, title)
+
+    data = bulletin_rows(trade_date, rows, seed)
+    for i, row in enumerate(data, start=5):
+        for j, value in enumerate(row, start=1):
+            sheet.write(i, j, value)
+
+    total_row = 5 + len(data)
+    sheet.write(total_row, 1, 'Итого:')
+    sheet.write(total_row, 14, sum(row[13] for row in data if row[13] != '-'))
+    sheet.write(total_row + 2, 1, 'Единица измерения: Килограмм')
+    sheet.write(total_row + 3, 1, 'Итого:')
+    workbook.save(target)
+
+
+def bulletin_bytes(trade_date, rows=300, seed=None):
+    """Содержимое .xls бюллетеня"""
+    buffer = io.BytesIO()
+    write_bulletin(buffer, trade_date, rows, seed)
+    return buffer.getvalue()
+
+
+def file_name(trade_date):
+    """Имя файла бюллетеня, как на сайте"""
+    return f"oil_xls_{trade_date:%Y%m%d}162000.xls"
@@ -0,0 +1,133 @@
+"""Локальный aiohttp-сервер, имитирующий листинг итогов торгов spimex.com"""
+import asyncio
+import threading
+
+from datetime import date, timedelta
+from aiohttp import web
+
+from benchmarks.bulletins import bulletin_bytes, file_name
+from core.html_extract import LINK_PREFIX
+
+LISTING_PATH = '/markets/oil_products/trades/results/'
+
+
+def trading_days(newest, days):
+    """Рабочие дни от newest в прошлое"""
+    result = []
+    day = newest
+    while len(result) < days:
+        if day.weekday() < 5:
+            result.append(day)
+        day -= timedelta(days=1)
+    return result
+
+
+class FakeExchange:
+    """Отдает страницы листинга с пагинацией bx-pagination и файлы бюллетеней.
+
+    Сервер работает в отдельном потоке со своим циклом событий, поэтому
+    подходит и для синхронного, и для асинхронного парсера.
+    """
+
+    def __init__(self, days=30, rows=300, per_page=10, newest=date(2025, 3, 14)):
+        self.dates = trading_days(newest, days)
+        self.per_page = per_page
+        self.total_pages = max(1, -(-len(self.dates) // per_page))
+        self.files = {file_name(d): bulletin_bytes(d, rows) for d in self.dates}
+        self.requests = {'pages': 0, 'files': 0}
+        self._loop = None
+        self._thread = None
+        self._runner = None
+        self.site_url = None
+        self.base_url = None
+
+    def render_listing(self, page):
+        """HTML страницы листинга"""
+        dates = self.dates[(page - 1) * self.per_page:page * self.per_page]
+        items = ''.join(
+            f'<div class="accordeon-inner__item"><div class="accordeon-inner__header">'
+            f'<a class="accordeon-inner__item-title link xls" href="{LINK_PREFIX}{d:%Y%m%d}162000.xls?r={n}" '
+            f'target="_blank">Бюллетень по итогам торгов в Секции «Нефтепродукты» АО «СПбМТСБ»</a>'
+            f'<div class="accordeon-inner__item-inner__title"><p>Дата торгов: <span>{d:%d.%m.%Y}</span></p></div>'
+            f'</div><a href="/upload/reports/oil_xls/oil_ktr_{d:%Y%m%d}162000.xls">Отчет по контрактам</a></div>'
+            for n, d in enumerate(dates)
+        )
+        pages = ''.join(
+            f'<li class="bx-active"><span>{p}</span></li>' if p == page and p != self.total_pages
+            else f'<li><a href="{LISTING_PATH}?page=page-{p}"><span>{p}</span></a></li>'
+            for p in sorted({1, page, self.total_pages})
+        )
+        pagination = (
+            '<div class="bx-pagination bx-green"><div class="bx-pagination-container"><ul>'
+            f'<li class="bx-pag-prev"><span>Назад</span></li>{pages}'
+            f'<li class="bx-pag-next"><a href="{LISTING_PATH}?page=page-{min(page + 1, self.total_pages)}">'
+            '<span>Вперед</span></a></li></ul></div></div>'
+        ) if self.total_pages > 1 else ''
+        return (
+            '<!DOCTYPE html><html lang="ru"><head><meta charset="UTF-8"><title>Итоги торгов</title>'
+            '<script>var a = "<div>";</script></head><body><div class="header"><a href="/markets/">Рынки</a></div>'
+            f'<div class="page-content__tabs__block"><div class="accordeon-inner">{items}</div></div>'
+            f'{pagination}<div class="footer"><a href="/upload/reports/oil_xls/">архив</a></div></body></html>'
+        )
+
+    async def _listing(self, request):
+        self.requests['pages'] += 1
+        page = request.query.get('page', 'page-1')
+        number = int(page.rsplit('-', 1)[-1]) if page.startswith('page-') else 1
+        return web.Response(text=self.render_listing(number), content_type='text/html')
+
+    async def _file(self, request):
+        body = self.files.get(request.match_info['name'])
+        if body is None:
+            raise web.HTTPNotFound()
+        self.requests['files'] += 1
+        return web.Response(body=body, content_type='application/vnd.ms-excel')
+
+    def start(self):
+        """Запускает сервер на свободном порту 127.0.0.1"""
+        app = web.Application()
+        app.router.add_get(LISTING_PATH, self._listing)
+        app.router.add_get(LINK_PREFIX.rsplit('/', 1)[0] + '/{name}', self._file)
+        self._runner = web.AppRunner(app, access_log=None)
+        self._loop = asyncio.new_event_loop()
+
+        async def serve():
+            await self._runner.setup()
+            site = web.TCPSite(self._runner, '127.0.0.1', 0)
+            await site.start()
+            return self._runner.addresses[0][1]
+
+        port = self._loop.run_until_complete(serve())
+        self.site_url = f"http://127.0.0.1:{port}"
+        self.base_url = f"{self.site_url}{LISTING_PATH}"
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Останавливает сервер"""
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+    def parser_config(self, download_dir, **overrides):
+        """Конфигурация парсера для обхода всех дней сервера"""
+        return {
+            'base_url': self.base_url,
+            'site_url': self.site_url,
+            'download_dir': download_dir,
+            'start_date': self.dates[-1],
+            'end_date': self.dates[0],
+            'http_cache_path': None,
+            **overrides,
+        }
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
@@ -0,0 +1,262 @@
+"""Воспроизводимые замеры производительности на синтетических бюллетенях.
+
+    python -m benchmarks.run                 # без БД
+    python -m benchmarks.run --db            # плюс вставка в PostgreSQL из настроек
+    python -m benchmarks.run --only html     # только замеры с 'html' в имени
+
+Время каждого замера (лучшее из --repeat прогонов) и отношения времен
+пар замеров сравниваются с порогами из benchmarks/thresholds.json; при
+превышении код возврата 1.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+
+from datetime import date
+from benchmarks.bulletins import write_bulletin, file_name
+from benchmarks.fake_exchange import FakeExchange, trading_days
+from config.settings import logger, DB_CONFIG
+from core.file_processor import FileProcessor
+from core.html_extract import extract_file_links, extract_total_pages
+from core.parser import SpimexParser
+from core.pipeline import Pipeline
+from core.row_converter import RowConverter
+from async_core.async_file_processor import AsyncFileProcessor
+from async_core.async_parser import AsyncSpimexParser
+from async_core.async_pipeline import AsyncPipeline
+
+THRESHOLDS_PATH = os.path.join(os.path.dirname(__file__), 'thresholds.json')
+BENCHMARKS = {}
+NEWEST_DATE = date(2025, 3, 14)
+
+
+def benchmark(name, needs_db=False):
+    def register(func):
+        BENCHMARKS[name] = (func, needs_db)
+        return func
+    return register
+
+
+class Workload:
+    """Набор сгенерированных бюллетеней и вспомогательные каталоги"""
+
+    def __init__(self, root, files, rows):
+        self.root = root
+        self.files = files
+        self.rows = rows
+        self.dates = trading_days(NEWEST_DATE, files)
+        self.bulletin_dir = os.path.join(root, 'bulletins')
+        os.makedirs(self.bulletin_dir, exist_ok=True)
+        self.paths = []
+        for trade_date in self.dates:
+            path = os.path.join(self.bulletin_dir, file_name(trade_date))
+            write_bulletin(path, trade_date, rows)
+            self.paths.append(path)
+        self.exchange = FakeExchange(days=files, rows=rows, per_page=10, newest=self.dates[0])
+        self.listing = self.exchange.render_listing(1)
+        self._download_runs = 0
+
+    def download_dir(self):
+        """Новый пустой каталог загрузок для очередного прогона"""
+        self._download_runs += 1
+        return os.path.join(self.root, f"downloads_{self._download_runs}")
+
+
+def scratch_config(config, schema, asyncpg=False):
+    """Конфигурация подключения, направленная во временную схему"""
+    if asyncpg:
+        return {**config, 'server_settings': {'search_path': schema}}
+    return {**config, 'options': f"-c search_path={schema}"}
+
+
+@benchmark('file_processor_pandas')
+def bench_file_processor_pandas(workload):
+    processor = FileProcessor(config={'reader': 'pandas'})
+    for path in workload.paths:
+        processor.process_file(path)
+
+
+@benchmark('file_processor_xlrd')
+def bench_file_processor_xlrd(workload):
+    processor = FileProcessor(config={'reader': 'xlrd'})
+    for path in workload.paths:
+        processor.process_file(path)
+
+
+def _run_async_processor(workload, parse_mode):
+    async def run():
+        processor = AsyncFileProcessor(config={'parse_mode': parse_mode, 'parse_workers': os.cpu_count()})
+        try:
+            await asyncio.gather(*(processor.process_file(path) for path in workload.paths))
+        finally:
+            processor.close()
+    asyncio.run(run())
+
+
+@benchmark('async_file_processor_thread')
+def bench_async_file_processor_thread(workload):
+    _run_async_processor(workload, 'thread')
+
+
+@benchmark('async_file_processor_process')
+def bench_async_file_processor_process(workload):
+    _run_async_processor(workload, 'process')
+
+
+@benchmark('html_listing_fast')
+def bench_html_listing_fast(workload):
+    for _ in range(200):
+        extract_file_links(workload.listing, 'fast')
+        extract_total_pages(workload.listing, 'fast')
+
+
+@benchmark('html_listing_bs4')
+def bench_html_listing_bs4(workload):
+    for _ in range(200):
+        extract_file_links(workload.listing, 'bs4')
+        extract_total_pages(workload.listing, 'bs4')
+
+
+def _converted_rows(workload):
+    processor = FileProcessor(config={'reader': 'xlrd'})
+    converter = RowConverter()
+    return [row for path in workload.paths
+            for batch in converter.iter_batches(processor.process_file(path)) for row in batch]
+
+
+def _bench_db_insert(workload, insert_mode):
+    from core.database import DatabaseManager
+
+    rows = _converted_rows(workload)
+    schema = f"bench_insert_{insert_mode}"
+    with DatabaseManager() as admin:
+        admin.cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE; CREATE SCHEMA {schema}")
+        admin.connection.commit()
+        try:
+            with DatabaseManager(config=scratch_config(DB_CONFIG, schema),
+                                 load_config={'insert_mode': insert_mode}) as db:
+                db.create_table()
+                start = time.perf_counter()
+                db.insert_data(rows)
+                return time.perf_counter() - start
+        finally:
+            admin.cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+            admin.connection.commit()
+
+
+@benchmark('db_insert_executemany', needs_db=True)
+def bench_db_insert_executemany(workload):
+    return _bench_db_insert(workload, 'executemany')
+
+
+@benchmark('db_insert_copy', needs_db=True)
+def bench_db_insert_copy(workload):
+    return _bench_db_insert(workload, 'copy')
+
+
+@benchmark('pipeline_sync')
+def bench_pipeline_sync(workload):
+    processor = FileProcessor(config={'reader': 'xlrd'})
+    converter = RowConverter()
+
+    def load(file_path, df):
+        return sum(len(batch) for batch in converter.iter_batches(df))
+
+    pipeline = Pipeline(processor.process_file, load).start()
+    parser = SpimexParser(config=workload.exchange.parser_config(workload.download_dir()),
+                          on_file=pipeline.submit)
+    parser.run()
+    parser.close()
+    summary = pipeline.join()
+    assert summary['loaded'] == workload.files, summary
+
+
+@benchmark('pipeline_async')
+def bench_pipeline_async(workload):
+    async def run():
+        processor = AsyncFileProcessor(config={'parse_mode': 'thread'})
+        converter = RowConverter()
+
+        async def load(file_path, df):
+            return sum(len(batch) for batch in converter.iter_batches(df))
+
+        pipeline = AsyncPipeline(processor.process_file, load).start()
+        parser = AsyncSpimexParser(config=workload.exchange.parser_config(workload.download_dir()),
+                                   on_file=pipeline.submit)
+        await parser.run()
+        summary = await pipeline.join()
+        processor.close()
+        return summary
+
+    summary = asyncio.run(run())
+    assert summary['loaded'] == workload.files, summary
+
+
+def measure(func, workload, repeat):
+    """Лучшее время из repeat прогонов; функция может вернуть собственный замер"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        elapsed = func(workload)
+        timings.append(elapsed if elapsed is not None else time.perf_counter() - start)
+    return min(timings)
+
+
+def report(name, value, limit, unit, failed):
+    """Печатает результат и запоминает превышение порога"""
+    ok = limit is None or value <= limit
+    if not ok:
+        failed.append(name)
+    limit_text = f"{limit:.3f}" if limit is not None else '-'
+    print(f"{name:44} {value:8.3f} {unit}  (порог {limit_text:>6})  {'ok' if ok else 'ПРЕВЫШЕН'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=20, help="число бюллетеней")
+    parser.add_argument('--rows', type=int, default=300, help="строк в бюллетене")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', help="подстрока имени замера")
+    parser.add_argument('--db', action='store_true', help="замерять вставку в PostgreSQL")
+    parser.add_argument('--json', help="сохранить результаты в файл")
+    args = parser.parse_args()
+
+    logger.setLevel(logging.ERROR)
+    with open(THRESHOLDS_PATH, encoding='utf-8') as f:
+        thresholds = json.load(f)
+
+    results = {}
+    failed = []
+    with tempfile.TemporaryDirectory() as root:
+        workload = Workload(root, args.files, args.rows)
+        with workload.exchange:
+            for name, (func, needs_db) in BENCHMARKS.items():
+                if (args.only and args.only not in name) or (needs_db and not args.db):
+                    continue
+                elapsed = measure(func, workload, args.repeat)
+                limit = thresholds['seconds'].get(name)
+                results[name] = {'seconds': round(elapsed, 4), 'threshold': limit}
+                report(name, elapsed, limit, 'с', failed)
+
+    for name, limit in thresholds['ratios'].items():
+        numerator, denominator = name.split('/')
+        if numerator in results and denominator in results:
+            ratio = results[numerator]['seconds'] / results[denominator]['seconds']
+            report(name, ratio, limit, 'x', failed)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'files': args.files, 'rows': args.rows, 'results': results}, f, indent=2)
+    if failed:
+        print(f"Превышены пороги: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -31,9 +31,156 @@ ASYNC_DB_CONFIG = {
     'host': os.getenv('ASYNC_DB_HOST'),
     'port': os.getenv('ASYNC_DB_PORT')
 }
+
+# Пул соединений с БД (asyncpg и ThreadedConnectionPool синхронной версии):
+# размер пула (синхронный пул сразу держит max_size соединений), время
+# простоя, после которого соединение закрывается,
+# размер кеша подготовленных запросов на соединение (0 - без подготовки)
+# и таймаут одного запроса в секундах (0 - без ограничения)
+DB_POOL_CONFIG = {
+    'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 1)),
+    'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 5)),
+    'max_inactive_lifetime': float(os.getenv('DB_POOL_MAX_INACTIVE_LIFETIME', 300.0)),
+    'statement_cache_size': int(os.getenv('DB_STATEMENT_CACHE_SIZE', 100)),
+    'command_timeout': float(os.getenv('DB_COMMAND_TIMEOUT', 60.0))
+}
 PARSER_CONFIG = {
     'base_url': "https://spimex.com/markets/oil_products/trades/results/",
     'download_dir': os.path.join(BASE_DIR, "downloads"),
     'start_date': datetime(2025, 3, 1),
-    'end_date': datetime.now()
+    'end_date': datetime.now(),
+    # Асинхронный обход: одновременно загружаемые страницы листинга,
+    # число загрузчиков файлов и размер очереди между ними
+    'page_concurrency': int(os.getenv('PAGE_CONCURRENCY', 3)),
+    'download_concurrency': int(os.getenv('DOWNLOAD_CONCURRENCY', 5)),
+    'download_queue_size': int(os.getenv('DOWNLOAD_QUEUE_SIZE', 50)),
+    # Синхронный парсер: размер пула keep-alive соединений и число потоков
+    # загрузки файлов (1 - последовательная загрузка)
+    'http_pool_size': int(os.getenv('HTTP_POOL_SIZE', 10)),
+    'download_workers': int(os.getenv('DOWNLOAD_WORKERS', 1)),
+    # Разбор страниц листинга: 'fast' - поиск ссылок без построения дерева,
+    # 'bs4' - полный разбор BeautifulSoup
+    'html_engine': os.getenv('HTML_ENGINE', 'fast'),
+    # Кеш ETag/Last-Modified и отпечатков страниц листинга; revalidate_files
+    # включает условную перепроверку уже скачанных бюллетеней
+    'http_cache_path': os.path.join(BASE_DIR, "downloads", ".http_cache.json"),
+    'revalidate_files': os.getenv('REVALIDATE_FILES', '0') == '1'
+}
+
+# manifest_path: индекс уже загруженных в БД файлов (имя, дата торгов,
+# размер/mtime/sha256, число строк, время загрузки); manifest_save_interval -
+# как часто, в секундах, он перезаписывается на диске во время загрузки
+INGEST_CONFIG = {
+    'manifest_path': os.path.join(PARSER_CONFIG['download_dir'], '.manifest.json'),
+    'manifest_save_interval': float(os.getenv('MANIFEST_SAVE_INTERVAL', 5))
+}
+
+# Колоночный кеш (Parquet, требует pyarrow) нормализованных бюллетеней
+# с ключом sha256 исходного .xls
+CACHE_CONFIG = {
+    'columnar_cache': os.getenv('COLUMNAR_CACHE', '1') == '1',
+    'columnar_cache_dir': os.path.join(PARSER_CONFIG['download_dir'], '.columnar')
+}
+
+# insert_mode: 'executemany' - построчный upsert, 'copy' - COPY во временную
+# таблицу и один INSERT ... SELECT ... ON CONFLICT
+# batch_size: максимальное число строк в одном вызове insert_data (0 - весь файл)
+DB_LOAD_CONFIG = {
+    'insert_mode': os.getenv('DB_INSERT_MODE', 'executemany'),
+    'batch_size': int(os.getenv('DB_BATCH_SIZE', 0))
+}
+
+# layout: 'heap' - обычная таблица с B-tree по дате, 'partitioned' - таблица,
+# секционированная по месяцам, с BRIN-индексом по дате, 'normalized' -
+# справочники products/delivery_bases, таблица фактов spimex_trading_facts
+# и представление spimex_trading_results прежней формы
+DB_SCHEMA_CONFIG = {
+    'layout': os.getenv('DB_TABLE_LAYOUT', 'heap')
+}
+
+# parse_mode: 'thread' - pd.read_excel в пуле потоков по умолчанию,
+# 'process' - чтение и очистка файла целиком в ProcessPoolExecutor
+# reader: 'pandas' - pd.read_excel всего листа, 'xlrd' - прямое чтение только
+# нужных столбцов через xlrd (синхронный FileProcessor)
+PROCESSING_CONFIG = {
+    'reader': os.getenv('EXCEL_READER', 'pandas'),
+    'parse_mode': os.getenv('PARSE_MODE', 'thread'),
+    'parse_workers': int(os.getenv('PARSE_WORKERS', os.cpu_count() or 1))
+}
+
+# Конвейер загрузка -> обработка -> БД: число одновременно обрабатываемых
+# файлов, число загрузчиков в БД и размер очередей между этапами
+PIPELINE_CONFIG = {
+    'parse_concurrency': int(os.getenv('PIPELINE_PARSE_CONCURRENCY', 5)),
+    'load_concurrency': int(os.getenv('PIPELINE_LOAD_CONCURRENCY', 2)),
+    'queue_size': int(os.getenv('PIPELINE_QUEUE_SIZE', 10))
+}
+
+# Повторы запросов к spimex.com (экспоненциальная задержка с джиттером,
+# Retry-After) и AIMD-лимит одновременных запросов
+HTTP_CONFIG = {
+    'max_retries': int(os.getenv('HTTP_MAX_RETRIES', 4)),
+    'backoff_base': float(os.getenv('HTTP_BACKOFF_BASE', 0.5)),
+    'backoff_max': float(os.getenv('HTTP_BACKOFF_MAX', 30)),
+    'initial_concurrency': int(os.getenv('HTTP_INITIAL_CONCURRENCY', 4)),
+    'min_concurrency': 1,
+    'max_concurrency': int(os.getenv('HTTP_MAX_CONCURRENCY', 16)),
+    'latency_factor': 2.0,
+    'decrease_factor': 0.5
+}
+
+# Кеш запросов на чтение итогов торгов: backend 'memory' (LRU с TTL в процессе)
+# или 'redis' (общий для процессов, требует пакет redis и REDIS_URL).
+# generation_path: файл-маркер, через который загрузчик сбрасывает кеш в памяти
+# процессов API на той же машине
+QUERY_CACHE_CONFIG = {
+    'backend': os.getenv('QUERY_CACHE_BACKEND', 'memory'),
+    'ttl': float(os.getenv('QUERY_CACHE_TTL', 300)),
+    'max_entries': int(os.getenv('QUERY_CACHE_MAX_ENTRIES', 1024)),
+    'redis_url': os.getenv('REDIS_URL', 'redis://localhost:6379/0'),
+    'key_prefix': 'spimex:query:',
+    'generation_path': os.getenv('QUERY_CACHE_GENERATION_PATH',
+                                 os.path.join(BASE_DIR, "downloads", ".query_cache_generation"))
+}
+
+# Метрики этапов: JSON-отчет о запуске, файл в текстовом формате Prometheus
+# (для node_exporter textfile collector) и HTTP-эндпоинт /metrics (0 - выключен)
+METRICS_CONFIG = {
+    'report_path': os.getenv('METRICS_REPORT_PATH', os.path.join(BASE_DIR, "downloads", ".metrics.json")),
+    'prometheus_path': os.getenv('METRICS_PROMETHEUS_PATH', ''),
+    'port': int(os.getenv('METRICS_PORT', 0))
+}
+
+# Буфер отложенной записи: строки многих файлов копятся и пишутся в БД одной
+# транзакцией при наборе max_rows строк или через max_delay секунд после
+# первой строки пачки; max_rows=0 - каждый файл пишется сразу
+WRITE_BUFFER_CONFIG = {
+    'max_rows': int(os.getenv('WRITE_BUFFER_ROWS', 5000)),
+    'max_delay': float(os.getenv('WRITE_BUFFER_DELAY', 2.0))
+}
+
+# Распределенная догрузка истории: длина диапазона дат одного элемента очереди,
+# интервал продления аренды, срок, после которого аренду забирает другой
+# воркер, и число попыток элемента
+BACKFILL_CONFIG = {
+    'item_days': int(os.getenv('BACKFILL_ITEM_DAYS', 30)),
+    'heartbeat_interval': float(os.getenv('BACKFILL_HEARTBEAT_INTERVAL', 15.0)),
+    'lease_timeout': float(os.getenv('BACKFILL_LEASE_TIMEOUT', 120.0)),
+    'max_attempts': int(os.getenv('BACKFILL_MAX_ATTEMPTS', 3)),
+    'worker_id': os.getenv('BACKFILL_WORKER_ID')
+}
+
+# Режим службы: время публикации бюллетеня на бирже (часы:минуты, смещение
+# от UTC), частая проверка первой страницы листинга в окне после публикации,
+# пока бюллетень дня не загружен, редкая проверка вне окна; служба нездорова
+# после max_failures неудачных проверок подряд. metrics_port - порт /metrics и
+# /health службы, если не задан METRICS_PORT
+DAEMON_CONFIG = {
+    'publish_time': os.getenv('DAEMON_PUBLISH_TIME', '16:15'),
+    'utc_offset_hours': int(os.getenv('DAEMON_UTC_OFFSET_HOURS', 3)),
+    'poll_interval': float(os.getenv('DAEMON_POLL_INTERVAL', 20.0)),
+    'poll_window': float(os.getenv('DAEMON_POLL_WINDOW', 7200.0)),
+    'idle_interval': float(os.getenv('DAEMON_IDLE_INTERVAL', 3600.0)),
+    'max_failures': int(os.getenv('DAEMON_MAX_FAILURES', 3)),
+    'metrics_port': int(os.getenv('DAEMON_METRICS_PORT', 9108))
 }
@@ -0,0 +1,74 @@
+import os
+
+from config.settings import logger, CACHE_CONFIG
+from core.manifest import file_hash
+from core.row_converter import RowConverter
+from core.sql import TRADING_RESULTS_COLUMNS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+
+def _schema():
+    return pa.schema([
+        ('exchange_product_id', pa.string()),
+        ('exchange_product_name', pa.string()),
+        ('oil_id', pa.string()),
+        ('delivery_basis_id', pa.string()),
+        ('delivery_basis_name', pa.string()),
+        ('delivery_type_id', pa.string()),
+        ('volume', pa.float64()),
+        ('total', pa.float64()),
+        ('count', pa.int64()),
+        ('date', pa.date32()),
+    ])
+
+
+class ColumnarCache:
+    """Кеш нормализованных бюллетеней в Parquet с ключом sha256 исходного файла"""
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or CACHE_CONFIG['columnar_cache_dir']
+        self.logger = logger.getChild('ColumnarCache')
+        self.enabled = pq is not None
+        if not self.enabled:
+            self.logger.warning("pyarrow не установлен, колоночный кеш отключен")
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._schema = _schema()
+        self._converter = RowConverter()
+
+    def _path(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}.parquet")
+
+    def get(self, file_path):
+        """Возвращает (DataFrame из кеша или None, sha256 файла)"""
+        digest = file_hash(file_path)
+        return self.get_by_hash(digest), digest
+
+    def get_by_hash(self, digest):
+        """Читает нормализованный бюллетень по хешу исходного файла"""
+        if not self.enabled or not os.path.exists(self._path(digest)):
+            return None
+        try:
+            return pq.read_table(self._path(digest), memory_map=True).to_pandas()
+        except Exception as e:
+            self.logger.warning(f"Не удалось прочитать кеш {digest}: {e}")
+            return None
+
+    def put(self, digest, df):
+        """Сохраняет нормализованный и типизированный бюллетень"""
+        if not self.enabled:
+            return
+        try:
+            columns, _ = self._converter.to_columns(df)
+            table = pa.table(dict(zip(TRADING_RESULTS_COLUMNS, columns)), schema=self._schema)
+
+            tmp_path = f"{self._path(digest)}.tmp"
+            pq.write_table(table, tmp_path)
+            os.replace(tmp_path, self._path(digest))
+        except Exception as e:
+            self.logger.warning(f"Не удалось записать кеш {digest}: {e}")
@@ -1,13 +1,38 @@
+import io
+import csv
+import time
+import threading
 import psycopg2
-from config import settings
 
+from contextlib import contextmanager
+from psycopg2.pool import ThreadedConnectionPool
+from config import settings
+from core.metrics import metrics, Histogram
+from core.sql import (
+    TRADING_RESULTS_COLUMNS, STAGING_TABLE, CREATE_STAGING_TABLE, MERGE_FROM_STAGING,
+    UPSERT_ROW, PREPARE_UPSERT_ROW, EXECUTE_UPSERT_ROW, COUNT_CHANGES_BY_KEYS, change_counts, latest_rows,
+    TABLE_EXISTS, TABLE_IS_PARTITIONED, CREATE_PARTITIONED_TABLE, RENAME_TO_HEAP, HEAP_MONTHS, COPY_FROM_HEAP,
+    FACTS_TABLE, FACTS_TABLE_EXISTS, CREATE_NORMALIZED_SCHEMA, SELECT_PRODUCTS, SELECT_DELIVERY_BASES,
+    INTERN_PRODUCTS, INTERN_DELIVERY_BASES, UPSERT_FACTS, COPY_HEAP_TO_NORMALIZED,
+    partition_months, create_partition, psycopg_params
+)
+from core.dimensions import DimensionCache
 
 
 class DatabaseManager:
-    def __init__(self, config=None):
+    def __init__(self, config=None, load_config=None, schema_config=None, pool_config=None):
         self.config = config or settings.DB_CONFIG
+        self.load_config = load_config or settings.DB_LOAD_CONFIG
+        self.schema_config = schema_config or settings.DB_SCHEMA_CONFIG
+        self.pool_config = pool_config or settings.DB_POOL_CONFIG
+        self._partitions = set()
+        self.dimensions = DimensionCache()
+        self.changes = {'inserted': 0, 'updated': 0, 'unchanged': 0}
         self.connection = None
         self.cursor = None
+        self._prepared = False
+        self._in_transaction = False
+        self.logger = settings.logger.getChild('DatabaseManager')
 
     def __enter__(self):
         self.connect()
@@ -18,9 +43,20 @@ class DatabaseManager:
 
     def connect(self):
         """Устанавливает соединение с базой данных"""
-        self.connection = psycopg2.connect(**self.config)
+        self.connection = psycopg2.connect(**self._connect_params())
         self.cursor = self.connection.cursor()
 
+    def _connect_params(self):
+        """Параметры соединения с таймаутом запросов из DB_POOL_CONFIG.
+
+        Таймаут дописывается к options из конфигурации, не заменяя их.
+        """
+        timeout = self.pool_config.get('command_timeout')
+        if not timeout:
+            return self.config
+        options = ' '.join(filter(None, [self.config.get('options'), f"-c statement_timeout={int(timeout * 1000)}"]))
+        return {**self.config, 'options': options}
+
     def close(self):
         """Закрывает соединение с базой данных"""
         if self.cursor:
@@ -28,16 +64,48 @@ class DatabaseManager:
         if self.connection:
             self.connection.close()
 
+    def _commit(self):
+        """Фиксирует изменения, если загрузка не идет внутри transaction()"""
+        if not self._in_transaction:
+            self.connection.commit()
+
+    @contextmanager
+    def transaction(self):
+        """Выполняет очистку таблицы и загрузку пачек одной транзакцией.
+
+        Читатели видят либо прежние данные, либо новые целиком.
+        """
+        self._in_transaction = True
+        try:
+            yield self
+            self.connection.commit()
+        except BaseException:
+            self.connection.rollback()
+            # Секции и ключи справочников из откаченной транзакции недействительны
+            self._partitions = set()
+            self.dimensions = DimensionCache()
+            raise
+        finally:
+            self._in_transaction = False
+
     def create_table(self):
         """Создает таблицу если она не существует"""
-        self.cursor.execute("""
-            SELECT EXISTS (
-                SELECT 1 FROM information_schema.tables
-                WHERE table_name = 'spimex_trading_results'
-            );
-        """)
-
-        if not self.cursor.fetchone()[0]:
+        if self.schema_config.get('layout') == 'normalized':
+            self._create_normalized_schema()
+            return
+        self.cursor.execute(TABLE_EXISTS)
+
+        if self.cursor.fetchone()[0]:
+            if self.schema_config.get('layout') == 'partitioned':
+                self.cursor.execute(TABLE_IS_PARTITIONED)
+                if not self.cursor.fetchone()[0]:
+                    raise RuntimeError(
+                        "Таблица spimex_trading_results не секционирована, перенесите ее: main.py --migrate-to-partitioned")
+            return
+        if self.schema_config.get('layout') == 'partitioned':
+            self.cursor.execute(CREATE_PARTITIONED_TABLE)
+            self.connection.commit()
+        else:
             self.cursor.execute("""
                 CREATE TABLE spimex_trading_results (
                     id SERIAL PRIMARY KEY,
@@ -66,25 +134,335 @@ class DatabaseManager:
             """)
             self.connection.commit()
 
+    def _create_normalized_schema(self):
+        """Создает справочники, таблицу фактов и представление spimex_trading_results"""
+        self.cursor.execute(FACTS_TABLE_EXISTS)
+        if self.cursor.fetchone()[0]:
+            return
+        self.cursor.execute(TABLE_EXISTS)
+        if self.cursor.fetchone()[0]:
+            raise RuntimeError(
+                "Таблица spimex_trading_results уже существует, перенесите ее: main.py --migrate-to-normalized")
+        self.cursor.execute(CREATE_NORMALIZED_SCHEMA)
+        self.connection.commit()
+
+    def ensure_partitions(self, data):
+        """Создает недостающие месячные секции для вставляемых строк"""
+        for month in sorted(partition_months(data) - self._partitions):
+            try:
+                self.cursor.execute(create_partition(month))
+                self._commit()
+            except Exception:
+                self.connection.rollback()
+                raise
+            self._partitions.add(month)
+
+    def migrate_to_partitioned(self):
+        """Переносит данные из обычной таблицы в секционированную.
+
+        Старая таблица сохраняется как spimex_trading_results_heap.
+        """
+        try:
+            self.cursor.execute(RENAME_TO_HEAP)
+            self.cursor.execute(CREATE_PARTITIONED_TABLE)
+            self.cursor.execute(HEAP_MONTHS)
+            for (month,) in self.cursor.fetchall():
+                self.cursor.execute(create_partition(month))
+                self._partitions.add(month)
+            self.cursor.execute(COPY_FROM_HEAP)
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            self._partitions.clear()
+            raise
+        self.logger.info("Таблица перенесена в секционированную, старая сохранена как spimex_trading_results_heap")
+
+    def migrate_to_normalized(self):
+        """Переносит данные из обычной таблицы в справочники и таблицу фактов.
+
+        Старая таблица сохраняется как spimex_trading_results_heap.
+        """
+        try:
+            self.cursor.execute(RENAME_TO_HEAP)
+            self.cursor.execute(CREATE_NORMALIZED_SCHEMA)
+            self.cursor.execute(COPY_HEAP_TO_NORMALIZED)
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+        self.logger.info("Таблица перенесена в нормализованную схему, старая сохранена как spimex_trading_results_heap")
+
+    def truncate_table(self):
+        """Очищает таблицу перед полной пересборкой"""
+        table = FACTS_TABLE if self.schema_config.get('layout') == 'normalized' else 'spimex_trading_results'
+        self.cursor.execute(f"TRUNCATE TABLE {table} RESTART IDENTITY")
+        self._commit()
+
     def insert_data(self, data):
-        """Вставляет данные в таблицу"""
-        query = """
-            INSERT INTO spimex_trading_results (
-                exchange_product_id, exchange_product_name, oil_id, 
-                delivery_basis_id, delivery_basis_name, delivery_type_id,
-                volume, total, count, date
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (exchange_product_id, date) 
-            DO UPDATE SET
-                exchange_product_name = EXCLUDED.exchange_product_name,
-                oil_id = EXCLUDED.oil_id,
-                delivery_basis_id = EXCLUDED.delivery_basis_id,
-                delivery_basis_name = EXCLUDED.delivery_basis_name,
-                delivery_type_id = EXCLUDED.delivery_type_id,
-                volume = EXCLUDED.volume,
-                total = EXCLUDED.total,
-                count = EXCLUDED.count,
-                updated_on = CURRENT_TIMESTAMP
+        """Вставляет данные в таблицу выбранным в конфигурации способом.
+
+        Возвращает число вставленных, обновленных и не изменившихся строк.
         """
-        self.cursor.executemany(query, data)
-        self.connection.commit()
\ No newline at end of file
+        data = latest_rows(data)
+        start_time = time.perf_counter()
+        if self.schema_config.get('layout') == 'partitioned':
+            self.ensure_partitions(data)
+        mode = self.load_config.get('insert_mode', 'executemany')
+        if self.schema_config.get('layout') == 'normalized':
+            mode = 'normalized'
+            counts = self.upsert_normalized(data)
+        elif mode == 'copy':
+            counts = self.copy_data(data)
+        else:
+            counts = self.upsert_data(data)
+        elapsed = time.perf_counter() - start_time
+        metrics.inc('spimex_rows_upserted_total', len(data), manager='sync', mode=mode)
+        metrics.observe('spimex_insert_seconds', elapsed, manager='sync', mode=mode)
+        self._record_changes(counts)
+        self._log_throughput(len(data), elapsed)
+        return counts
+
+    def upsert_data(self, data):
+        """Построчный upsert через executemany"""
+        try:
+            self.cursor.executemany(self._upsert_statement(), data)
+            self.cursor.execute(psycopg_params(COUNT_CHANGES_BY_KEYS),
+                                ([row[0] for row in data], [row[9] for row in data]))
+            inserted, updated = self.cursor.fetchone()
+            self._commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+        return change_counts(data, inserted, updated)
+
+    def _upsert_statement(self):
+        """Подготавливает upsert на соединении один раз, если включен кеш запросов"""
+        if not self.pool_config.get('statement_cache_size'):
+            return psycopg_params(UPSERT_ROW)
+        if not self._prepared:
+            # Подготовленный запрос живет до конца сессии и не требует фиксации:
+            # отдельный commit зафиксировал бы и начатую transaction()
+            self.cursor.execute(PREPARE_UPSERT_ROW)
+            self._prepared = True
+        return EXECUTE_UPSERT_ROW
+
+    def upsert_normalized(self, data):
+        """Пополняет справочники новыми строками и загружает факты одним upsert по массивам"""
+        try:
+            if not self.dimensions.loaded:
+                self.cursor.execute(SELECT_PRODUCTS)
+                products = self.cursor.fetchall()
+                self.cursor.execute(SELECT_DELIVERY_BASES)
+                self.dimensions.load(products, self.cursor.fetchall())
+
+            products, bases = self.dimensions.missing(data)
+            new_products, new_bases = [], []
+            if products:
+                self.cursor.execute(psycopg_params(INTERN_PRODUCTS), [list(column) for column in zip(*products)])
+                new_products = self.cursor.fetchall()
+            if bases:
+                self.cursor.execute(psycopg_params(INTERN_DELIVERY_BASES), (bases,))
+                new_bases = self.cursor.fetchall()
+
+            facts = self.dimensions.to_facts(
+                data, DimensionCache.product_keys(new_products), DimensionCache.base_keys(new_bases))
+            self.cursor.execute(psycopg_params(UPSERT_FACTS), facts)
+            inserted, updated = self.cursor.fetchone()
+            self._commit()
+        except Exception:
+            # Ключи из откаченной транзакции в кеш не попадают
+            self.connection.rollback()
+            raise
+        self.dimensions.add_products(new_products)
+        self.dimensions.add_bases(new_bases)
+        return change_counts(data, inserted, updated)
+
+    def copy_data(self, data):
+        """Загружает данные через COPY во временную таблицу и merge в основную"""
+        buffer = io.StringIO()
+        csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC).writerows(data)
+        buffer.seek(0)
+
+        try:
+            self.cursor.execute(CREATE_STAGING_TABLE)
+            self.cursor.copy_expert(
+                f"COPY {STAGING_TABLE} ({', '.join(TRADING_RESULTS_COLUMNS)}) "
+                f"FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+            self.cursor.execute(MERGE_FROM_STAGING)
+            inserted, updated = self.cursor.fetchone()
+            self._commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+        return change_counts(data, inserted, updated)
+
+    def _record_changes(self, counts):
+        """Накапливает сводку upsert за запуск"""
+        for result, rows in counts.items():
+            self.changes[result] += rows
+            metrics.inc('spimex_row_changes_total', rows, manager='sync', result=result)
+
+    def _log_throughput(self, rows, elapsed):
+        """Логирует скорость загрузки в строках в секунду"""
+        rate = rows / elapsed if elapsed > 0 else float(rows)
+        self.logger.info(f"Загружено {rows} строк за {elapsed:.3f} с ({rate:.0f} строк/с)")
+
+
+class PooledDatabaseManager(DatabaseManager):
+    """DatabaseManager поверх ThreadedConnectionPool для загрузки из нескольких потоков.
+
+    Каждый поток на время операции получает свое соединение из пула;
+    время ожидания свободного соединения собирается в pool_waits.
+    """
+
+    def __init__(self, config=None, load_config=None, schema_config=None, pool_config=None):
+        self._local = threading.local()
+        super().__init__(config, load_config, schema_config, pool_config)
+        self.pool = None
+        self.pool_waits = Histogram()
+        self._slots = threading.BoundedSemaphore(self.pool_config['max_size'])
+        self._lock = threading.Lock()
+        self._busy = 0
+        self._idle_since = {}
+        self._prepared_connections = set()
+        self.logger = settings.logger.getChild('PooledDatabaseManager')
+
+    @property
+    def connection(self):
+        return getattr(self._local, 'connection', None)
+
+    @connection.setter
+    def connection(self, value):
+        self._local.connection = value
+
+    @property
+    def cursor(self):
+        return getattr(self._local, 'cursor', None)
+
+    @cursor.setter
+    def cursor(self, value):
+        self._local.cursor = value
+
+    @property
+    def _in_transaction(self):
+        return getattr(self._local, 'in_transaction', False)
+
+    @_in_transaction.setter
+    def _in_transaction(self, value):
+        self._local.in_transaction = value
+
+    @property
+    def _prepared(self):
+        return self.connection in self._prepared_connections
+
+    @_prepared.setter
+    def _prepared(self, value):
+        if value:
+            self._prepared_connections.add(self.connection)
+
+    def connect(self):
+        """Создает пул соединений с базой данных.
+
+        psycopg2 закрывает возвращенное соединение, если в пуле уже minconn
+        свободных, поэтому minconn равен max_size: соединения и подготовленные
+        на них запросы живут между пачками, а простаивающие дольше
+        max_inactive_lifetime заменяются в _get_connection.
+        """
+        self.pool = ThreadedConnectionPool(
+            self.pool_config['max_size'], self.pool_config['max_size'], **self._connect_params())
+        return self
+
+    def close(self):
+        """Закрывает все соединения пула"""
+        if self.pool:
+            self.pool.closeall()
+
+    @contextmanager
+    def acquire(self):
+        """Выдает потоку соединение из пула на время блока, дожидаясь свободного"""
+        if self.connection is not None:
+            # Вложенный вызов в том же потоке: соединение уже выдано
+            yield self.connection
+            return
+
+        start_time = time.perf_counter()
+        self._slots.acquire()
+        waited = time.perf_counter() - start_time
+        metrics.observe('spimex_db_pool_wait_seconds', waited, manager='sync')
+        connection = None
+        try:
+            connection = self._get_connection()
+            self._set_busy(1, waited)
+            self.connection, self.cursor = connection, connection.cursor()
+            yield connection
+        finally:
+            if self.cursor is not None:
+                self.cursor.close()
+            self.connection = self.cursor = None
+            if connection is not None:
+                self._set_busy(-1)
+                self._idle_since[connection] = time.monotonic()
+                self.pool.putconn(connection)
+                if connection.closed:
+                    self._forget(connection)
+            self._slots.release()
+
+    def _forget(self, connection):
+        """Убирает закрытое соединение из учета простоя и подготовленных запросов"""
+        self._idle_since.pop(connection, None)
+        self._prepared_connections.discard(connection)
+
+    def _get_connection(self):
+        """Берет соединение из пула, заменяя простоявшее дольше max_inactive_lifetime"""
+        connection = self.pool.getconn()
+        idle_since = self._idle_since.pop(connection, None)
+        lifetime = self.pool_config.get('max_inactive_lifetime')
+        if idle_since is not None and lifetime and time.monotonic() - idle_since > lifetime:
+            self._forget(connection)
+            self.pool.putconn(connection, close=True)
+            connection = self.pool.getconn()
+        return connection
+
+    def _set_busy(self, delta, waited=None):
+        with self._lock:
+            self._busy += delta
+            if waited is not None:
+                self.pool_waits.observe(waited)
+            busy = self._busy
+        metrics.set_gauge('spimex_db_pool_connections', busy, manager='sync', state='busy')
+
+    def create_table(self):
+        with self.acquire():
+            super().create_table()
+
+    def truncate_table(self):
+        with self.acquire():
+            super().truncate_table()
+
+    def migrate_to_partitioned(self):
+        with self.acquire():
+            super().migrate_to_partitioned()
+
+    def migrate_to_normalized(self):
+        with self.acquire():
+            super().migrate_to_normalized()
+
+    def insert_data(self, data):
+        with self.acquire():
+            return super().insert_data(data)
+
+    @contextmanager
+    def transaction(self):
+        """Закрепляет за потоком одно соединение пула и выполняет блок одной транзакцией.
+
+        Загрузки других потоков идут на своих соединениях и фиксируются как обычно.
+        """
+        with self.acquire():
+            with super().transaction():
+                yield self
+
+    def _record_changes(self, counts):
+        with self._lock:
+            super()._record_changes(counts)
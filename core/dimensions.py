@@ -0,0 +1,80 @@
+import threading
+
+from config.settings import logger
+
+
+class DimensionCache:
+    """Кеш суррогатных ключей справочников products и delivery_bases.
+
+    Загружается из БД один раз за запуск и пополняется пачками только теми
+    инструментами и базисами, которых в нем еще нет. Кеш общий для
+    параллельных загрузчиков: ключи, полученные в транзакции, добавляются в
+    него только после ее фиксации, а до того передаются в to_facts явно.
+    """
+
+    def __init__(self):
+        self.products = {}
+        self.bases = {}
+        self.loaded = False
+        self.logger = logger.getChild('DimensionCache')
+        self._lock = threading.Lock()
+
+    def load(self, products, bases):
+        """Заполняет кеш строками (id, код, название) и (id, название)"""
+        self.add_products(products)
+        self.add_bases(bases)
+        with self._lock:
+            self.loaded = True
+            self.logger.info(f"Справочники загружены: инструментов {len(self.products)}, базисов {len(self.bases)}")
+
+    def add_products(self, rows):
+        products = self.product_keys(rows)
+        with self._lock:
+            self.products.update(products)
+
+    def add_bases(self, rows):
+        bases = self.base_keys(rows)
+        with self._lock:
+            self.bases.update(bases)
+
+    @staticmethod
+    def product_keys(rows):
+        """Строки (id, код, название) в виде {код: (id, название)}"""
+        return {product_id: (key, name) for key, product_id, name in rows}
+
+    @staticmethod
+    def base_keys(rows):
+        """Строки (id, название) в виде {название: id}"""
+        return {name: key for key, name in rows}
+
+    def missing(self, data):
+        """Новые или переименованные инструменты и новые базисы из строк TRADING_RESULTS_COLUMNS"""
+        products = {}
+        bases = set()
+        with self._lock:
+            for row in data:
+                product_id, name = row[0], row[1]
+                known = self.products.get(product_id)
+                if known is None or known[1] != name:
+                    products[product_id] = (product_id, name, row[2], row[3], row[5])
+                if row[4] not in self.bases:
+                    bases.add(row[4])
+        # Порядок ключей постоянный: параллельные загрузчики блокируют строки справочников в одном порядке
+        return [products[product_id] for product_id in sorted(products)], sorted(bases)
+
+    def to_facts(self, data, products=None, bases=None):
+        """Столбцы таблицы фактов: ключ инструмента, ключ базиса, объем, сумма, количество, дата.
+
+        products и bases - ключи, полученные в текущей транзакции, они важнее закешированных.
+        """
+        products = products or {}
+        bases = bases or {}
+        columns = ([], [], [], [], [], [])
+        with self._lock:
+            for row in data:
+                product = products.get(row[0]) or self.products[row[0]]
+                base = bases[row[4]] if row[4] in bases else self.bases[row[4]]
+                values = (product[0], base, row[6], row[7], row[8], row[9])
+                for column, value in zip(columns, values):
+                    column.append(value)
+        return list(columns)
@@ -1,14 +1,33 @@
 import os
 import re
+import time
+import xlrd
+import numpy as np
 import pandas as pd
 
 from datetime import datetime, date
-from config.settings import logger
+from config.settings import logger, PROCESSING_CONFIG
+from core.metrics import metrics
 
 
+MARKER = 'Метрическая тонна'
+# Сколько первых ячеек строки проверяет быстрый поиск маркера
+MARKER_SCAN_COLUMNS = 3
+
+REQUIRED_COLUMNS = {
+    'код инструмента': 'exchange_product_id',
+    'наименование инструмента': 'exchange_product_name',
+    'базис поставки': 'delivery_basis_name',
+    'объем договоров в единицах измерения': 'volume',
+    'объем договоров, руб.': 'total',
+    'количество договоров, шт.': 'count'
+}
+
 
 class FileProcessor:
-    def __init__(self):
+    def __init__(self, config=None, cache=None):
+        self.config = config or PROCESSING_CONFIG
+        self.cache = cache
         self.logger = logger.getChild('FileProcessor')
 
     @staticmethod
@@ -31,57 +50,99 @@ class FileProcessor:
     def _find_data_start(self, df):
         """Находит начало данных в DataFrame"""
         for i, row in df.iterrows():
-            if any(isinstance(cell, str) and 'Метрическая тонна' in str(cell) for cell in row):
+            if any(isinstance(cell, str) and MARKER in str(cell) for cell in row):
                 return i
-        raise ValueError("Не найдена строка с 'Метрическая тонна'")
-
-    def process_file(self, file_path):
-        """Обрабатывает файл Excel и возвращает данные"""
+        raise ValueError(f"Не найдена строка с '{MARKER}'")
+
+    def _find_marker_row(self, sheet):
+        """Находит строку с маркером, проверяя сначала только первые ячейки строк"""
+        for scan_columns in (MARKER_SCAN_COLUMNS, None):
+            for i in range(sheet.nrows):
+                cells = sheet.row_values(i, 0, scan_columns)
+                if any(isinstance(cell, str) and MARKER in cell for cell in cells):
+                    return i
+        raise ValueError(f"Не найдена строка с '{MARKER}'")
+
+    def _read_xlrd(self, file_path):
+        """Читает только нужные столбцы напрямую через xlrd, минуя pd.read_excel"""
+        book = xlrd.open_workbook(file_path, on_demand=True)
         try:
-            # Чтение файла
-            df = pd.read_excel(file_path, header=None)
-
-            # Поиск начала данных
-            start_idx = self._find_data_start(df)
-            df = df.iloc[start_idx + 1:].reset_index(drop=True)
-
-            # Установка заголовков
-            df.columns = df.iloc[0]
-            df = df.iloc[1:].reset_index(drop=True)
-
-            # Очистка столбцов
-            df.columns = [self._clean_column_name(str(col)) for col in df.columns]
-            df = df.loc[:, ~df.columns.str.startswith('Unnamed')]
-            df = df.loc[:, ~df.columns.str.contains('nan', case=False, na=False)]
-
-            # Проверка обязательных колонок
-            required_columns = [
-                'код инструмента',
-                'наименование инструмента',
-                'базис поставки',
-                'объем договоров в единицах измерения',
-                'объем договоров, руб.',
-                'количество договоров, шт.'
-            ]
-
-            missing = set(required_columns) - set(df.columns)
+            sheet = book.sheet_by_index(0)
+            header_idx = self._find_marker_row(sheet) + 1
+
+            positions = {}
+            for i, cell in enumerate(sheet.row_values(header_idx)):
+                positions.setdefault(self._clean_column_name(str(cell)), i)
+
+            missing = set(REQUIRED_COLUMNS) - set(positions)
             if missing:
                 raise ValueError(f"Отсутствуют столбцы: {missing}")
 
-            # Преобразование данных
-            df['количество договоров, шт.'] = pd.to_numeric(
-                df['количество договоров, шт.'], errors='coerce')
-            df = df[df['количество договоров, шт.'] > 0]
-
-            # Переименование колонок
-            df = df.rename(columns={
-                'код инструмента': 'exchange_product_id',
-                'наименование инструмента': 'exchange_product_name',
-                'базис поставки': 'delivery_basis_name',
-                'объем договоров в единицах измерения': 'volume',
-                'объем договоров, руб.': 'total',
-                'количество договоров, шт.': 'count'
-            })
+            values = {
+                name: sheet.col_values(positions[col], start_rowx=header_idx + 1)
+                for col, name in REQUIRED_COLUMNS.items()
+            }
+        finally:
+            book.release_resources()
+
+        count = pd.to_numeric(np.asarray(values['count'], dtype=object), errors='coerce')
+        mask = count > 0
+
+        df = pd.DataFrame({
+            name: np.asarray(column, dtype=object)[mask] for name, column in values.items()
+        })
+        df['volume'] = pd.to_numeric(df['volume'], errors='coerce')
+        df['total'] = pd.to_numeric(df['total'], errors='coerce')
+        df['count'] = count[mask]
+        return df
+
+    def _read_pandas(self, file_path):
+        """Читает лист целиком через pd.read_excel и очищает его"""
+        # Чтение файла
+        df = pd.read_excel(file_path, header=None)
+
+        # Поиск начала данных
+        start_idx = self._find_data_start(df)
+        df = df.iloc[start_idx + 1:].reset_index(drop=True)
+
+        # Установка заголовков
+        df.columns = df.iloc[0]
+        df = df.iloc[1:].reset_index(drop=True)
+
+        # Очистка столбцов
+        df.columns = [self._clean_column_name(str(col)) for col in df.columns]
+        df = df.loc[:, ~df.columns.str.startswith('Unnamed')]
+        df = df.loc[:, ~df.columns.str.contains('nan', case=False, na=False)]
+
+        # Проверка обязательных колонок
+        missing = set(REQUIRED_COLUMNS) - set(df.columns)
+        if missing:
+            raise ValueError(f"Отсутствуют столбцы: {missing}")
+
+        # Преобразование данных
+        df['количество договоров, шт.'] = pd.to_numeric(
+            df['количество договоров, шт.'], errors='coerce')
+        df = df[df['количество договоров, шт.'] > 0]
+
+        # Переименование колонок
+        return df.rename(columns=REQUIRED_COLUMNS)
+
+    def process_file(self, file_path):
+        """Обрабатывает файл Excel и возвращает данные"""
+        start_time = time.perf_counter()
+        try:
+            digest = None
+            if self.cache is not None and self.cache.enabled:
+                cached, digest = self.cache.get(file_path)
+                if cached is not None:
+                    self.logger.info(f"Файл взят из колоночного кеша: {file_path}")
+                    self._record(start_time, 'cache')
+                    return cached
+
+            if self.config.get('reader') == 'xlrd':
+                df = self._read_xlrd(file_path)
+            else:
+                df = self._read_pandas(file_path)
 
             # Добавление вычисляемых полей
             file_name = os.path.basename(file_path)
@@ -95,9 +156,19 @@ class FileProcessor:
                 raise ValueError(f"Не удалось извлечь дату из имени файла: {file_name}")
             df['date'] = datetime.strptime(date_match.group(1), '%Y%m%d').date()
 
+            if digest is not None:
+                self.cache.put(digest, df)
             self.logger.info(f"Файл успешно обработан: {file_path}")
+            self._record(start_time, self.config.get('reader', 'pandas'))
             return df
 
         except Exception as e:
             self.logger.error(f"Ошибка обработки файла {file_path}: {e}", exc_info=True)
-            return None
\ No newline at end of file
+            metrics.inc('spimex_parse_failures_total', processor='sync')
+            return None
+
+    def _record(self, start_time, source):
+        """Записывает время обработки файла в метрики"""
+        metrics.inc('spimex_files_parsed_total', processor='sync', source=source)
+        metrics.observe('spimex_parse_seconds', time.perf_counter() - start_time,
+                        processor='sync', source=source)
\ No newline at end of file
@@ -0,0 +1,79 @@
+import re
+
+from html import unescape
+from urllib.parse import urljoin
+from bs4 import BeautifulSoup
+
+
+LINK_PREFIX = '/upload/reports/oil_xls/oil_xls_'
+SITE_URL = "https://spimex.com"
+
+# Содержимое, которое html.parser не разбирает как разметку
+_SKIPPED_RE = re.compile(r'<!--.*?-->|<(script|style)\b.*?</\1\s*>', re.S | re.I)
+_ANCHOR_RE = re.compile(r'<a\s(?:[^>"\']|"[^"]*"|\'[^\']*\')*>', re.I)
+_ATTR_RE = re.compile(r'([^\s=/>"\']+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+)))?')
+_PAGINATION_RE = re.compile(
+    r'<div\s(?:[^>"\']|"[^"]*"|\'[^\']*\')*?class\s*=\s*["\']?(?:[^"\'>]*\s)?bx-pagination(?![\w-])', re.I)
+_DIV_RE = re.compile(r'<(/?)div\b', re.I)
+
+
+def _href(tag):
+    """Значение последнего атрибута href тега (как при разборе html.parser)"""
+    href = None
+    for name, double, single, bare in _ATTR_RE.findall(tag[2:-1]):
+        if name.lower() == 'href':
+            href = unescape(double or single or bare)
+    return href
+
+
+def _extract_links_bs4(text):
+    soup = BeautifulSoup(text, 'html.parser')
+    return [link['href'] for link in soup.find_all('a', href=True)]
+
+
+def _extract_links_fast(text):
+    if LINK_PREFIX not in text:
+        return []
+    text = _SKIPPED_RE.sub('', text)
+    return [href for href in map(_href, _ANCHOR_RE.findall(text)) if href is not None]
+
+
+def extract_file_links(text, engine='fast', site_url=SITE_URL):
+    """Возвращает полные URL файлов бюллетеней со страницы листинга.
+
+    engine='fast' ищет теги <a> регулярными выражениями без построения
+    дерева документа; 'bs4' - полный разбор BeautifulSoup. Ссылки
+    дополняются до полных относительно site_url.
+    """
+    hrefs = _extract_links_bs4(text) if engine == 'bs4' else _extract_links_fast(text)
+    return [
+        urljoin(site_url, href.split('?')[0])
+        for href in hrefs if href.startswith(LINK_PREFIX)
+    ]
+
+
+def _pagination_fragment(text):
+    """Вырезает блок div.bx-pagination, чтобы разбирать только его"""
+    match = _PAGINATION_RE.search(text)
+    if not match:
+        return None
+    depth = 0
+    for div in _DIV_RE.finditer(text, match.start()):
+        depth += -1 if div.group(1) else 1
+        if depth == 0:
+            return text[match.start():text.index('>', div.end()) + 1]
+    return text[match.start():]
+
+
+def extract_total_pages(text, engine='fast'):
+    """Возвращает число страниц из пагинации или None, если ее нет"""
+    if engine != 'bs4':
+        text = _pagination_fragment(text)
+        if text is None:
+            return None
+
+    pagination = BeautifulSoup(text, 'html.parser').find('div', class_='bx-pagination')
+    if not pagination:
+        return None
+    last_page = pagination.find_all('li')[-2].find('a')
+    return int(last_page.find('span').text.strip())
@@ -0,0 +1,93 @@
+import os
+import json
+import hashlib
+
+from config.settings import logger
+
+
+def fingerprint(body):
+    """Отпечаток тела ответа"""
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return hashlib.sha1(body).hexdigest()
+
+
+class HttpCache:
+    """Дисковый кеш валидаторов HTTP (ETag/Last-Modified) и отпечатков ответов.
+
+    Вместе с валидаторами хранится результат разбора ответа, поэтому при 304
+    или неизменившемся теле повторный разбор не нужен.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.logger = logger.getChild('HttpCache')
+        self.entries = self._load()
+        self.stats = {'not_modified': 0, 'same_body': 0, 'misses': 0}
+
+    def _load(self):
+        """Читает кеш с диска"""
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Не удалось прочитать HTTP-кеш {self.path}: {e}")
+            return {}
+
+    def save(self):
+        """Атомарно записывает кеш на диск"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def request_headers(self, key):
+        """Заголовки условного запроса для ранее сохраненного ответа"""
+        entry = self.entries.get(key)
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def not_modified(self, key):
+        """Результат для ответа 304"""
+        self.stats['not_modified'] += 1
+        return self.entries[key]['result']
+
+    def lookup(self, key, body):
+        """Возвращает (True, результат), если тело ответа не изменилось"""
+        entry = self.entries.get(key)
+        if entry and entry.get('fingerprint') == fingerprint(body):
+            self.stats['same_body'] += 1
+            return True, entry['result']
+        self.record_miss()
+        return False, None
+
+    def record_miss(self):
+        """Учитывает ответ, который пришлось обработать заново"""
+        self.stats['misses'] += 1
+
+    def store(self, key, headers, body, result):
+        """Сохраняет валидаторы, отпечаток тела и результат разбора"""
+        self.entries[key] = {
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'fingerprint': fingerprint(body) if body is not None else None,
+            'result': result
+        }
+
+    def report(self):
+        """Логирует долю попаданий в кеш и сохраняет его"""
+        hits = self.stats['not_modified'] + self.stats['same_body']
+        total = hits + self.stats['misses']
+        rate = hits / total * 100 if total else 0.0
+        self.logger.info(
+            f"HTTP-кеш: запросов {total}, попаданий {hits} ({rate:.1f}%), "
+            f"из них 304: {self.stats['not_modified']}, то же тело: {self.stats['same_body']}"
+        )
+        self.save()
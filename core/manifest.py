@@ -0,0 +1,110 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+
+from datetime import datetime
+from config.settings import logger, INGEST_CONFIG
+
+
+def file_hash(file_path, chunk_size=1024 * 1024):
+    """Считает sha256 содержимого файла"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class IngestionManifest:
+    """Локальный индекс загруженных в БД файлов.
+
+    Изменения записываются на диск не чаще раза в save_interval секунд и
+    при flush(); после аварийной остановки незаписанные файлы загрузятся
+    повторно, что безопасно для upsert.
+    """
+
+    def __init__(self, path=None, save_interval=None):
+        self.path = path or INGEST_CONFIG['manifest_path']
+        self.save_interval = INGEST_CONFIG['manifest_save_interval'] if save_interval is None else save_interval
+        self.logger = logger.getChild('IngestionManifest')
+        self.entries = self._load()
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    def _load(self):
+        """Читает манифест с диска"""
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Не удалось прочитать манифест {self.path}: {e}")
+            return {}
+
+    def save(self):
+        """Атомарно записывает манифест на диск"""
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+            self._saved_at = time.monotonic()
+
+    def _changed(self):
+        """Отмечает изменение и записывает манифест, если с прошлой записи прошло save_interval"""
+        with self._lock:
+            self._dirty = True
+            if time.monotonic() - self._saved_at >= self.save_interval:
+                self.save()
+
+    def flush(self):
+        """Записывает накопленные изменения"""
+        with self._lock:
+            if self._dirty:
+                self.save()
+
+    def needs_loading(self, file_path):
+        """Проверяет, новый ли файл или изменился ли он с последней загрузки"""
+        entry = self.entries.get(os.path.basename(file_path))
+        if entry is None:
+            return True
+
+        stat = os.stat(file_path)
+        if stat.st_size == entry['size'] and stat.st_mtime == entry['mtime']:
+            return False
+        if stat.st_size != entry['size'] or file_hash(file_path) != entry['sha256']:
+            return True
+
+        # Содержимое не изменилось, обновляем только mtime
+        with self._lock:
+            entry['mtime'] = stat.st_mtime
+            self._changed()
+        return False
+
+    def mark_loaded(self, file_path, row_count, sha256=None):
+        """Записывает файл в манифест после успешной загрузки.
+
+        sha256 - хеш, уже посчитанный вызывающим кодом вне event loop.
+        """
+        file_name = os.path.basename(file_path)
+        stat = os.stat(file_path)
+        date_match = re.search(r'(\d{8})', file_name)
+
+        entry = {
+            'trade_date': (datetime.strptime(date_match.group(1), '%Y%m%d').date().isoformat()
+                           if date_match else None),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'sha256': sha256 or file_hash(file_path),
+            'row_count': row_count,
+            'loaded_at': datetime.now().isoformat(timespec='seconds')
+        }
+        with self._lock:
+            self.entries[file_name] = entry
+            self._changed()
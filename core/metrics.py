@@ -0,0 +1,246 @@
+import os
+import json
+import time
+import bisect
+import threading
+
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config.settings import logger, METRICS_CONFIG
+
+# Границы корзин гистограмм задержек, секунды
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+DESCRIPTIONS = {
+    'spimex_pages_fetched_total': 'Загружено страниц листинга',
+    'spimex_pages_not_modified_total': 'Страниц листинга без изменений (304 или тот же отпечаток)',
+    'spimex_bytes_downloaded_total': 'Скачано байт бюллетеней',
+    'spimex_files_downloaded_total': 'Скачано файлов бюллетеней',
+    'spimex_download_failures_total': 'Неудачных загрузок файлов',
+    'spimex_download_seconds': 'Время загрузки одного файла',
+    'spimex_files_parsed_total': 'Обработано файлов',
+    'spimex_parse_failures_total': 'Ошибок обработки файлов',
+    'spimex_parse_seconds': 'Время обработки одного файла',
+    'spimex_rows_rejected_total': 'Отбраковано строк при конвертации',
+    'spimex_rows_upserted_total': 'Строк передано в upsert',
+    'spimex_row_changes_total': 'Результат upsert: вставлено, обновлено, без изменений',
+    'spimex_insert_seconds': 'Время одной вставки в БД',
+    'spimex_buffer_flushes_total': 'Сбросов буфера отложенной записи',
+    'spimex_queue_depth': 'Глубина очередей между этапами',
+    'spimex_db_pool_connections': 'Соединения пула БД',
+    'spimex_db_pool_wait_seconds': 'Ожидание свободного соединения пула БД',
+    'spimex_backfill_items_total': 'Обработано элементов очереди догрузки истории',
+    'spimex_daemon_polls_total': 'Проверок первой страницы листинга в режиме службы',
+    'spimex_daemon_last_success_timestamp': 'Время последней успешной проверки (unix)',
+}
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = [*key, *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Оценка квантиля по верхней границе корзины"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'avg': round(self.sum / self.count, 6) if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'max': round(self.max, 6),
+        }
+
+
+class MetricsRegistry:
+    """Счетчики, текущие значения и гистограммы всех этапов загрузки"""
+
+    def __init__(self):
+        self.logger = logger.getChild('MetricsRegistry')
+        self._lock = threading.Lock()
+        self.started_at = datetime.now()
+        self._server = None
+        # Функция, возвращающая состояние службы для /health ({'status': 'ok', ...})
+        self.health_check = None
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.gauges = {}
+            self.histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self.gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Замеряет время блока и записывает его в гистограмму"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        """Отчет о запуске в виде словаря"""
+        def series(metrics, convert=lambda value: value):
+            return {
+                name: [{'labels': dict(key), 'value': convert(value)} for key, value in values.items()]
+                for name, values in sorted(metrics.items())
+            }
+
+        with self._lock:
+            return {
+                'started_at': self.started_at.isoformat(timespec='seconds'),
+                'generated_at': datetime.now().isoformat(timespec='seconds'),
+                'counters': series(self.counters),
+                'gauges': series(self.gauges),
+                'histograms': series(self.histograms, Histogram.summary),
+            }
+
+    def to_prometheus(self):
+        """Текстовый формат экспозиции Prometheus"""
+        lines = []
+        with self._lock:
+            for kind, metrics in (('counter', self.counters), ('gauge', self.gauges)):
+                for name, values in sorted(metrics.items()):
+                    lines.append(f"# HELP {name} {DESCRIPTIONS.get(name, name)}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    for key, value in values.items():
+                        lines.append(f"{name}{_format_labels(key)} {value}")
+
+            for name, values in sorted(self.histograms.items()):
+                lines.append(f"# HELP {name} {DESCRIPTIONS.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in values.items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def _write(self, path, text):
+        """Атомарно записывает файл"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def write_report(self, path):
+        self._write(path, json.dumps(self.snapshot(), ensure_ascii=False, indent=2))
+
+    def write_prometheus(self, path):
+        self._write(path, self.to_prometheus())
+
+    def publish(self, config=None):
+        """Записывает отчеты, заданные в конфигурации"""
+        config = config or METRICS_CONFIG
+        try:
+            if config.get('report_path'):
+                self.write_report(config['report_path'])
+                self.logger.info(f"Отчет о запуске: {config['report_path']}")
+            if config.get('prometheus_path'):
+                self.write_prometheus(config['prometheus_path'])
+        except OSError as e:
+            self.logger.warning(f"Не удалось записать метрики: {e}")
+
+    def serve(self, port=None):
+        """Запускает HTTP-эндпоинт /metrics в фоновом потоке"""
+        port = METRICS_CONFIG['port'] if port is None else port
+        if not port or self._server is not None:
+            return None
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status = 200
+                if self.path == '/metrics':
+                    body, content_type = registry.to_prometheus(), 'text/plain; version=0.0.4'
+                elif self.path == '/report':
+                    body, content_type = json.dumps(registry.snapshot(), ensure_ascii=False), 'application/json'
+                elif self.path == '/health' and registry.health_check is not None:
+                    health = registry.health_check()
+                    status = 200 if health.get('status') == 'ok' else 503
+                    body, content_type = json.dumps(health, ensure_ascii=False, default=str), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                body = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', f"{content_type}; charset=utf-8")
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('0.0.0.0', port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self.logger.info(f"Метрики доступны на http://0.0.0.0:{self._server.server_port}/metrics")
+        return self._server
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,99 @@
+import os
+import re
+
+from concurrent.futures import ProcessPoolExecutor
+from config.settings import logger, CACHE_CONFIG
+from core.columnar_cache import ColumnarCache
+from core.database import DatabaseManager
+from core.file_processor import FileProcessor
+from core.row_converter import RowConverter
+from core.write_buffer import WriteBuffer
+
+
+def shard_by_date(file_paths, workers):
+    """Делит файлы между процессами по дате торгов.
+
+    Все файлы одной даты попадают в один шард и загружаются в порядке имен,
+    поэтому ключи (продукт, дата) разных процессов не пересекаются, а при
+    повторной публикации бюллетеня последним всегда записывается один и тот же файл.
+    """
+    dates = {}
+    for file_path in sorted(set(file_paths)):
+        match = re.search(r'(\d{8})', os.path.basename(file_path))
+        dates.setdefault(match.group(1) if match else '', []).append(file_path)
+
+    shards = [[] for _ in range(workers)]
+    for i, trade_date in enumerate(sorted(dates)):
+        shards[i % workers].extend(dates[trade_date])
+    return shards
+
+
+def load_shard(file_paths):
+    """Загружает шард в отдельном процессе со своим FileProcessor и соединением с БД.
+
+    Возвращает загруженные файлы (путь, строки) - манифест обновляет родительский процесс.
+    """
+    cache = ColumnarCache() if CACHE_CONFIG['columnar_cache'] else None
+    file_processor = FileProcessor(cache=cache)
+    converter = RowConverter()
+    loaded = []
+    parse_failed = 0
+
+    with DatabaseManager() as db:
+        # Без потока сброса по времени: пачка пишется при наборе max_rows строк и в конце шарда
+        buffer = WriteBuffer(db, lambda file_path, rows: loaded.append((file_path, rows)))
+        for file_path in file_paths:
+            df = file_processor.process_file(file_path)
+            if df is None:
+                parse_failed += 1
+                continue
+            buffer.add(file_path, converter.to_rows(df))
+        stats = buffer.close()
+
+    return {
+        'loaded': loaded,
+        'failed': parse_failed + stats['failed_files'],
+        'changes': db.changes,
+    }
+
+
+class ParallelLoader:
+    """Загрузка файлов в БД пулом процессов: шарды по датам, общий итог и манифест в родителе"""
+
+    def __init__(self, workers, on_loaded=None):
+        self.workers = workers
+        self.on_loaded = on_loaded
+        self.logger = logger.getChild('ParallelLoader')
+
+    def run(self, file_paths):
+        """Загружает файлы и возвращает сводку по всем процессам"""
+        shards = [shard for shard in shard_by_date(file_paths, self.workers) if shard]
+        summary = {
+            'submitted': sum(map(len, shards)), 'loaded': 0, 'failed': 0, 'rows': 0,
+            'changes': {'inserted': 0, 'updated': 0, 'unchanged': 0},
+        }
+        if not shards:
+            return summary
+
+        self.logger.info(f"Файлов: {summary['submitted']}, процессов: {len(shards)}")
+        with ProcessPoolExecutor(max_workers=len(shards)) as executor:
+            futures = [executor.submit(load_shard, shard) for shard in shards]
+            # Итоги шардов объединяются в порядке шардов, а не завершения процессов
+            for i, future in enumerate(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    self.logger.error(f"Шард {i} не загружен: {e}", exc_info=True)
+                    summary['failed'] += len(shards[i])
+                    continue
+
+                for file_path, rows in result['loaded']:
+                    if self.on_loaded is not None:
+                        self.on_loaded(file_path, rows)
+                    summary['rows'] += rows
+                summary['loaded'] += len(result['loaded'])
+                summary['failed'] += result['failed']
+                for key, rows in result['changes'].items():
+                    summary['changes'][key] += rows
+                self.logger.info(f"Шард {i}: файлов {len(result['loaded'])}, ошибок {result['failed']}")
+        return summary
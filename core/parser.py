@@ -1,22 +1,46 @@
 import os
 import requests
 
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from datetime import datetime, date
-from urllib.parse import urljoin
 from config.settings import logger, PARSER_CONFIG
+from core.http_cache import HttpCache
+from core.metrics import metrics
+from core.html_extract import SITE_URL, extract_file_links, extract_total_pages
+from core.request_controller import RequestController
 
 
 
 class SpimexParser:
-    def __init__(self, config=None):
+    def __init__(self, config=None, on_file=None):
         self.config = config or PARSER_CONFIG
+        self.on_file = on_file
         self.config['start_date'] = self._ensure_date(self.config['start_date'])
         self.config['end_date'] = self._ensure_date(self.config['end_date'])
 
         os.makedirs(self.config['download_dir'], exist_ok=True)
         self.logger = logger.getChild('SpimexParser')
         self._should_stop = False
+        self._page_links = {}
+        cache_path = self.config.get('http_cache_path')
+        self.http_cache = HttpCache(cache_path) if cache_path else None
+        self.http = RequestController()
+        self.failed_downloads = []
+        self.session = self._create_session()
+
+    def _create_session(self):
+        """Создает сессию с пулом keep-alive соединений"""
+        session = requests.Session()
+        pool_size = self.config.get('http_pool_size', 10)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def close(self):
+        """Закрывает соединения сессии"""
+        self.session.close()
 
     def _ensure_date(self, dt):
         """Приводит дату к типу datetime.date"""
@@ -26,23 +50,41 @@ class SpimexParser:
             return dt
         raise ValueError(f"Неподдерживаемый тип даты: {type(dt)}")
 
+    def _fetch_page(self, url, kind, parse):
+        """Загружает страницу условным запросом и разбирает ее, только если она изменилась"""
+        key = f"{kind}:{url}"
+        headers = self.http_cache.request_headers(key) if self.http_cache else {}
+        response = self.http.request(self.session.get, url, headers=headers, timeout=10)
+        metrics.inc('spimex_pages_fetched_total', parser='sync')
+        if headers and response.status_code == 304:
+            metrics.inc('spimex_pages_not_modified_total', parser='sync')
+            return self.http_cache.not_modified(key)
+        response.raise_for_status()
+
+        if self.http_cache:
+            found, result = self.http_cache.lookup(key, response.text)
+            if found:
+                metrics.inc('spimex_pages_not_modified_total', parser='sync')
+            else:
+                result = parse(response.text)
+            self.http_cache.store(key, response.headers, response.text, result)
+            return result
+        return parse(response.text)
+
+    def _parse_total_pages(self, text):
+        """Извлекает количество страниц из пагинации"""
+        total_pages = extract_total_pages(text, self.config.get('html_engine', 'fast'))
+        if total_pages is not None:
+            self.logger.debug(f"Найдено страниц: {total_pages}")
+            return total_pages
+
+        self.logger.debug("Пагинация не найдена, предполагаем 1 страницу")
+        return 1
+
     def get_total_pages(self):
         """Получает общее количество страниц"""
         try:
-            response = requests.get(self.config['base_url'], timeout=10)
-            response.raise_for_status()
-
-            soup = BeautifulSoup(response.text, 'html.parser')
-            pagination = soup.find('div', class_='bx-pagination')
-
-            if pagination:
-                last_page = pagination.find_all('li')[-2].find('a')
-                total_pages = int(last_page.find('span').text.strip())
-                self.logger.debug(f"Найдено страниц: {total_pages}")
-                return total_pages
-
-            self.logger.debug("Пагинация не найдена, предполагаем 1 страницу")
-            return 1
+            return self._fetch_page(self.config['base_url'], 'pages', self._parse_total_pages)
         except Exception as e:
             self.logger.error(f"Ошибка получения количества страниц: {e}", exc_info=True)
             return 1
@@ -74,25 +116,91 @@ class SpimexParser:
                 self._should_stop = True
                 return False
 
-            if os.path.exists(file_name):
-                self.logger.debug(f"Файл существует: {file_name}")
+            if file_date > self.config['end_date']:
+                self.logger.debug(f"Пропуск {file_name}: дата {file_date} > end_date {self.config['end_date']}")
                 return True
 
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
+            if os.path.exists(file_name) and not self._should_revalidate(url):
+                self.logger.debug(f"Файл существует: {file_name}")
+                self._emit(file_name)
+                return True
 
-            with open(file_name, 'wb') as f:
-                f.write(response.content)
+            with metrics.timer('spimex_download_seconds', parser='sync'):
+                downloaded = self._stream_to_file(url, file_name)
+            if not downloaded:
+                self.logger.debug(f"Файл не изменился: {file_name}")
+                self._emit(file_name)
+                return True
+            os.replace(f"{file_name}.part", file_name)
 
+            metrics.inc('spimex_files_downloaded_total', parser='sync')
             self.logger.info(f"Скачан файл: {file_name}")
+            self._emit(file_name)
             return True
 
         except requests.exceptions.RequestException as e:
             self.logger.error(f"Ошибка сети: {str(e)}")
+            self.failed_downloads.append(url)
+            metrics.inc('spimex_download_failures_total', parser='sync')
             return True
         except Exception as e:
             self.logger.error(f"Ошибка загрузки: {str(e)}")
+            self.failed_downloads.append(url)
+            metrics.inc('spimex_download_failures_total', parser='sync')
+            return True
+
+    def _emit(self, file_name):
+        """Передает готовый файл следующему этапу конвейера"""
+        if self.on_file is not None:
+            self.on_file(file_name)
+
+    def _should_revalidate(self, url):
+        """Нужно ли проверить уже скачанный файл условным запросом"""
+        return bool(self.config.get('revalidate_files') and self.http_cache
+                    and f"file:{url}" in self.http_cache.entries)
+
+    def _stream_to_file(self, url, file_name):
+        """Скачивает файл частями в .part, докачивая его через Range после обрыва.
+
+        Возвращает False, если сервер ответил 304 на проверку скачанного файла.
+        """
+        key = f"file:{url}"
+        part_name = f"{file_name}.part"
+        offset = os.path.getsize(part_name) if os.path.exists(part_name) else 0
+        headers = {'Range': f"bytes={offset}-"} if offset else {}
+        if os.path.exists(file_name) and self._should_revalidate(url):
+            headers.update(self.http_cache.request_headers(key))
+
+        response = self.http.request(self.session.get, url, headers=headers, stream=True, timeout=10)
+        try:
+            if 'If-None-Match' in headers or 'If-Modified-Since' in headers:
+                if response.status_code == 304:
+                    self.http_cache.not_modified(key)
+                    return False
+                self.http_cache.record_miss()
+
+            if offset and response.status_code == 416:
+                # Сервер не может отдать продолжение: начинаем загрузку заново,
+                # сначала освободив слот лимита запросов
+                response.close()
+                os.remove(part_name)
+                return self._stream_to_file(url, file_name)
+            response.raise_for_status()
+
+            mode = 'ab' if offset and response.status_code == 206 else 'wb'
+            size = 0
+            with open(part_name, mode) as f:
+                for chunk in response.iter_content(chunk_size=self.config.get('chunk_size', 65536)):
+                    if chunk:
+                        f.write(chunk)
+                        size += len(chunk)
+            metrics.inc('spimex_bytes_downloaded_total', size, parser='sync')
+
+            if self.http_cache:
+                self.http_cache.store(key, response.headers, None, True)
             return True
+        finally:
+            response.close()
 
     def parse_page(self, page_url):
         """Парсит страницу, возвращает список URL файлов"""
@@ -100,53 +208,95 @@ class SpimexParser:
             return []
 
         try:
-            response = requests.get(page_url, timeout=10)
-            response.raise_for_status()
-
-            soup = BeautifulSoup(response.text, 'html.parser')
-            files = []
-
-            for link in soup.find_all('a', href=True):
-                href = link['href']
-                if href.startswith('/upload/reports/oil_xls/oil_xls_'):
-                    full_url = urljoin("https://spimex.com", href.split('?')[0])
-                    files.append(full_url)
-                    self.logger.debug(f"Найдена ссылка: {full_url}")
-
-            return files
-
+            return self._fetch_page(page_url, 'links', self._extract_links)
         except Exception as e:
             self.logger.error(f"Ошибка парсинга страницы: {str(e)}")
             return []
 
+    def _extract_links(self, text):
+        """Извлекает ссылки на файлы бюллетеней"""
+        files = extract_file_links(text, self.config.get('html_engine', 'fast'),
+                                   self.config.get('site_url', SITE_URL))
+        self.logger.debug(f"Найдено ссылок: {len(files)}")
+        return files
+
+    def _get_page_links(self, page):
+        """Возвращает ссылки страницы, загружая каждую страницу не более одного раза"""
+        links = self._page_links.get(page)
+        if links is None:
+            links = self.parse_page(f"{self.config['base_url']}?page=page-{page}")
+            # Пустой результат (ошибка загрузки или пустая страница) не кешируем: обход запросит страницу снова
+            if links:
+                self._page_links[page] = links
+        return links
+
+    def _reaches_end_date(self, page):
+        """Проверяет, есть ли на странице файлы не новее end_date"""
+        dates = [d for d in map(self.parse_date_from_filename, self._get_page_links(page)) if d]
+        # Страницу без распознанных дат не пропускаем
+        return not dates or min(dates) <= self.config['end_date']
+
+    def find_first_page(self, total_pages):
+        """Бинарным поиском находит первую страницу, пересекающую диапазон дат"""
+        if total_pages <= 1 or self._reaches_end_date(1):
+            return 1
+
+        low, high = 2, total_pages
+        while low < high:
+            middle = (low + high) // 2
+            if self._reaches_end_date(middle):
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
     def run(self):
         """Основной метод запуска парсера"""
         try:
             self.logger.info(f"Старт парсера. Диапазон: {self.config['start_date']} - {self.config['end_date']}")
+            self._page_links = {}
 
             total_pages = self.get_total_pages()
             if total_pages == 0:
                 self.logger.warning("Нет страниц для обработки")
                 return False
 
-            for page in range(1, total_pages + 1):
-                if self._should_stop:
-                    break
-
-                self.logger.info(f"Страница {page}/{total_pages}")
-                page_url = f"{self.config['base_url']}?page=page-{page}"
-
-                file_urls = self.parse_page(page_url)
-                if not file_urls:
-                    self.logger.debug("Нет файлов на странице")
-                    continue
+            first_page = self.find_first_page(total_pages)
+            if first_page > 1:
+                self.logger.info(f"Пропущено страниц новее end_date: {first_page - 1}")
 
-                for file_url in file_urls:
-                    if not self.download_file(file_url):
+            download_workers = self.config.get('download_workers', 1)
+            executor = ThreadPoolExecutor(max_workers=download_workers) if download_workers > 1 else None
+            try:
+                for page in range(first_page, total_pages + 1):
+                    if self._should_stop:
                         break
 
+                    self.logger.info(f"Страница {page}/{total_pages}")
+                    file_urls = self._get_page_links(page)
+                    self._page_links.pop(page, None)
+                    if not file_urls:
+                        self.logger.debug("Нет файлов на странице")
+                        continue
+
+                    if executor:
+                        list(executor.map(self.download_file, file_urls))
+                        continue
+
+                    for file_url in file_urls:
+                        if not self.download_file(file_url):
+                            break
+            finally:
+                if executor:
+                    executor.shutdown()
+
+            if self.http_cache:
+                self.http_cache.report()
+            if self.failed_downloads:
+                self.logger.error(
+                    f"Не удалось скачать файлов: {len(self.failed_downloads)}: {self.failed_downloads}")
             return not self._should_stop
 
         except Exception as e:
             self.logger.critical(f"Критическая ошибка: {str(e)}", exc_info=True)
-            return False
\ No newline at end of file
+            return False
@@ -0,0 +1,102 @@
+import queue
+import threading
+
+from config.settings import logger, PIPELINE_CONFIG
+from core.metrics import metrics
+
+
+class Pipeline:
+    """Конвейер обработка файла -> загрузка в БД на потоках и ограниченных очередях"""
+
+    def __init__(self, process, load, config=None):
+        self.config = config or PIPELINE_CONFIG
+        self.process = process
+        self.load = load
+        self.logger = logger.getChild('Pipeline')
+        self.parse_queue = queue.Queue(maxsize=self.config['queue_size'])
+        self.load_queue = queue.Queue(maxsize=self.config['queue_size'])
+        self.stats = {'submitted': 0, 'parsed': 0, 'loaded': 0, 'failed': 0, 'rows': 0}
+        self._seen = set()
+        self._lock = threading.Lock()
+        self._parse_threads = []
+        self._load_threads = []
+
+    def _count(self, key, value=1):
+        with self._lock:
+            self.stats[key] += value
+
+    def _report_depth(self):
+        """Публикует глубину очередей между этапами"""
+        metrics.set_gauge('spimex_queue_depth', self.parse_queue.qsize(), pipeline='sync', queue='parse')
+        metrics.set_gauge('spimex_queue_depth', self.load_queue.qsize(), pipeline='sync', queue='load')
+
+    def start(self):
+        """Запускает потоки этапов обработки и загрузки"""
+        self._parse_threads = [
+            threading.Thread(target=self._parse_worker, name=f"parse-{i}", daemon=True)
+            for i in range(self.config['parse_concurrency'])
+        ]
+        self._load_threads = [
+            threading.Thread(target=self._load_worker, name=f"load-{i}", daemon=True)
+            for i in range(self.config['load_concurrency'])
+        ]
+        for thread in self._parse_threads + self._load_threads:
+            thread.start()
+        return self
+
+    def submit(self, file_path):
+        """Ставит файл в очередь обработки, блокируясь при заполненной очереди"""
+        with self._lock:
+            if file_path in self._seen:
+                return False
+            self._seen.add(file_path)
+            self.stats['submitted'] += 1
+        self.parse_queue.put(file_path)
+        self._report_depth()
+        return True
+
+    def join(self):
+        """Дожидается обработки всех файлов и возвращает сводку"""
+        for _ in self._parse_threads:
+            self.parse_queue.put(None)
+        for thread in self._parse_threads:
+            thread.join()
+        for _ in self._load_threads:
+            self.load_queue.put(None)
+        for thread in self._load_threads:
+            thread.join()
+        return dict(self.stats)
+
+    def _parse_worker(self):
+        while True:
+            file_path = self.parse_queue.get()
+            self._report_depth()
+            if file_path is None:
+                return
+            try:
+                result = self.process(file_path)
+            except Exception as e:
+                self.logger.error(f"Ошибка обработки файла {file_path}: {e}", exc_info=True)
+                result = None
+
+            if result is None:
+                self._count('failed')
+                continue
+            self._count('parsed')
+            self.load_queue.put((file_path, result))
+
+    def _load_worker(self):
+        while True:
+            item = self.load_queue.get()
+            self._report_depth()
+            if item is None:
+                return
+            file_path, result = item
+            try:
+                rows = self.load(file_path, result)
+            except Exception as e:
+                self.logger.error(f"Ошибка загрузки файла {file_path} в БД: {e}", exc_info=True)
+                self._count('failed')
+                continue
+            self._count('loaded')
+            self._count('rows', rows or 0)
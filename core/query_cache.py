@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import pickle
+import threading
+
+from collections import OrderedDict
+from config.settings import logger, QUERY_CACHE_CONFIG
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class MemoryCacheBackend:
+    """LRU-кеш в памяти процесса с ограничением размера и TTL записей.
+
+    generation_path - файл-маркер поколения, общий для процессов на одной
+    машине: invalidate() перезаписывает его, а остальные процессы сбрасывают
+    свои записи при следующем обращении, заметив смену файла.
+    """
+
+    def __init__(self, max_entries=1024, generation_path=None):
+        self.max_entries = max_entries
+        self.generation_path = generation_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = self._read_generation()
+
+    def _read_generation(self):
+        if not self.generation_path:
+            return None
+        try:
+            stat = os.stat(self.generation_path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _sync_generation(self):
+        """Сбрасывает записи, если кеш сбросил другой процесс"""
+        generation = self._read_generation()
+        if generation != self._generation:
+            self._entries.clear()
+            self._generation = generation
+
+    def get(self, key):
+        """Возвращает (найдено, значение)"""
+        with self._lock:
+            self._sync_generation()
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._sync_generation()
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            if self.generation_path:
+                os.makedirs(os.path.dirname(self.generation_path) or '.', exist_ok=True)
+                tmp_path = f"{self.generation_path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(str(time.time_ns()))
+                os.replace(tmp_path, self.generation_path)
+            self._generation = self._read_generation()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCacheBackend:
+    """Кеш в Redis или совместимом хранилище.
+
+    Клиенту нужны только get, set(ex=...) и incr. Инвалидация увеличивает
+    номер поколения, входящий в ключи, а старые записи истекают по TTL.
+    """
+
+    def __init__(self, client, key_prefix='spimex:query:'):
+        self.client = client
+        self.key_prefix = key_prefix
+        self._generation_key = f"{key_prefix}generation"
+
+    def _key(self, key):
+        generation = int(self.client.get(self._generation_key) or 0)
+        return f"{self.key_prefix}{generation}:{key}"
+
+    def get(self, key):
+        raw = self.client.get(self._key(key))
+        if raw is None:
+            return False, None
+        return True, pickle.loads(raw)
+
+    def set(self, key, value, ttl):
+        self.client.set(self._key(key), pickle.dumps(value), ex=max(1, int(ttl)))
+
+    def invalidate(self):
+        self.client.incr(self._generation_key)
+
+
+def create_backend(config=None):
+    """Создает хранилище кеша по конфигурации"""
+    config = config or QUERY_CACHE_CONFIG
+    if config.get('backend') == 'redis':
+        if redis is None:
+            logger.getChild('QueryCache').warning("Пакет redis не установлен, используется кеш в памяти")
+        else:
+            client = redis.Redis.from_url(config['redis_url'])
+            return RedisCacheBackend(client, config.get('key_prefix', 'spimex:query:'))
+    return MemoryCacheBackend(config.get('max_entries', 1024), config.get('generation_path'))
+
+
+class QueryCache:
+    """Read-through кеш результатов запросов, сбрасывается после загрузки новых бюллетеней"""
+
+    def __init__(self, backend=None, config=None):
+        self.config = config or QUERY_CACHE_CONFIG
+        self.backend = backend if backend is not None else create_backend(self.config)
+        self.logger = logger.getChild('QueryCache')
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+        self.generation = 0
+
+    def make_key(self, name, params):
+        """Ключ запроса: имя метода и параметры"""
+        return f"{name}:{json.dumps(params, sort_keys=True, default=str, ensure_ascii=False)}"
+
+    def get(self, key):
+        try:
+            found, value = self.backend.get(key)
+        except Exception as e:
+            self.logger.warning(f"Ошибка чтения кеша запросов: {e}")
+            found, value = False, None
+        self.stats['hits' if found else 'misses'] += 1
+        return found, value
+
+    def set(self, key, value, ttl=None):
+        try:
+            self.backend.set(key, value, self.config.get('ttl', 300) if ttl is None else ttl)
+        except Exception as e:
+            self.logger.warning(f"Ошибка записи кеша запросов: {e}")
+
+    def invalidate(self):
+        """Сбрасывает все закешированные результаты"""
+        self.generation += 1
+        try:
+            self.backend.invalidate()
+            self.stats['invalidations'] += 1
+        except Exception as e:
+            self.logger.warning(f"Не удалось сбросить кеш запросов: {e}")
@@ -0,0 +1,151 @@
+import time
+import random
+import threading
+import requests
+
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from config.settings import logger, HTTP_CONFIG
+
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def parse_retry_after(value):
+    """Переводит заголовок Retry-After (секунды или HTTP-дата) в секунды"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay(attempt, config, retry_after=None):
+    """Задержка перед повтором: Retry-After или экспонента с полным джиттером"""
+    if retry_after is not None:
+        return min(retry_after, config['backoff_max'])
+    return random.uniform(0, min(config['backoff_max'], config['backoff_base'] * 2 ** attempt))
+
+
+class AimdLimiter:
+    """Лимит одновременных запросов, регулируемый по схеме AIMD.
+
+    Пока ответы быстрые и без ошибок, лимит растет на 1 за "окно" запросов;
+    при 429/5xx, сетевых ошибках или росте задержки - уменьшается в decrease_factor раз.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.limit = float(config['initial_concurrency'])
+        self.latency = None
+
+    def on_success(self, latency):
+        """Учитывает успешный ответ"""
+        if self.latency is not None and latency > self.latency * self.config['latency_factor']:
+            self.on_overload()
+        else:
+            self.limit = min(self.config['max_concurrency'], self.limit + 1 / self.limit)
+        self.latency = latency if self.latency is None else 0.9 * self.latency + 0.1 * latency
+
+    def on_overload(self):
+        """Учитывает признак перегрузки сервера"""
+        self.limit = max(self.config['min_concurrency'], self.limit * self.config['decrease_factor'])
+
+
+class RequestController:
+    """Повторы с экспоненциальной задержкой и адаптивный лимит параллельности для requests"""
+
+    def __init__(self, config=None):
+        self.config = config or HTTP_CONFIG
+        self.logger = logger.getChild('RequestController')
+        self.limiter = AimdLimiter(self.config)
+        self._active = 0
+        self._condition = threading.Condition()
+
+    def _acquire(self):
+        with self._condition:
+            while self._active >= int(self.limiter.limit):
+                self._condition.wait()
+            self._active += 1
+
+    def _release(self):
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    def _finish(self, start):
+        """Освобождает слот после чтения ответа и учитывает задержку вместе с телом"""
+        self._release()
+        self.limiter.on_success(time.perf_counter() - start)
+
+    def request(self, send, url, **kwargs):
+        """Выполняет send(url, **kwargs) с повторами при 429/5xx и сетевых ошибках.
+
+        Потоковый ответ (stream=True) занимает слот лимита до close().
+        """
+        max_retries = self.config['max_retries']
+        for attempt in range(max_retries + 1):
+            self._acquire()
+            start = time.perf_counter()
+            try:
+                response = send(url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self._release()
+                self.limiter.on_overload()
+                if attempt == max_retries:
+                    raise
+                delay = backoff_delay(attempt, self.config)
+                self.logger.warning(f"Ошибка сети для {url}: {e}. Повтор через {delay:.1f} с")
+                time.sleep(delay)
+                continue
+            except BaseException:
+                self._release()
+                raise
+
+            if response.status_code in RETRY_STATUSES and attempt < max_retries:
+                self._release()
+                self.limiter.on_overload()
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                delay = backoff_delay(attempt, self.config, retry_after)
+                self.logger.warning(f"Ответ {response.status_code} для {url}. Повтор через {delay:.1f} с")
+                response.close()
+                time.sleep(delay)
+                continue
+
+            if kwargs.get('stream'):
+                return ControlledResponse(response, lambda start=start: self._finish(start))
+            # Без stream requests уже прочитал тело ответа
+            self._finish(start)
+            return response
+
+
+class ControlledResponse:
+    """Потоковый ответ requests, удерживающий слот лимита до close()"""
+
+    def __init__(self, response, on_close):
+        self._response = response
+        self._on_close = on_close
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        on_close, self._on_close = self._on_close, None
+        if on_close is None:
+            return
+        try:
+            self._response.close()
+        finally:
+            on_close()
@@ -0,0 +1,71 @@
+import pandas as pd
+
+from config.settings import logger
+from core.metrics import metrics
+from core.sql import TRADING_RESULTS_COLUMNS
+
+
+STRING_COLUMNS = (
+    'exchange_product_id',
+    'exchange_product_name',
+    'oil_id',
+    'delivery_basis_id',
+    'delivery_basis_name',
+    'delivery_type_id',
+)
+FLOAT_COLUMNS = ('volume', 'total')
+
+
+class RowConverter:
+    """Векторно преобразует обработанный DataFrame в строки для загрузки в БД"""
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size
+        self.logger = logger.getChild('RowConverter')
+
+    def to_columns(self, df):
+        """Возвращает (столбцы в порядке TRADING_RESULTS_COLUMNS, отбракованные строки)"""
+        volume = pd.to_numeric(df['volume'], errors='coerce')
+        total = pd.to_numeric(df['total'], errors='coerce')
+        count = pd.to_numeric(df['count'], errors='coerce')
+        product_id = df['exchange_product_id']
+
+        valid = (
+            volume.notna() & total.notna() & count.notna() & df['date'].notna()
+            & product_id.notna() & (product_id.astype(str).str.strip() != '')
+        )
+        rejected = df[~valid]
+        if not rejected.empty:
+            self.logger.warning(
+                f"Отбраковано строк: {len(rejected)}, "
+                f"например: {rejected.head(3).to_dict('records')}"
+            )
+
+        mask = valid.to_numpy()
+        columns = {
+            col: df[col][mask].fillna('').astype(str).tolist() for col in STRING_COLUMNS
+        }
+        columns['volume'] = volume[mask].astype('float64').tolist()
+        columns['total'] = total[mask].astype('float64').tolist()
+        columns['count'] = count[mask].astype('int64').tolist()
+        columns['date'] = df['date'][mask].tolist()
+
+        return [columns[col] for col in TRADING_RESULTS_COLUMNS], rejected
+
+    def to_rows(self, df):
+        """Строки для загрузки в БД в порядке TRADING_RESULTS_COLUMNS"""
+        columns, rejected = self.to_columns(df)
+        if not rejected.empty:
+            metrics.inc('spimex_rows_rejected_total', len(rejected))
+        return list(zip(*columns))
+
+    def iter_batches(self, df):
+        """Отдает строки пачками по batch_size (все строки одной пачкой, если не задан)"""
+        rows = self.to_rows(df)
+        if not self.batch_size:
+            if rows:
+                yield rows
+            return
+
+        for start in range(0, len(rows), self.batch_size):
+            yield rows[start:start + self.batch_size]
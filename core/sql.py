@@ -0,0 +1,415 @@
+import re
+from datetime import timedelta
+
+
+TRADING_RESULTS_COLUMNS = (
+    'exchange_product_id',
+    'exchange_product_name',
+    'oil_id',
+    'delivery_basis_id',
+    'delivery_basis_name',
+    'delivery_type_id',
+    'volume',
+    'total',
+    'count',
+    'date',
+)
+
+STAGING_TABLE = 'spimex_staging'
+
+# Предыдущая пачка в той же транзакции (пересборка таблицы) оставляет свою
+# временную таблицу: ON COMMIT DROP срабатывает только при фиксации
+CREATE_STAGING_TABLE = f"""
+    DROP TABLE IF EXISTS pg_temp.{STAGING_TABLE};
+    CREATE TEMP TABLE {STAGING_TABLE} (
+        exchange_product_id VARCHAR(20),
+        exchange_product_name TEXT,
+        oil_id VARCHAR(4),
+        delivery_basis_id VARCHAR(3),
+        delivery_basis_name TEXT,
+        delivery_type_id VARCHAR(1),
+        volume NUMERIC(15, 2),
+        total NUMERIC(15, 2),
+        count INTEGER,
+        date DATE
+    ) ON COMMIT DROP
+"""
+
+# Общая часть upsert: строки без изменений не перезаписываются, чтобы
+# повторная загрузка истории не порождала мертвые версии строк и WAL
+UPSERT_ON_CONFLICT = """
+    ON CONFLICT (exchange_product_id, date)
+    DO UPDATE SET
+        exchange_product_name = EXCLUDED.exchange_product_name,
+        oil_id = EXCLUDED.oil_id,
+        delivery_basis_id = EXCLUDED.delivery_basis_id,
+        delivery_basis_name = EXCLUDED.delivery_basis_name,
+        delivery_type_id = EXCLUDED.delivery_type_id,
+        volume = EXCLUDED.volume,
+        total = EXCLUDED.total,
+        count = EXCLUDED.count,
+        updated_on = CURRENT_TIMESTAMP
+    WHERE (t.exchange_product_name, t.oil_id, t.delivery_basis_id, t.delivery_basis_name,
+           t.delivery_type_id, t.volume, t.total, t.count)
+        IS DISTINCT FROM
+          (EXCLUDED.exchange_product_name, EXCLUDED.oil_id, EXCLUDED.delivery_basis_id,
+           EXCLUDED.delivery_basis_name, EXCLUDED.delivery_type_id, EXCLUDED.volume,
+           EXCLUDED.total, EXCLUDED.count)
+"""
+
+UPSERT_ROW = f"""
+    INSERT INTO spimex_trading_results AS t (
+        exchange_product_id, exchange_product_name, oil_id,
+        delivery_basis_id, delivery_basis_name, delivery_type_id,
+        volume, total, count, date
+    ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+    {UPSERT_ON_CONFLICT}
+"""
+
+# Подготовленный на соединении psycopg2 upsert: сервер разбирает и планирует
+# запрос один раз, а не для каждой строки executemany (asyncpg готовит сам)
+PREPARE_UPSERT_ROW = f"""
+    PREPARE spimex_upsert_row (varchar, text, varchar, varchar, text, varchar, numeric, numeric, integer, date)
+    AS {UPSERT_ROW}
+"""
+EXECUTE_UPSERT_ROW = "EXECUTE spimex_upsert_row (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+
+# Строки, вставленные или обновленные в текущей транзакции, по ключам пачки:
+# у новых created_on, а у обновленных updated_on равны времени начала транзакции
+COUNT_CHANGES_BY_KEYS = """
+    SELECT
+        count(*) FILTER (WHERE t.created_on = CURRENT_TIMESTAMP),
+        count(*) FILTER (WHERE t.updated_on = CURRENT_TIMESTAMP AND t.created_on <> CURRENT_TIMESTAMP)
+    FROM spimex_trading_results t
+    JOIN (SELECT DISTINCT * FROM unnest($1::text[], $2::date[])) AS k (exchange_product_id, date)
+        ON t.exchange_product_id = k.exchange_product_id AND t.date = k.date
+"""
+
+# DISTINCT ON защищает от ошибки "ON CONFLICT DO UPDATE command cannot affect
+# row a second time", если в одной пачке ключ (продукт, дата) встречается дважды
+# (менеджеры БД заранее оставляют последнюю строку ключа через latest_rows);
+# xmax = 0 у строки, вставленной этим запросом, а не обновленной
+MERGE_FROM_STAGING = f"""
+    WITH merged AS (
+        INSERT INTO spimex_trading_results AS t (
+            exchange_product_id, exchange_product_name, oil_id,
+            delivery_basis_id, delivery_basis_name, delivery_type_id,
+            volume, total, count, date
+        )
+        SELECT DISTINCT ON (exchange_product_id, date)
+            exchange_product_id, exchange_product_name, oil_id,
+            delivery_basis_id, delivery_basis_name, delivery_type_id,
+            volume, total, count, date
+        FROM {STAGING_TABLE}
+        ORDER BY exchange_product_id, date
+        {UPSERT_ON_CONFLICT}
+        RETURNING xmax = 0 AS inserted
+    )
+    SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM merged
+"""
+
+
+def latest_rows(data):
+    """Оставляет по одной строке на ключ (продукт, дата) - последнюю в пачке.
+
+    В пачке буфера записи строки идут в порядке файлов, поэтому при повторной
+    публикации бюллетеня побеждает более поздний файл, а не произвольная строка DISTINCT ON.
+    """
+    latest = {}
+    for row in data:
+        latest[(row[0], row[9])] = row
+    return data if len(latest) == len(data) else list(latest.values())
+
+
+def change_counts(data, inserted, updated):
+    """Сводка upsert пачки: вставлено, обновлено и не изменилось (по уникальным ключам)"""
+    keys = len({(row[0], row[9]) for row in data})
+    return {'inserted': inserted, 'updated': updated, 'unchanged': max(keys - inserted - updated, 0)}
+
+
+TABLE_EXISTS = "SELECT to_regclass('spimex_trading_results') IS NOT NULL"
+
+TABLE_IS_PARTITIONED = """
+    SELECT EXISTS (
+        SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('spimex_trading_results')
+    )
+"""
+
+# Секционированная по месяцам таблица: первичный и уникальный ключи обязаны
+# включать ключ секционирования, по дате вместо B-tree используется BRIN
+CREATE_PARTITIONED_TABLE = """
+    CREATE TABLE spimex_trading_results (
+        id SERIAL,
+        exchange_product_id VARCHAR(20),
+        exchange_product_name TEXT,
+        oil_id VARCHAR(4),
+        delivery_basis_id VARCHAR(3),
+        delivery_basis_name TEXT,
+        delivery_type_id VARCHAR(1),
+        volume NUMERIC(15, 2),
+        total NUMERIC(15, 2),
+        count INTEGER,
+        date DATE NOT NULL,
+        created_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id, date),
+        CONSTRAINT unique_exchange_product_id_date UNIQUE (exchange_product_id, date)
+    ) PARTITION BY RANGE (date);
+
+    CREATE INDEX idx_spimex_date_brin ON spimex_trading_results USING BRIN (date);
+    CREATE INDEX idx_spimex_product_id ON spimex_trading_results (exchange_product_id);
+"""
+
+RENAME_TO_HEAP = """
+    ALTER TABLE spimex_trading_results RENAME TO spimex_trading_results_heap;
+    ALTER TABLE spimex_trading_results_heap
+        RENAME CONSTRAINT spimex_trading_results_pkey TO spimex_trading_results_heap_pkey;
+    ALTER TABLE spimex_trading_results_heap
+        RENAME CONSTRAINT unique_exchange_product_id_date TO unique_exchange_product_id_date_heap;
+    ALTER INDEX idx_spimex_date RENAME TO idx_spimex_date_heap;
+    ALTER INDEX idx_spimex_product_id RENAME TO idx_spimex_product_id_heap;
+"""
+
+HEAP_MONTHS = """
+    SELECT DISTINCT date_trunc('month', date)::date
+    FROM spimex_trading_results_heap
+    WHERE date IS NOT NULL
+"""
+
+COPY_FROM_HEAP = """
+    INSERT INTO spimex_trading_results (
+        id, exchange_product_id, exchange_product_name, oil_id,
+        delivery_basis_id, delivery_basis_name, delivery_type_id,
+        volume, total, count, date, created_on, updated_on
+    )
+    SELECT
+        id, exchange_product_id, exchange_product_name, oil_id,
+        delivery_basis_id, delivery_basis_name, delivery_type_id,
+        volume, total, count, date, created_on, updated_on
+    FROM spimex_trading_results_heap
+    WHERE date IS NOT NULL;
+
+    SELECT setval(
+        pg_get_serial_sequence('spimex_trading_results', 'id'),
+        COALESCE((SELECT max(id) FROM spimex_trading_results), 1)
+    );
+"""
+
+
+def partition_months(data):
+    """Первые дни месяцев, в которые попадают строки"""
+    return {row[9].replace(day=1) for row in data if row[9] is not None}
+
+
+def create_partition(month):
+    """DDL месячной секции; advisory-блокировка исключает гонку параллельных загрузчиков"""
+    next_month = (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+    name = f"spimex_trading_results_y{month.year}m{month.month:02d}"
+    return f"""
+        SELECT pg_advisory_xact_lock(hashtext('{name}'));
+        CREATE TABLE IF NOT EXISTS {name} PARTITION OF spimex_trading_results
+            FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}');
+    """
+
+
+# Нормализованная схема: справочники инструментов и базисов поставки,
+# таблица фактов с суррогатными ключами и представление прежней формы
+FACTS_TABLE = 'spimex_trading_facts'
+
+FACTS_TABLE_EXISTS = f"SELECT to_regclass('{FACTS_TABLE}') IS NOT NULL"
+
+CREATE_NORMALIZED_SCHEMA = f"""
+    CREATE TABLE IF NOT EXISTS products (
+        id SERIAL PRIMARY KEY,
+        exchange_product_id VARCHAR(20) NOT NULL UNIQUE,
+        exchange_product_name TEXT,
+        oil_id VARCHAR(4),
+        delivery_basis_id VARCHAR(3),
+        delivery_type_id VARCHAR(1)
+    );
+
+    CREATE TABLE IF NOT EXISTS delivery_bases (
+        id SERIAL PRIMARY KEY,
+        delivery_basis_name TEXT NOT NULL UNIQUE
+    );
+
+    CREATE TABLE {FACTS_TABLE} (
+        id SERIAL PRIMARY KEY,
+        product_key INTEGER NOT NULL REFERENCES products (id),
+        delivery_basis_key INTEGER NOT NULL REFERENCES delivery_bases (id),
+        volume NUMERIC(15, 2),
+        total NUMERIC(15, 2),
+        count INTEGER,
+        date DATE NOT NULL,
+        created_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        CONSTRAINT unique_product_key_date UNIQUE (product_key, date)
+    );
+
+    CREATE INDEX idx_spimex_facts_date ON {FACTS_TABLE} (date);
+
+    CREATE VIEW spimex_trading_results AS
+    SELECT
+        f.id, p.exchange_product_id, p.exchange_product_name, p.oil_id,
+        p.delivery_basis_id, b.delivery_basis_name, p.delivery_type_id,
+        f.volume, f.total, f.count, f.date, f.created_on, f.updated_on
+    FROM {FACTS_TABLE} f
+    JOIN products p ON p.id = f.product_key
+    JOIN delivery_bases b ON b.id = f.delivery_basis_key;
+"""
+
+SELECT_PRODUCTS = "SELECT id, exchange_product_id, exchange_product_name FROM products"
+SELECT_DELIVERY_BASES = "SELECT id, delivery_basis_name FROM delivery_bases"
+
+# Справочники пополняются пачкой; DO UPDATE нужен, чтобы RETURNING вернул
+# ключи и уже существующих строк, а у инструмента сохранялось последнее название
+INTERN_PRODUCTS = """
+    INSERT INTO products (
+        exchange_product_id, exchange_product_name, oil_id, delivery_basis_id, delivery_type_id
+    )
+    SELECT * FROM unnest($1::text[], $2::text[], $3::text[], $4::text[], $5::text[])
+    ON CONFLICT (exchange_product_id)
+    DO UPDATE SET exchange_product_name = EXCLUDED.exchange_product_name
+    RETURNING id, exchange_product_id, exchange_product_name
+"""
+
+INTERN_DELIVERY_BASES = """
+    INSERT INTO delivery_bases (delivery_basis_name)
+    SELECT * FROM unnest($1::text[])
+    ON CONFLICT (delivery_basis_name)
+    DO UPDATE SET delivery_basis_name = EXCLUDED.delivery_basis_name
+    RETURNING id, delivery_basis_name
+"""
+
+UPSERT_FACTS = f"""
+    WITH merged AS (
+        INSERT INTO {FACTS_TABLE} AS t (product_key, delivery_basis_key, volume, total, count, date)
+        SELECT DISTINCT ON (product_key, date) *
+        FROM unnest($1::int[], $2::int[], $3::float8[], $4::float8[], $5::int[], $6::date[])
+            AS src (product_key, delivery_basis_key, volume, total, count, date)
+        ORDER BY product_key, date
+        ON CONFLICT (product_key, date)
+        DO UPDATE SET
+            delivery_basis_key = EXCLUDED.delivery_basis_key,
+            volume = EXCLUDED.volume,
+            total = EXCLUDED.total,
+            count = EXCLUDED.count,
+            updated_on = CURRENT_TIMESTAMP
+        WHERE (t.delivery_basis_key, t.volume, t.total, t.count)
+            IS DISTINCT FROM (EXCLUDED.delivery_basis_key, EXCLUDED.volume, EXCLUDED.total, EXCLUDED.count)
+        RETURNING xmax = 0 AS inserted
+    )
+    SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM merged
+"""
+
+COPY_HEAP_TO_NORMALIZED = f"""
+    INSERT INTO delivery_bases (delivery_basis_name)
+    SELECT DISTINCT COALESCE(delivery_basis_name, '') FROM spimex_trading_results_heap
+    ON CONFLICT DO NOTHING;
+
+    INSERT INTO products (
+        exchange_product_id, exchange_product_name, oil_id, delivery_basis_id, delivery_type_id
+    )
+    SELECT DISTINCT ON (exchange_product_id)
+        exchange_product_id, exchange_product_name, oil_id, delivery_basis_id, delivery_type_id
+    FROM spimex_trading_results_heap
+    WHERE exchange_product_id IS NOT NULL
+    ORDER BY exchange_product_id, date DESC
+    ON CONFLICT DO NOTHING;
+
+    INSERT INTO {FACTS_TABLE} (
+        id, product_key, delivery_basis_key, volume, total, count, date, created_on, updated_on
+    )
+    SELECT h.id, p.id, b.id, h.volume, h.total, h.count, h.date, h.created_on, h.updated_on
+    FROM spimex_trading_results_heap h
+    JOIN products p ON p.exchange_product_id = h.exchange_product_id
+    JOIN delivery_bases b ON b.delivery_basis_name = COALESCE(h.delivery_basis_name, '')
+    WHERE h.date IS NOT NULL;
+
+    SELECT setval(
+        pg_get_serial_sequence('{FACTS_TABLE}', 'id'),
+        COALESCE((SELECT max(id) FROM {FACTS_TABLE}), 1)
+    );
+"""
+
+
+# Очередь догрузки истории: диапазоны дат, которые воркеры на разных машинах
+# забирают в аренду и продлевают ее отметкой heartbeat_at
+BACKFILL_TABLE = 'spimex_backfill_items'
+
+CREATE_BACKFILL_TABLE = f"""
+    CREATE TABLE IF NOT EXISTS {BACKFILL_TABLE} (
+        id SERIAL PRIMARY KEY,
+        start_date DATE NOT NULL,
+        end_date DATE NOT NULL,
+        status VARCHAR(10) NOT NULL DEFAULT 'pending',
+        worker_id TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        heartbeat_at TIMESTAMP,
+        finished_at TIMESTAMP,
+        files INTEGER,
+        rows INTEGER,
+        error TEXT,
+        UNIQUE (start_date, end_date)
+    );
+    CREATE INDEX IF NOT EXISTS idx_backfill_status ON {BACKFILL_TABLE} (status, end_date);
+"""
+
+# Повторная постановка того же диапазона ничего не меняет
+ENQUEUE_BACKFILL = f"""
+    INSERT INTO {BACKFILL_TABLE} (start_date, end_date)
+    SELECT * FROM unnest($1::date[], $2::date[])
+    ON CONFLICT (start_date, end_date) DO NOTHING
+"""
+
+# Аренды, не продленные за $1 секунд и исчерпавшие $2 попыток, больше не выдаются
+FAIL_EXPIRED_BACKFILL = f"""
+    UPDATE {BACKFILL_TABLE}
+    SET status = 'failed', worker_id = NULL, error = 'аренда истекла'
+    WHERE status = 'running'
+        AND heartbeat_at < localtimestamp - make_interval(secs => $1)
+        AND attempts >= $2
+"""
+
+# SKIP LOCKED: воркеры не ждут друг друга и не получают один элемент дважды;
+# элемент с истекшей арендой забирается так же, как новый
+CLAIM_BACKFILL = f"""
+    UPDATE {BACKFILL_TABLE} AS i
+    SET status = 'running', worker_id = $1, attempts = i.attempts + 1,
+        heartbeat_at = localtimestamp, error = NULL
+    WHERE i.id = (
+        SELECT id FROM {BACKFILL_TABLE}
+        WHERE status = 'pending'
+            OR (status = 'running' AND heartbeat_at < localtimestamp - make_interval(secs => $2))
+        ORDER BY end_date DESC
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING i.id, i.start_date, i.end_date, i.attempts
+"""
+
+HEARTBEAT_BACKFILL = f"""
+    UPDATE {BACKFILL_TABLE} SET heartbeat_at = localtimestamp
+    WHERE id = $1 AND worker_id = $2 AND status = 'running'
+    RETURNING id
+"""
+
+COMPLETE_BACKFILL = f"""
+    UPDATE {BACKFILL_TABLE}
+    SET status = 'done', finished_at = localtimestamp, files = $3, rows = $4
+    WHERE id = $1 AND worker_id = $2 AND status = 'running'
+"""
+
+# Неудачный элемент возвращается в очередь, пока не исчерпаны $4 попыток
+FAIL_BACKFILL = f"""
+    UPDATE {BACKFILL_TABLE}
+    SET status = CASE WHEN attempts >= $4 THEN 'failed' ELSE 'pending' END,
+        worker_id = NULL, error = $3
+    WHERE id = $1 AND worker_id = $2 AND status = 'running'
+"""
+
+BACKFILL_PROGRESS = f"SELECT status, count(*) FROM {BACKFILL_TABLE} GROUP BY status"
+
+def psycopg_params(query):
+    """Заменяет параметры asyncpg ($1, $2, ...) на параметры psycopg2 (%s)"""
+    return re.sub(r'\$\d+', '%s', query)
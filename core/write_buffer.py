@@ -0,0 +1,87 @@
+import time
+import threading
+
+from config.settings import logger, WRITE_BUFFER_CONFIG
+from core.metrics import metrics
+
+
+class WriteBuffer:
+    """Буфер отложенной записи перед DatabaseManager.
+
+    Объединяет строки нескольких файлов в одну вставку и подтверждает
+    каждый файл через on_durable(file_path, rows) только после фиксации
+    транзакции с его строками.
+    """
+
+    def __init__(self, db, on_durable=None, config=None):
+        self.db = db
+        self.on_durable = on_durable
+        self.config = config or WRITE_BUFFER_CONFIG
+        self.logger = logger.getChild('WriteBuffer')
+        self.stats = {'flushes': 0, 'rows': 0, 'files': 0, 'failed_files': 0}
+        self._rows = []
+        self._files = []
+        self._first_at = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._timer = None
+
+    def start(self):
+        """Запускает поток сброса буфера по времени"""
+        self._timer = threading.Thread(target=self._flush_periodically, name='write-buffer', daemon=True)
+        self._timer.start()
+        return self
+
+    def add(self, file_path, rows):
+        """Добавляет строки файла; при наборе max_rows строк сбрасывает буфер"""
+        with self._lock:
+            if self._first_at is None:
+                self._first_at = time.monotonic()
+            self._rows.extend(rows)
+            self._files.append((file_path, len(rows)))
+            full = len(self._rows) >= self.config['max_rows']
+        if full:
+            self.flush('size')
+
+    def flush(self, reason='manual'):
+        """Записывает накопленные строки одной транзакцией и подтверждает их файлы"""
+        with self._flush_lock:
+            with self._lock:
+                rows, files = self._rows, self._files
+                self._rows, self._files, self._first_at = [], [], None
+            if not files:
+                return
+
+            try:
+                if rows:
+                    self.db.insert_data(rows)
+            except Exception as e:
+                self.logger.error(f"Ошибка записи пачки из {len(files)} файлов ({len(rows)} строк): {e}",
+                                  exc_info=True)
+                self.stats['failed_files'] += len(files)
+                return
+
+            self.stats['flushes'] += 1
+            self.stats['rows'] += len(rows)
+            self.stats['files'] += len(files)
+            metrics.inc('spimex_buffer_flushes_total', reason=reason)
+            self.logger.debug(f"Записана пачка: файлов {len(files)}, строк {len(rows)} ({reason})")
+            if self.on_durable is not None:
+                for file_path, file_rows in files:
+                    self.on_durable(file_path, file_rows)
+
+    def _flush_periodically(self):
+        max_delay = self.config['max_delay']
+        while not self._stopped.wait(max_delay / 4):
+            first_at = self._first_at
+            if first_at is not None and time.monotonic() - first_at >= max_delay:
+                self.flush('timer')
+
+    def close(self):
+        """Останавливает сброс по времени и записывает остаток буфера"""
+        self._stopped.set()
+        if self._timer is not None:
+            self._timer.join()
+        self.flush('close')
+        return dict(self.stats)
@@ -1,53 +1,225 @@
 import time
 import os
+import argparse
+import threading
 
 from core.parser import SpimexParser
-from core.database import DatabaseManager
+from core.database import DatabaseManager, PooledDatabaseManager
 from core.file_processor import FileProcessor
-from config.settings import logger, PARSER_CONFIG
+from core.columnar_cache import ColumnarCache
+from core.manifest import IngestionManifest
+from core.metrics import metrics
+from core.query_cache import QueryCache
+from core.parallel_load import ParallelLoader
+from core.pipeline import Pipeline
+from core.row_converter import RowConverter
+from core.write_buffer import WriteBuffer
+from config.settings import (
+    logger, PARSER_CONFIG, DB_LOAD_CONFIG, PIPELINE_CONFIG, CACHE_CONFIG, WRITE_BUFFER_CONFIG
+)
 
 
-def main():
+def parse_args():
+    parser = argparse.ArgumentParser(description="Загрузка итогов торгов Spimex в PostgreSQL")
+    parser.add_argument('--full-reload', action='store_true',
+                        help="обработать все файлы, игнорируя манифест загрузок")
+    parser.add_argument('--rebuild-from-cache', action='store_true',
+                        help="пересобрать таблицу из колоночного кеша без обращения к Spimex")
+    parser.add_argument('--migrate-to-partitioned', action='store_true',
+                        help="перенести таблицу в секционированную по месяцам (BRIN по дате)")
+    parser.add_argument('--migrate-to-normalized', action='store_true',
+                        help="перенести таблицу в справочники products/delivery_bases и таблицу фактов")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="число процессов загрузки в БД; файлы делятся между ними по датам торгов")
+    return parser.parse_args()
+
+
+def rebuild_from_cache():
+    """Пересобирает spimex_trading_results из колоночного кеша загруженных файлов"""
+    start_time = time.time()
+    logger.info("Пересборка таблицы из колоночного кеша")
+    cache = ColumnarCache()
+    file_processor = FileProcessor(cache=cache)
+    converter = RowConverter(batch_size=DB_LOAD_CONFIG['batch_size'])
+    manifest = IngestionManifest()
+    from_cache = reparsed = 0
+
+    with DatabaseManager() as db:
+        db.create_table()
+
+        # Очистка и загрузка одной транзакцией: при ошибке таблица остается прежней
+        with db.transaction():
+            db.truncate_table()
+
+            for file_name, entry in sorted(manifest.entries.items()):
+                df = cache.get_by_hash(entry['sha256'])
+                if df is not None:
+                    from_cache += 1
+                else:
+                    # Файла нет в кеше: разбираем исходный .xls, если он сохранился
+                    file_path = os.path.join(PARSER_CONFIG['download_dir'], file_name)
+                    df = file_processor.process_file(file_path) if os.path.exists(file_path) else None
+                    if df is None:
+                        logger.warning(f"Файл {file_name} отсутствует и в кеше, и на диске")
+                        continue
+                    reparsed += 1
+
+                for batch in converter.iter_batches(df):
+                    db.insert_data(batch)
+
+    QueryCache().invalidate()
+    logger.info(f"Из кеша: {from_cache}, разобрано заново: {reparsed}")
+    logger.info(f"Строки в БД (вставлено/обновлено/без изменений): {db.changes}")
+    logger.info(f"Время пересборки: {time.time() - start_time}")
+
+
+def migrate_to_partitioned():
+    """Переносит существующую таблицу в секционированную по месяцам"""
+    with DatabaseManager() as db:
+        db.migrate_to_partitioned()
+    logger.info("После проверки старую таблицу можно удалить: DROP TABLE spimex_trading_results_heap")
+
+
+def migrate_to_normalized():
+    """Переносит существующую таблицу в нормализованную схему"""
+    with DatabaseManager() as db:
+        db.migrate_to_normalized()
+    logger.info("Для загрузки в новую схему задайте DB_TABLE_LAYOUT=normalized")
+    logger.info("После проверки старую таблицу можно удалить: DROP TABLE spimex_trading_results_heap")
+
+
+def main(full_reload=False):
     start_time = time.time()
     logger.info("Запуск приложения spimex_parser")
+    metrics.serve()
     try:
-        logger.info("Этап 1/2: Загрузка файлов с Spimex")
-        parser = SpimexParser()
-        parser.run()
+        cache = ColumnarCache() if CACHE_CONFIG['columnar_cache'] else None
+        file_processor = FileProcessor(cache=cache)
+        converter = RowConverter(batch_size=DB_LOAD_CONFIG['batch_size'])
+        manifest = IngestionManifest()
+        query_cache = QueryCache()
+        handled = set()
+        submit_lock = threading.Lock()
+        skipped = 0
+
+        with PooledDatabaseManager() as db:
+            db.create_table()
+
+            def on_durable(file_path, rows):
+                manifest.mark_loaded(file_path, rows)
+                if rows:
+                    query_cache.invalidate()
+
+            # Файл отмечается загруженным только после фиксации пачки с его строками
+            buffer = WriteBuffer(db, on_durable).start() if WRITE_BUFFER_CONFIG['max_rows'] else None
 
-        logger.info("Этап 2/2: Обработка файлов и загрузка в БД")
-        file_processor = FileProcessor()
+            def load(file_path, df):
+                if buffer is not None:
+                    rows = converter.to_rows(df)
+                    buffer.add(file_path, rows)
+                    return len(rows)
+                rows = 0
+                for batch in converter.iter_batches(df):
+                    db.insert_data(batch)
+                    rows += len(batch)
+                on_durable(file_path, rows)
+                return rows
+
+            # Каждый поток загрузки берет свое соединение из пула
+            load_concurrency = min(PIPELINE_CONFIG['load_concurrency'], db.pool_config['max_size'])
+            pipeline = Pipeline(
+                file_processor.process_file, load, config={**PIPELINE_CONFIG, 'load_concurrency': load_concurrency}
+            ).start()
+
+            def submit(file_path):
+                nonlocal skipped
+                with submit_lock:
+                    if file_path in handled:
+                        return
+                    handled.add(file_path)
+                if full_reload or manifest.needs_loading(file_path):
+                    logger.info(f"Обработка файла: {os.path.basename(file_path)}")
+                    pipeline.submit(file_path)
+                else:
+                    with submit_lock:
+                        skipped += 1
+
+            logger.info("Конвейер: загрузка с Spimex -> обработка файлов -> загрузка в БД")
+            parser = SpimexParser(on_file=submit)
+            parser.run()
+            parser.close()
+
+            # Файлы, скачанные ранее и не попавшие в текущий обход
+            for file_name in sorted(os.listdir(PARSER_CONFIG['download_dir'])):
+                file_path = os.path.join(PARSER_CONFIG['download_dir'], file_name)
+                if file_name.endswith('.xls'):
+                    submit(file_path)
+
+            summary = pipeline.join()
+            if buffer is not None:
+                buffer_stats = buffer.close()
+                logger.info(f"Буфер записи: {buffer_stats}")
+                summary['failed'] += buffer_stats['failed_files']
+        manifest.flush()
+
+        logger.info(f"Пропущено ранее загруженных файлов: {skipped}")
+        logger.info(f"Итоги конвейера: {summary}")
+        logger.info(f"Строки в БД (вставлено/обновлено/без изменений): {db.changes}")
+        logger.info(f"Ожидание соединений пула, с: {db.pool_waits.summary()}")
+        logger.info(f"Время выполнения синхронного кода: {time.time() - start_time}")
+    except Exception as e:
+        logger.critical(f"Критическая ошибка в приложении: {e}", exc_info=True)
+        raise
+    finally:
+        metrics.publish()
+
+
+def parallel_main(full_reload=False, workers=2):
+    """Скачивает бюллетени и загружает их в БД пулом процессов, разделив файлы по датам торгов"""
+    start_time = time.time()
+    logger.info(f"Запуск приложения spimex_parser, процессов загрузки: {workers}")
+    metrics.serve()
+    try:
+        manifest = IngestionManifest()
+        files = set()
 
         with DatabaseManager() as db:
             db.create_table()
 
-            for file_name in os.listdir(PARSER_CONFIG['download_dir']):
-                if file_name.endswith('.xls'):
-                    file_path = os.path.join(PARSER_CONFIG['download_dir'], file_name)
-                    logger.info(f"Обработка файла: {file_name}")
-
-                    df = file_processor.process_file(file_path)
-                    if df is not None and not df.empty:
-                        data = [(
-                            row['exchange_product_id'],
-                            row['exchange_product_name'],
-                            row['oil_id'],
-                            row['delivery_basis_id'],
-                            row['delivery_basis_name'],
-                            row['delivery_type_id'],
-                            row['volume'],
-                            row['total'],
-                            row['count'],
-                            row['date']
-                        ) for _, row in df.iterrows()]
-
-                        db.insert_data(data)
+        # Файлы копятся за время обхода и делятся между процессами после него
+        parser = SpimexParser(on_file=files.add)
+        parser.run()
+        parser.close()
+        for file_name in os.listdir(PARSER_CONFIG['download_dir']):
+            if file_name.endswith('.xls'):
+                files.add(os.path.join(PARSER_CONFIG['download_dir'], file_name))
+
+        pending = [file_path for file_path in sorted(files) if full_reload or manifest.needs_loading(file_path)]
+        # Манифест пишет только родительский процесс, после фиксации строк файла
+        summary = ParallelLoader(workers, on_loaded=manifest.mark_loaded).run(pending)
+        manifest.flush()
+        if summary['rows']:
+            QueryCache().invalidate()
 
+        logger.info(f"Пропущено ранее загруженных файлов: {len(files) - len(pending)}")
+        logger.info(f"Итоги загрузки: {summary}")
         logger.info(f"Время выполнения синхронного кода: {time.time() - start_time}")
     except Exception as e:
         logger.critical(f"Критическая ошибка в приложении: {e}", exc_info=True)
         raise
+    finally:
+        metrics.publish()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    if args.migrate_to_partitioned:
+        migrate_to_partitioned()
+    elif args.migrate_to_normalized:
+        migrate_to_normalized()
+    elif args.rebuild_from_cache:
+        rebuild_from_cache()
+    elif args.workers > 1:
+        parallel_main(full_reload=args.full_reload, workers=args.workers)
+    else:
+        main(full_reload=args.full_reload)
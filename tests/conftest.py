@@ -13,4 +13,37 @@ def mock_config():
 @pytest.fixture
 def parser(mock_config):
     from core.parser import SpimexParser
-    return SpimexParser(config=mock_config)
\ No newline at end of file
+    return SpimexParser(config=mock_config)
+
+@pytest.fixture
+def raw_sheet():
+    """Лист бюллетеня в том виде, в каком его возвращает pd.read_excel(header=None)"""
+    import pandas as pd
+    nan = float('nan')
+    rows = [
+        [nan, 'Бюллетень по итогам торгов', nan, nan, nan, nan, nan],
+        [nan, 'Единица измерения: Метрическая тонна', nan, nan, nan, nan, nan],
+        [nan, 'Код\nИнструмента', 'Наименование\nИнструмента', 'Базис\nпоставки',
+         'Обьем\nДоговоров\nв единицах\nизмерения', 'Обьем\nДоговоров,\nруб.',
+         'Количество\nДоговоров,\nшт.'],
+        [nan, 'A100ANK060F', 'Бензин (АИ-100-К5)', 'ст. Ангарск-сорт.', 60, 3900000, 1],
+        [nan, 'A592ACH005A', 'Бензин (АИ-92-К5)', 'ст. Ачинск', 5, 250000, 2],
+        [nan, 'DT00UNA065F', 'ДТ ЕВРО', 'ст. Уфа', '-', '-', '-'],
+        [nan, 'Итого:', nan, nan, 65, 4150000, nan],
+    ]
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture
+def bulletin_xls(tmp_path, raw_sheet):
+    """Файл .xls с содержимым raw_sheet"""
+    xlwt = pytest.importorskip('xlwt')
+    workbook = xlwt.Workbook()
+    sheet = workbook.add_sheet('TRADE_SUMMARY')
+    for i, row in raw_sheet.iterrows():
+        for j, value in enumerate(row):
+            if value == value:
+                sheet.write(i, j, value)
+    file_path = tmp_path / 'oil_xls_20230101162000.xls'
+    workbook.save(str(file_path))
+    return str(file_path)
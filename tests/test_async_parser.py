@@ -0,0 +1,81 @@
+import asyncio
+from datetime import date
+
+import pytest
+
+from async_core.async_parser import AsyncSpimexParser
+
+
+URL = "https://spimex.com/upload/reports/oil_xls/oil_xls_{}162000.xls"
+
+
+@pytest.fixture
+def async_parser(mock_config):
+    mock_config.update(page_concurrency=3, download_concurrency=2, download_queue_size=2)
+    return AsyncSpimexParser(config=mock_config)
+
+
+def listing(pages):
+    """Страницы листинга: по два файла на страницу, от новых к старым"""
+    return {
+        page: [URL.format(day.strftime('%Y%m%d')) for day in days]
+        for page, days in pages.items()
+    }
+
+
+class TestAsyncSpimexParser:
+    def test_crawl_stops_at_start_date(self, async_parser):
+        """Тест проверяет параллельный обход с остановкой на файле старше start_date."""
+        async_parser.config['start_date'] = date(2023, 1, 3)
+        links = listing({
+            1: [date(2023, 1, 6), date(2023, 1, 5)],
+            2: [date(2023, 1, 4), date(2023, 1, 3)],
+            3: [date(2023, 1, 2), date(2023, 1, 1)],
+            4: [date(2022, 12, 31), date(2022, 12, 30)],
+        })
+        fetched, downloaded = [], []
+        active = {'now': 0, 'max': 0}
+
+        async def fake_fetch_links(page_url):
+            page = int(page_url.rsplit('-', 1)[1])
+            fetched.append(page)
+            # Первая страница отвечает последней
+            await asyncio.sleep(0.05 if page == 1 else 0)
+            return links[page]
+
+        async def fake_download(url):
+            active['now'] += 1
+            active['max'] = max(active['max'], active['now'])
+            await asyncio.sleep(0.01)
+            downloaded.append(url)
+            active['now'] -= 1
+            return True
+
+        async_parser._fetch_links = fake_fetch_links
+        async_parser.download_file = fake_download
+        asyncio.run(async_parser._crawl(total_pages=4))
+
+        assert sorted(downloaded) == sorted(links[1] + links[2])
+        assert 4 not in fetched
+        assert active['max'] <= 2
+        assert async_parser._should_stop is True
+
+    def test_find_first_page(self, async_parser):
+        """Тест проверяет бинарный поиск первой страницы и фильтр по end_date."""
+        async_parser.config['end_date'] = date(2023, 1, 4)
+        links = listing({
+            1: [date(2023, 1, 8), date(2023, 1, 7)],
+            2: [date(2023, 1, 6), date(2023, 1, 5)],
+            3: [date(2023, 1, 4), date(2023, 1, 3)],
+            4: [date(2023, 1, 2), date(2023, 1, 1)],
+        })
+        fetched = []
+
+        async def fake_fetch_links(page_url):
+            page = int(page_url.rsplit('-', 1)[1])
+            fetched.append(page)
+            return links[page]
+
+        async_parser._fetch_links = fake_fetch_links
+        assert asyncio.run(async_parser.find_first_page(4)) == 3
+        assert 4 not in fetched
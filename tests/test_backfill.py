@@ -0,0 +1,69 @@
+import asyncio
+from datetime import date
+from unittest.mock import AsyncMock
+import pytest
+
+from async_core.async_backfill import AsyncBackfillQueue, LeaseLost, split_date_range
+
+
+CONFIG = {'item_days': 30, 'heartbeat_interval': 0.01, 'lease_timeout': 1, 'max_attempts': 3, 'worker_id': 'w1'}
+
+
+def test_split_date_range_newest_first():
+    """Тест проверяет деление диапазона на элементы без пропусков и пересечений."""
+    ranges = split_date_range(date(2024, 1, 1), date(2024, 3, 5), 30)
+
+    assert ranges == [
+        (date(2024, 2, 5), date(2024, 3, 5)),
+        (date(2024, 1, 6), date(2024, 2, 4)),
+        (date(2024, 1, 1), date(2024, 1, 5)),
+    ]
+
+
+class TestAsyncBackfillQueue:
+    def _queue(self, items, running=0):
+        queue = AsyncBackfillQueue(db=None, config=CONFIG)
+        queue.claim = AsyncMock(side_effect=items + [None])
+        queue.progress = AsyncMock(return_value={'running': running} if running else {'done': len(items)})
+        queue.heartbeat = AsyncMock(return_value=True)
+        queue.complete = AsyncMock()
+        queue.fail = AsyncMock()
+        return queue
+
+    def test_run_completes_and_requeues_items(self):
+        """Тест проверяет завершение элементов и возврат неудачного в очередь."""
+        items = [
+            {'id': 1, 'start_date': date(2024, 2, 1), 'end_date': date(2024, 2, 29), 'attempts': 1},
+            {'id': 2, 'start_date': date(2024, 1, 1), 'end_date': date(2024, 1, 31), 'attempts': 1},
+        ]
+        queue = self._queue(items)
+
+        async def process(start_date, end_date):
+            await asyncio.sleep(0.03)
+            if start_date.month == 1:
+                raise RuntimeError("файл не скачан")
+            return {'loaded': 20, 'rows': 4000}
+
+        stats = asyncio.run(queue.run(process))
+
+        assert stats == {'done': 1, 'failed': 1, 'lost': 0}
+        queue.complete.assert_awaited_once_with(1, 20, 4000)
+        assert queue.fail.await_args.args[0] == 2
+        assert queue.heartbeat.await_count >= 2
+
+    def test_lost_lease_cancels_work(self):
+        """Тест проверяет отмену работы, если аренду забрал другой воркер."""
+        queue = self._queue([])
+        queue.heartbeat.return_value = False
+        cancelled = []
+
+        async def work():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        with pytest.raises(LeaseLost):
+            asyncio.run(queue.hold({'id': 7}, work()))
+        assert cancelled == [True]
@@ -0,0 +1,36 @@
+from datetime import date
+
+import pytest
+
+pytest.importorskip('xlwt')
+
+from benchmarks.bulletins import write_bulletin, bulletin_rows, file_name  # noqa: E402
+from benchmarks.fake_exchange import FakeExchange  # noqa: E402
+from core.file_processor import FileProcessor  # noqa: E402
+from core.parser import SpimexParser  # noqa: E402
+
+
+class TestBenchmarkFixtures:
+    def test_generated_bulletin_is_parsed(self, tmp_path):
+        """Тест проверяет, что синтетический бюллетень читается обоими способами."""
+        trade_date = date(2025, 3, 14)
+        path = str(tmp_path / file_name(trade_date))
+        write_bulletin(path, trade_date, rows=50)
+        traded = sum(1 for row in bulletin_rows(trade_date, 50) if row[3] != '-')
+
+        for reader in ('pandas', 'xlrd'):
+            df = FileProcessor(config={'reader': reader}).process_file(path)
+            products = df[df['exchange_product_id'] != 'Итого:']
+            assert len(products) == traded
+            assert (products['date'] == trade_date).all()
+
+    def test_parser_crawls_fake_exchange(self, tmp_path):
+        """Тест проверяет обход всех страниц локального сервера синхронным парсером."""
+        downloaded = []
+        with FakeExchange(days=12, rows=5, per_page=5) as exchange:
+            parser = SpimexParser(config=exchange.parser_config(str(tmp_path)), on_file=downloaded.append)
+            parser.run()
+            parser.close()
+
+        assert exchange.total_pages == 3
+        assert sorted(downloaded) == sorted(str(tmp_path / name) for name in exchange.files)
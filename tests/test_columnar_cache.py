@@ -0,0 +1,39 @@
+from datetime import date
+from unittest.mock import patch
+
+import pytest
+
+from core.file_processor import FileProcessor
+from core.row_converter import RowConverter
+
+pytest.importorskip('pyarrow')
+
+from core.columnar_cache import ColumnarCache  # noqa: E402
+
+
+class TestColumnarCache:
+    def test_process_file_uses_cache(self, bulletin_xls, tmp_path):
+        """Тест проверяет запись бюллетеня в Parquet и повторное чтение без разбора .xls."""
+        cache = ColumnarCache(str(tmp_path / 'columnar'))
+        processor = FileProcessor(config={'reader': 'pandas'}, cache=cache)
+
+        parsed = processor.process_file(bulletin_xls)
+        with patch.object(processor, '_read_pandas') as mock_read:
+            cached = processor.process_file(bulletin_xls)
+            mock_read.assert_not_called()
+
+        assert list(RowConverter().iter_batches(cached)) == list(RowConverter().iter_batches(parsed))
+        assert cached['date'].iloc[0] == date(2023, 1, 1)
+        assert str(cached['volume'].dtype) == 'float64'
+
+    def test_changed_file_misses_cache(self, bulletin_xls, tmp_path):
+        """Тест проверяет, что ключом кеша служит содержимое файла."""
+        cache = ColumnarCache(str(tmp_path / 'columnar'))
+        FileProcessor(cache=cache).process_file(bulletin_xls)
+        _, digest = cache.get(bulletin_xls)
+
+        with open(bulletin_xls, 'ab') as f:
+            f.write(b'\0')
+
+        assert cache.get(bulletin_xls)[0] is None
+        assert cache.get_by_hash(digest) is not None
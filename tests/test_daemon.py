@@ -0,0 +1,70 @@
+import asyncio
+import json
+import socket
+from datetime import date, datetime, timedelta, timezone
+from urllib.error import HTTPError
+from urllib.request import urlopen
+import pytest
+
+from async_core.async_daemon import AsyncIngestDaemon, next_poll_at
+from core.metrics import MetricsRegistry
+
+
+CONFIG = {'publish_time': '16:15', 'utc_offset_hours': 3, 'poll_interval': 20,
+          'poll_window': 7200, 'idle_interval': 3600, 'max_failures': 2}
+MSK = timezone(timedelta(hours=3))
+
+
+def test_next_poll_follows_publication_schedule():
+    """Тест проверяет частые проверки только в окне после публикации."""
+    morning = datetime(2025, 3, 4, 15, 40, tzinfo=MSK)
+    assert next_poll_at(morning, date(2025, 3, 3), CONFIG) == datetime(2025, 3, 4, 16, 15, tzinfo=MSK)
+
+    window = datetime(2025, 3, 4, 16, 30, tzinfo=MSK)
+    assert next_poll_at(window, date(2025, 3, 3), CONFIG) == window + timedelta(seconds=20)
+    assert next_poll_at(window, date(2025, 3, 4), CONFIG) == window + timedelta(hours=1)
+
+    night = datetime(2025, 3, 4, 23, 50, tzinfo=MSK)
+    assert next_poll_at(night, date(2025, 3, 3), CONFIG) == night + timedelta(hours=1)
+
+
+class TestAsyncIngestDaemon:
+    def test_stops_gracefully_and_reports_failures(self):
+        """Тест проверяет остановку после текущей проверки и состояние службы."""
+        calls = []
+
+        async def poll():
+            calls.append(True)
+            if len(calls) < 3:
+                raise RuntimeError("spimex.com недоступен")
+            daemon.stop()
+            return date(2025, 3, 4)
+
+        daemon = AsyncIngestDaemon(poll, config={**CONFIG, 'poll_interval': 0, 'idle_interval': 0})
+        asyncio.run(daemon.run())
+
+        assert len(calls) == 3
+        assert daemon.state['status'] == 'stopped'
+        assert daemon.state['failures'] == 0 and daemon.state['last_trade_date'] == date(2025, 3, 4)
+
+    def test_health_endpoint(self):
+        """Тест проверяет ответ /health: 503 после нескольких неудачных проверок подряд."""
+        daemon = AsyncIngestDaemon(None, config=CONFIG)
+        daemon.state.update(status='running', failures=2)
+        registry = MetricsRegistry()
+        registry.health_check = daemon.health
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+
+        registry.serve(port=port)
+        try:
+            with pytest.raises(HTTPError) as error:
+                urlopen(f"http://127.0.0.1:{port}/health")
+            assert error.value.code == 503
+            assert json.loads(error.value.read())['status'] == 'degraded'
+
+            daemon.state['failures'] = 0
+            assert json.loads(urlopen(f"http://127.0.0.1:{port}/health").read())['status'] == 'ok'
+        finally:
+            registry.shutdown()
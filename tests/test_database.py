@@ -0,0 +1,302 @@
+import threading
+from datetime import date
+from unittest.mock import Mock, patch
+import pytest
+
+from core.database import DatabaseManager, PooledDatabaseManager
+from core.sql import STAGING_TABLE, MERGE_FROM_STAGING, create_partition
+
+
+ROWS = [
+    ('A100ANK060F', 'Бензин', 'A100', 'ANK', 'Ангарск', 'F', 60.0, 3900000.0, 1, date(2023, 1, 1)),
+    ('A592ACH005A', 'Бензин "Аи", "92"', 'A592', 'ACH', '', 'A', 5.5, 250000.0, 2, date(2023, 1, 1)),
+]
+
+
+class TestDatabaseManager:
+    def _manager(self, insert_mode, statement_cache_size=0):
+        db = DatabaseManager(config={}, load_config={'insert_mode': insert_mode},
+                             pool_config={'statement_cache_size': statement_cache_size})
+        db.connection = Mock()
+        db.cursor = Mock()
+        db.cursor.fetchone.return_value = (1, 0)
+        return db
+
+    def test_insert_data_copy_mode(self):
+        """Тест проверяет загрузку через COPY во временную таблицу и merge."""
+        db = self._manager('copy')
+        db.insert_data(ROWS)
+
+        sql, buffer = db.cursor.copy_expert.call_args[0]
+        assert sql.startswith(f"COPY {STAGING_TABLE} (exchange_product_id,")
+        lines = buffer.getvalue().splitlines()
+        assert len(lines) == 2
+        assert lines[1].startswith('"A592ACH005A","Бензин ""Аи"", ""92""",')
+        db.cursor.execute.assert_called_with(MERGE_FROM_STAGING)
+        db.cursor.executemany.assert_not_called()
+        db.connection.commit.assert_called_once()
+
+    def test_insert_data_copy_mode_rollback(self):
+        """Тест проверяет откат транзакции при ошибке COPY."""
+        db = self._manager('copy')
+        db.cursor.copy_expert.side_effect = RuntimeError("copy failed")
+
+        with pytest.raises(RuntimeError):
+            db.insert_data(ROWS)
+        db.connection.rollback.assert_called_once()
+        db.connection.commit.assert_not_called()
+
+    def test_insert_data_executemany_mode(self):
+        """Тест проверяет построчный upsert по умолчанию."""
+        db = self._manager('executemany')
+        db.insert_data(ROWS)
+
+        db.cursor.executemany.assert_called_once()
+        assert db.cursor.executemany.call_args[0][1] == ROWS
+        db.cursor.copy_expert.assert_not_called()
+
+    def test_insert_data_reports_changes(self):
+        """Тест проверяет сводку вставленных, обновленных и неизменных строк."""
+        db = self._manager('executemany')
+        db.cursor.fetchone.return_value = (0, 1)
+
+        assert db.insert_data(ROWS) == {'inserted': 0, 'updated': 1, 'unchanged': 1}
+        sql = db.cursor.executemany.call_args[0][0]
+        assert 'IS DISTINCT FROM' in sql and '%s' in sql and '$1' not in sql
+        db.insert_data(ROWS + ROWS[:1])
+        assert db.changes == {'inserted': 0, 'updated': 2, 'unchanged': 2}
+
+    def test_later_file_wins_duplicate_keys(self):
+        """Тест проверяет, что из повторов ключа в пачке загружается последняя строка."""
+        db = self._manager('copy')
+        republished = ROWS[0][:6] + (70.0, 4550000.0, 2, ROWS[0][9])
+        db.insert_data(ROWS + [republished])
+
+        lines = db.cursor.copy_expert.call_args[0][1].getvalue().splitlines()
+        assert len(lines) == 2
+        assert lines[0].startswith('"A100ANK060F",') and ',70.0,4550000.0,2,' in lines[0]
+
+    def test_executemany_prepares_upsert_once(self):
+        """Тест проверяет подготовку upsert на соединении один раз."""
+        db = self._manager('executemany', statement_cache_size=100)
+        db.insert_data(ROWS)
+        db.insert_data(ROWS)
+
+        prepares = [c for c in db.cursor.execute.call_args_list if c[0][0].lstrip().startswith('PREPARE')]
+        assert len(prepares) == 1
+        assert db.cursor.executemany.call_args[0][0].startswith('EXECUTE spimex_upsert_row (%s,')
+
+    def test_partitioned_layout_creates_each_month_once(self):
+        """Тест проверяет, что месячная секция создается один раз на месяц."""
+        db = DatabaseManager(config={}, load_config={'insert_mode': 'executemany'},
+                             schema_config={'layout': 'partitioned'})
+        db.connection = Mock()
+        db.cursor = Mock()
+        db.cursor.fetchone.return_value = (0, 0)
+        rows = ROWS + [ROWS[0][:9] + (date(2023, 2, 15),)]
+
+        db.insert_data(rows)
+        db.insert_data(rows)
+
+        ddl = [c[0][0] for c in db.cursor.execute.call_args_list if 'PARTITION OF' in c[0][0]]
+        assert len(ddl) == 2
+        assert "spimex_trading_results_y2023m01 PARTITION OF" in ddl[0]
+        assert "FROM ('2023-02-01') TO ('2023-03-01')" in ddl[1]
+
+    def test_partitioned_layout_rejects_heap_table(self):
+        """Тест проверяет ошибку с подсказкой миграции, если таблица существует, но не секционирована."""
+        db = DatabaseManager(config={}, schema_config={'layout': 'partitioned'})
+        db.connection = Mock()
+        db.cursor = Mock()
+        db.cursor.fetchone.side_effect = [(True,), (False,)]
+
+        with pytest.raises(RuntimeError, match='--migrate-to-partitioned'):
+            db.create_table()
+
+        db.cursor.fetchone.side_effect = [(True,), (True,)]
+        db.create_table()
+        assert not any('CREATE TABLE' in c[0][0] for c in db.cursor.execute.call_args_list)
+
+    def test_failed_partition_is_rolled_back(self):
+        """Тест проверяет откат транзакции и повторную попытку после ошибки создания секции."""
+        db = DatabaseManager(config={}, schema_config={'layout': 'partitioned'})
+        db.connection = Mock()
+        db.cursor = Mock()
+        db.cursor.execute.side_effect = RuntimeError("lock timeout")
+
+        with pytest.raises(RuntimeError):
+            db.ensure_partitions(ROWS)
+        db.connection.rollback.assert_called_once()
+        assert not db._partitions
+
+    def test_transaction_commits_rebuild_once(self):
+        """Тест проверяет, что очистка и загрузка пачек внутри transaction() фиксируются вместе."""
+        db = self._manager('copy')
+        with db.transaction():
+            db.truncate_table()
+            db.insert_data(ROWS)
+            db.insert_data(ROWS)
+        db.connection.commit.assert_called_once()
+
+    def test_transaction_with_prepared_upsert_commits_once(self):
+        """Тест проверяет, что подготовка upsert не фиксирует очистку таблицы внутри transaction()."""
+        db = self._manager('executemany', statement_cache_size=100)
+        db.cursor.executemany.side_effect = [None, RuntimeError("deadlock")]
+        with pytest.raises(RuntimeError):
+            with db.transaction():
+                db.truncate_table()
+                db.insert_data(ROWS)
+                db.insert_data(ROWS)
+
+        assert any(c[0][0].lstrip().startswith('PREPARE') for c in db.cursor.execute.call_args_list)
+        db.connection.commit.assert_not_called()
+        db.connection.rollback.assert_called()
+
+    def test_transaction_rolls_back_truncate_on_failure(self):
+        """Тест проверяет откат очистки таблицы при ошибке загрузки."""
+        db = self._manager('copy')
+        db.cursor.copy_expert.side_effect = RuntimeError("COPY failed")
+        with pytest.raises(RuntimeError):
+            with db.transaction():
+                db.truncate_table()
+                db.insert_data(ROWS)
+        db.connection.commit.assert_not_called()
+        db.connection.rollback.assert_called()
+
+    def test_statement_timeout_keeps_preset_options(self):
+        """Тест проверяет, что таймаут запросов дописывается к заданным options."""
+        db = DatabaseManager(config={'dbname': 'spimex', 'options': '-c search_path=scratch'},
+                             pool_config={'command_timeout': 1.5})
+        assert db._connect_params() == {
+            'dbname': 'spimex', 'options': '-c search_path=scratch -c statement_timeout=1500'}
+
+        db = DatabaseManager(config={'dbname': 'spimex'}, pool_config={'command_timeout': 1.5})
+        assert db._connect_params()['options'] == '-c statement_timeout=1500'
+
+
+def test_create_partition_rolls_over_year():
+    """Тест проверяет границы декабрьской секции."""
+    ddl = create_partition(date(2023, 12, 1))
+    assert "spimex_trading_results_y2023m12" in ddl
+    assert "FROM ('2023-12-01') TO ('2024-01-01')" in ddl
+
+
+class TestPooledDatabaseManager:
+    def test_threads_use_own_connections(self):
+        """Тест проверяет, что параллельные загрузки берут разные соединения из пула."""
+        db = PooledDatabaseManager(config={}, load_config={'insert_mode': 'copy'},
+                                   pool_config={'min_size': 1, 'max_size': 2, 'max_inactive_lifetime': 0,
+                                                'statement_cache_size': 0, 'command_timeout': 0})
+        db.pool = Mock()
+        barrier = threading.Barrier(2)
+        connections = []
+
+        def getconn():
+            connection = Mock()
+            connection.cursor.return_value.fetchone.return_value = (1, 0)
+            connection.cursor.return_value.copy_expert.side_effect = lambda *args: barrier.wait(timeout=5)
+            connections.append(connection)
+            return connection
+        db.pool.getconn.side_effect = getconn
+
+        threads = [threading.Thread(target=db.insert_data, args=(ROWS,)) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(connections) == 2
+        for connection in connections:
+            connection.commit.assert_called_once()
+        assert db.pool.putconn.call_count == 2
+        assert db.pool_waits.count == 2
+        assert db.changes == {'inserted': 2, 'updated': 0, 'unchanged': 2}
+        assert db.connection is None
+
+    def test_pool_keeps_connections_and_forgets_closed(self):
+        """Тест проверяет, что пул держит max_size соединений и не копит учет закрытых."""
+        db = PooledDatabaseManager(config={}, load_config={'insert_mode': 'copy'},
+                                   pool_config={'min_size': 1, 'max_size': 3, 'max_inactive_lifetime': 0,
+                                                'statement_cache_size': 0, 'command_timeout': 0})
+        with patch('core.database.ThreadedConnectionPool') as pool_class:
+            db.connect()
+        assert pool_class.call_args[0][:2] == (3, 3)
+
+        open_connection, broken_connection = Mock(closed=0), Mock(closed=0)
+        for connection in (open_connection, broken_connection):
+            connection.cursor.return_value.fetchone.return_value = (1, 0)
+        db.pool.getconn.side_effect = [open_connection, broken_connection]
+        db.pool.putconn.side_effect = lambda connection: setattr(connection, 'closed', 2) \
+            if connection is broken_connection else None
+        db._prepared_connections.add(broken_connection)
+
+        db.insert_data(ROWS)
+        db.insert_data(ROWS)
+        assert list(db._idle_since) == [open_connection]
+        assert broken_connection not in db._prepared_connections
+
+    def test_transaction_pins_one_connection(self):
+        """Тест проверяет, что transaction() выполняет очистку и пачки на одном соединении пула."""
+        db = PooledDatabaseManager(config={}, load_config={'insert_mode': 'copy'},
+                                   pool_config={'min_size': 1, 'max_size': 2, 'max_inactive_lifetime': 0,
+                                                'statement_cache_size': 0, 'command_timeout': 0})
+        db.pool = Mock()
+        connection = Mock(closed=0)
+        connection.cursor.return_value.fetchone.return_value = (1, 0)
+        db.pool.getconn.return_value = connection
+
+        with db.transaction():
+            db.truncate_table()
+            db.insert_data(ROWS)
+            db.insert_data(ROWS)
+
+        db.pool.getconn.assert_called_once()
+        db.pool.putconn.assert_called_once_with(connection)
+        connection.commit.assert_called_once()
+        assert not db._in_transaction
+
+
+class TestNormalizedLayout:
+    def _manager(self):
+        db = DatabaseManager(config={}, load_config={'insert_mode': 'copy'},
+                             schema_config={'layout': 'normalized'})
+        db.connection = Mock()
+        db.cursor = Mock()
+        db.cursor.fetchone.return_value = (1, 0)
+        return db
+
+    def test_interns_only_new_strings(self):
+        """Тест проверяет пополнение справочников только новыми значениями."""
+        db = self._manager()
+        db.dimensions.load([(1, 'A100ANK060F', 'Бензин')], [(7, 'Ангарск')])
+        db.cursor.fetchall.side_effect = [[(2, 'A592ACH005A', 'Бензин "Аи", "92"')], [(8, '')]]
+
+        db.insert_data(ROWS)
+
+        (products_sql, products), (bases_sql, bases), (facts_sql, facts) = [
+            c[0] for c in db.cursor.execute.call_args_list]
+        assert 'INSERT INTO products' in products_sql and '$1' not in products_sql
+        assert products[0] == ['A592ACH005A']
+        assert bases == ([''],)
+        assert 'INSERT INTO spimex_trading_facts' in facts_sql
+        assert facts[:2] == [[1, 2], [7, 8]]
+        assert facts[5] == [date(2023, 1, 1), date(2023, 1, 1)]
+        db.connection.commit.assert_called_once()
+
+        db.cursor.execute.reset_mock()
+        db.insert_data(ROWS)
+        assert len(db.cursor.execute.call_args_list) == 1
+
+    def test_failed_load_keeps_uncommitted_keys_out_of_cache(self):
+        """Тест проверяет, что ключи из откаченной транзакции не попадают в кеш."""
+        db = self._manager()
+        db.dimensions.load([], [])
+        db.cursor.fetchall.side_effect = [[(2, 'A100ANK060F', 'Бензин'), (3, 'A592ACH005A', 'Бензин')],
+                                          [(7, 'Ангарск'), (8, '')]]
+        db.cursor.execute.side_effect = [None, None, RuntimeError("deadlock")]
+
+        with pytest.raises(RuntimeError):
+            db.insert_data(ROWS)
+        db.connection.rollback.assert_called_once()
+        assert db.dimensions.loaded
+        assert not db.dimensions.products and not db.dimensions.bases
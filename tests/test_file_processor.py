@@ -0,0 +1,66 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from async_core.async_file_processor import AsyncFileProcessor, _parse_file
+from core.file_processor import FileProcessor
+
+
+FILE_PATH = '/tmp/downloads/oil_xls_20230101162000.xls'
+
+
+class TestAsyncFileProcessor:
+    def test_parse_file_returns_arrays(self, raw_sheet):
+        """Тест проверяет, что воркер возвращает типизированные массивы вместо DataFrame."""
+        with patch('async_core.async_file_processor.pd.read_excel', return_value=raw_sheet):
+            arrays, trade_date = _parse_file(FILE_PATH)
+
+        assert trade_date == date(2023, 1, 1)
+        assert arrays['exchange_product_id'].dtype.kind == 'U'
+        assert arrays['volume'].dtype == np.float64
+        assert arrays['count'].dtype == np.int64
+        assert list(arrays['exchange_product_id']) == ['A100ANK060F', 'A592ACH005A']
+        assert list(arrays['oil_id']) == ['A100', 'A592']
+
+    def test_process_modes_match(self, raw_sheet):
+        """Тест проверяет, что режимы 'thread' и 'process' дают одинаковый результат."""
+        thread_processor = AsyncFileProcessor(config={'parse_mode': 'thread'})
+        process_processor = AsyncFileProcessor(config={'parse_mode': 'process'})
+        process_processor._executor = ThreadPoolExecutor(max_workers=1)
+
+        with patch('async_core.async_file_processor.pd.read_excel', return_value=raw_sheet):
+            expected = asyncio.run(thread_processor.process_file(FILE_PATH))
+            actual = asyncio.run(process_processor.process_file(FILE_PATH))
+        process_processor.close()
+
+        assert len(actual) == len(expected) == 2
+        for col in actual.columns:
+            assert list(actual[col]) == list(expected[col])
+
+
+class TestFileProcessor:
+    def test_xlrd_reader_matches_pandas(self, bulletin_xls):
+        """Тест проверяет, что быстрый xlrd-ридер дает тот же результат, что и pandas."""
+        expected = FileProcessor(config={'reader': 'pandas'}).process_file(bulletin_xls)
+        actual = FileProcessor(config={'reader': 'xlrd'}).process_file(bulletin_xls)
+
+        assert list(actual['exchange_product_id']) == ['A100ANK060F', 'A592ACH005A']
+        assert actual['volume'].dtype == 'float64'
+        columns = list(actual.columns)
+        pd.testing.assert_frame_equal(
+            actual, expected[columns].reset_index(drop=True), check_dtype=False)
+
+    def test_xlrd_reader_missing_marker(self, tmp_path):
+        """Тест проверяет, что файл без маркера не обрабатывается."""
+        xlwt = pytest.importorskip('xlwt')
+        workbook = xlwt.Workbook()
+        workbook.add_sheet('TRADE_SUMMARY').write(0, 0, 'Пустой бюллетень')
+        file_path = str(tmp_path / 'oil_xls_20230101162000.xls')
+        workbook.save(file_path)
+
+        assert FileProcessor(config={'reader': 'xlrd'}).process_file(file_path) is None
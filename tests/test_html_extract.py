@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+from core.html_extract import extract_file_links, extract_total_pages
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+@pytest.fixture
+def listing_page():
+    with open(os.path.join(FIXTURES_DIR, 'listing_page.html'), encoding='utf-8') as f:
+        return f.read()
+
+
+class TestHtmlExtract:
+    def test_fast_links_match_bs4(self, listing_page):
+        """Тест проверяет, что быстрый разбор дает тот же список ссылок, что и BeautifulSoup."""
+        expected = extract_file_links(listing_page, engine='bs4')
+
+        assert extract_file_links(listing_page, engine='fast') == expected
+        assert len(expected) == 12
+        assert "https://spimex.com/upload/reports/oil_xls/oil_xls_20990101162000.xls" not in expected
+        assert "https://spimex.com/upload/reports/oil_xls/oil_xls_20000101162000.xls" not in expected
+        assert expected[-1] == "https://spimex.com/upload/reports/oil_xls/oil_xls_20250226162000.xls"
+
+    def test_fast_total_pages_match_bs4(self, listing_page):
+        """Тест проверяет, что число страниц совпадает для обоих движков."""
+        assert extract_total_pages(listing_page, engine='fast') == 392
+        assert extract_total_pages(listing_page, engine='bs4') == 392
+
+    @pytest.mark.parametrize('engine', ['fast', 'bs4'])
+    def test_page_without_links(self, engine):
+        """Тест проверяет страницы без ссылок и без пагинации."""
+        html = "<html><body>No pagination here</body></html>"
+        assert extract_file_links(html, engine) == []
+        assert extract_total_pages(html, engine) is None
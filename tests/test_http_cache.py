@@ -0,0 +1,41 @@
+from unittest.mock import Mock, patch
+
+from core.http_cache import HttpCache
+
+
+PAGE = '<a href="/upload/reports/oil_xls/oil_xls_20230101162000.xls">File</a>'
+LINKS = ["https://spimex.com/upload/reports/oil_xls/oil_xls_20230101162000.xls"]
+
+
+class TestHttpCache:
+    @patch('core.parser.requests.Session.get')
+    def test_parse_page_uses_validators(self, mock_get, parser, tmp_path):
+        """Тест проверяет условные запросы и пропуск разбора неизменившихся страниц."""
+        parser.http_cache = HttpCache(str(tmp_path / '.http_cache.json'))
+        mock_get.return_value = Mock(status_code=200, text=PAGE, headers={'ETag': '"v1"'})
+
+        assert parser.parse_page("https://example.com/?page=page-2") == LINKS
+        assert mock_get.call_args.kwargs['headers'] == {}
+
+        mock_get.return_value = Mock(status_code=304, text='', headers={})
+        with patch.object(parser, '_extract_links') as mock_extract:
+            assert parser.parse_page("https://example.com/?page=page-2") == LINKS
+            assert mock_get.call_args.kwargs['headers'] == {'If-None-Match': '"v1"'}
+
+            mock_get.return_value = Mock(status_code=200, text=PAGE, headers={})
+            assert parser.parse_page("https://example.com/?page=page-2") == LINKS
+            mock_extract.assert_not_called()
+
+        assert parser.http_cache.stats == {'not_modified': 1, 'same_body': 1, 'misses': 1}
+
+    def test_report_persists_cache(self, tmp_path):
+        """Тест проверяет сохранение кеша между запусками."""
+        path = str(tmp_path / '.http_cache.json')
+        cache = HttpCache(path)
+        cache.store('links:https://example.com', {'Last-Modified': 'Sun, 01 Jan 2023 00:00:00 GMT'}, PAGE, LINKS)
+        cache.report()
+
+        restored = HttpCache(path)
+        assert restored.request_headers('links:https://example.com') == {
+            'If-Modified-Since': 'Sun, 01 Jan 2023 00:00:00 GMT'}
+        assert restored.lookup('links:https://example.com', PAGE) == (True, LINKS)
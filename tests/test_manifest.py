@@ -0,0 +1,50 @@
+import os
+
+from core.manifest import IngestionManifest
+
+
+class TestIngestionManifest:
+    def test_needs_loading(self, tmp_path):
+        """Тест проверяет пропуск загруженных файлов и повторную загрузку измененных."""
+        file_path = tmp_path / 'oil_xls_20230101162000.xls'
+        file_path.write_bytes(b'bulletin v1')
+        manifest_path = str(tmp_path / '.manifest.json')
+
+        manifest = IngestionManifest(manifest_path)
+        assert manifest.needs_loading(str(file_path)) is True
+
+        manifest.mark_loaded(str(file_path), 42)
+        manifest.flush()
+        entry = IngestionManifest(manifest_path).entries['oil_xls_20230101162000.xls']
+        assert entry['trade_date'] == '2023-01-01'
+        assert entry['row_count'] == 42
+        assert IngestionManifest(manifest_path).needs_loading(str(file_path)) is False
+
+        # Тот же контент с новым mtime не требует загрузки
+        os.utime(file_path, (1, 1))
+        assert manifest.needs_loading(str(file_path)) is False
+        assert manifest.entries['oil_xls_20230101162000.xls']['mtime'] == 1
+
+        file_path.write_bytes(b'bulletin v2')
+        os.utime(file_path, (2, 2))
+        assert manifest.needs_loading(str(file_path)) is True
+
+    def test_corrupted_manifest(self, tmp_path):
+        """Тест проверяет, что поврежденный манифест не ломает запуск."""
+        manifest_path = tmp_path / '.manifest.json'
+        manifest_path.write_text('{not json')
+
+        assert IngestionManifest(str(manifest_path)).entries == {}
+
+    def test_saves_are_batched(self, tmp_path):
+        """Тест проверяет, что манифест не перезаписывается после каждого файла."""
+        manifest_path = tmp_path / '.manifest.json'
+        manifest = IngestionManifest(str(manifest_path), save_interval=60)
+        for i in range(3):
+            file_path = tmp_path / f'oil_xls_2023010{i + 1}162000.xls'
+            file_path.write_bytes(b'bulletin')
+            manifest.mark_loaded(str(file_path), 1)
+        assert not manifest_path.exists()
+
+        manifest.flush()
+        assert len(IngestionManifest(str(manifest_path)).entries) == 3
@@ -0,0 +1,68 @@
+import json
+import socket
+from urllib.request import urlopen
+
+import pandas as pd
+from datetime import date
+
+from core.metrics import MetricsRegistry, metrics
+from core.row_converter import RowConverter
+
+
+class TestMetricsRegistry:
+    def test_snapshot_and_prometheus_text(self, tmp_path):
+        """Тест проверяет JSON-отчет и текстовый формат Prometheus."""
+        registry = MetricsRegistry()
+        registry.inc('spimex_pages_fetched_total', parser='sync')
+        registry.inc('spimex_pages_fetched_total', 2, parser='sync')
+        registry.set_gauge('spimex_queue_depth', 3, pipeline='sync', queue='parse')
+        for value in (0.02, 0.2, 3):
+            registry.observe('spimex_parse_seconds', value, processor='sync')
+
+        registry.write_report(str(tmp_path / 'report.json'))
+        report = json.loads((tmp_path / 'report.json').read_text(encoding='utf-8'))
+        assert report['counters']['spimex_pages_fetched_total'] == [
+            {'labels': {'parser': 'sync'}, 'value': 3}]
+        histogram = report['histograms']['spimex_parse_seconds'][0]['value']
+        assert histogram['count'] == 3
+        assert histogram['p50'] == 0.25
+        assert histogram['max'] == 3
+
+        text = registry.to_prometheus()
+        assert '# TYPE spimex_parse_seconds histogram' in text
+        assert 'spimex_parse_seconds_bucket{processor="sync",le="0.025"} 1' in text
+        assert 'spimex_parse_seconds_bucket{processor="sync",le="+Inf"} 3' in text
+        assert 'spimex_queue_depth{pipeline="sync",queue="parse"} 3' in text
+
+    def test_http_endpoint(self):
+        """Тест проверяет отдачу метрик по HTTP."""
+        registry = MetricsRegistry()
+        registry.inc('spimex_files_downloaded_total', parser='async')
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+
+        registry.serve(port=port)
+        try:
+            body = urlopen(f"http://127.0.0.1:{port}/metrics").read().decode('utf-8')
+        finally:
+            registry.shutdown()
+        assert 'spimex_files_downloaded_total{parser="async"} 1' in body
+
+    def test_row_converter_counts_rejected_rows(self):
+        """Тест проверяет учет отбракованных строк."""
+        metrics.reset()
+        df = pd.DataFrame({
+            'exchange_product_id': ['A100ANK060F', 'Итого:'],
+            'exchange_product_name': ['Бензин', ''],
+            'oil_id': ['A100', 'Итог'],
+            'delivery_basis_id': ['ANK', 'о:'],
+            'delivery_basis_name': ['Ангарск', ''],
+            'delivery_type_id': ['F', ':'],
+            'volume': [60.0, None],
+            'total': [3900000.0, None],
+            'count': [1, 3],
+            'date': [date(2023, 1, 1), date(2023, 1, 1)],
+        })
+        list(RowConverter().iter_batches(df))
+        assert metrics.snapshot()['counters']['spimex_rows_rejected_total'][0]['value'] == 1
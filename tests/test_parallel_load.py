@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from core import parallel_load
+from core.parallel_load import ParallelLoader, shard_by_date
+
+
+FILES = [
+    'downloads/oil_xls_20250303162000.xls',
+    'downloads/oil_xls_20250304162000.xls',
+    'downloads/oil_xls_20250305162000.xls',
+    'downloads/oil_xls_20250303180000.xls',
+]
+
+
+class TestParallelLoad:
+    def test_shard_by_date_keeps_each_date_in_one_shard(self):
+        """Тест проверяет детерминированное деление файлов по датам торгов."""
+        shards = shard_by_date(reversed(FILES), 2)
+
+        assert shards == [
+            ['downloads/oil_xls_20250303162000.xls', 'downloads/oil_xls_20250303180000.xls',
+             'downloads/oil_xls_20250305162000.xls'],
+            ['downloads/oil_xls_20250304162000.xls'],
+        ]
+        assert shard_by_date(FILES, 2) == shards
+
+    def test_run_merges_shard_results_in_order(self, monkeypatch):
+        """Тест проверяет общий итог шардов и подтверждение только загруженных файлов."""
+        def load_shard(file_paths):
+            if '20250304' in file_paths[0]:
+                raise RuntimeError("connection lost")
+            return {
+                'loaded': [(file_path, 10) for file_path in file_paths[1:]],
+                'failed': 1,
+                'changes': {'inserted': 15, 'updated': 5, 'unchanged': 0},
+            }
+
+        monkeypatch.setattr(parallel_load, 'ProcessPoolExecutor', ThreadPoolExecutor)
+        monkeypatch.setattr(parallel_load, 'load_shard', load_shard)
+        acked = []
+
+        summary = ParallelLoader(3, on_loaded=lambda file_path, rows: acked.append(file_path)).run(FILES)
+
+        assert acked == ['downloads/oil_xls_20250303180000.xls']
+        assert summary == {
+            'submitted': 4, 'loaded': 1, 'failed': 3, 'rows': 10,
+            'changes': {'inserted': 30, 'updated': 10, 'unchanged': 0},
+        }
@@ -1,6 +1,7 @@
 from datetime import date, datetime
 from unittest.mock import patch, mock_open, Mock
 import pytest
+import requests
 
 
 class TestSpimexParser:
@@ -16,7 +17,7 @@ class TestSpimexParser:
             parser._ensure_date("2023-01-01")
 
 
-    @patch('core.parser.requests.get')
+    @patch('core.parser.requests.Session.get')
     def test_get_total_pages(self, mock_get, parser):
         """Тест проверяет определение общего количества страниц пагинации."""
         mock_response = Mock()
@@ -47,20 +48,23 @@ class TestSpimexParser:
         assert parser.parse_date_from_filename("invalid") is None
 
 
-    @patch('core.parser.requests.get')
+    @patch('core.parser.requests.Session.get')
     @patch('core.parser.os.path.exists')
     def test_download_file(self, mock_exists, mock_get, parser):
         """Тест проверяет загрузку файла по URL."""
         mock_exists.return_value = False
         mock_response = Mock()
-        mock_response.content = b"test content"
+        mock_response.iter_content.return_value = [b"test content"]
         mock_get.return_value = mock_response
 
         url = "https://example.com/oil_xls_20230101.xls"
 
-        with patch('builtins.open', mock_open()) as mock_file:
+        with patch('builtins.open', mock_open()) as mock_file, \
+                patch('core.parser.os.replace') as mock_replace:
             assert parser.download_file(url) is True
             mock_file().write.assert_called_with(b"test content")
+            mock_replace.assert_called_once_with(
+                "/tmp/downloads/oil_xls_20230101.xls.part", "/tmp/downloads/oil_xls_20230101.xls")
 
         mock_exists.return_value = True
         assert parser.download_file(url) is True
@@ -69,7 +73,7 @@ class TestSpimexParser:
         assert parser.download_file(url) is False
 
 
-    @patch('core.parser.requests.get')
+    @patch('core.parser.requests.Session.get')
     def test_parse_page(self, mock_get, parser):
         """Тест проверяет парсинг ссылок на файлы с веб-страницы."""
         mock_response = Mock()
@@ -116,4 +120,109 @@ class TestSpimexParser:
         ]
 
         assert parser.run() is False
-        assert mock_parse.call_count == 4
\ No newline at end of file
+        assert mock_parse.call_count == 4
+
+    def test_find_first_page(self, parser):
+        """Тест проверяет бинарный поиск первой страницы по end_date."""
+        start = date(2023, 12, 31).toordinal()
+        pages = {
+            page: [
+                f"https://spimex.com/upload/reports/oil_xls/oil_xls_"
+                f"{date.fromordinal(start - (page - 1) * 10 - i).strftime('%Y%m%d')}162000.xls"
+                for i in range(10)
+            ]
+            for page in range(1, 101)
+        }
+        requested = []
+
+        def fake_parse_page(page_url):
+            page = int(page_url.rsplit('-', 1)[1])
+            requested.append(page)
+            return pages[page]
+
+        parser.config['end_date'] = date(2023, 3, 15)
+        with patch.object(parser, 'parse_page', side_effect=fake_parse_page):
+            first_page = parser.find_first_page(100)
+
+        assert parser.parse_date_from_filename(pages[first_page][-1]) <= date(2023, 3, 15)
+        assert parser.parse_date_from_filename(pages[first_page - 1][-1]) > date(2023, 3, 15)
+        assert len(requested) <= 8
+
+        parser.config['end_date'] = date(2024, 1, 1)
+        parser._page_links = {}
+        with patch.object(parser, 'parse_page', side_effect=fake_parse_page):
+            assert parser.find_first_page(100) == 1
+
+    def test_failed_page_fetch_is_not_cached(self, parser):
+        """Тест проверяет, что неудачная загрузка страницы листинга не кешируется."""
+        links = ["https://spimex.com/upload/reports/oil_xls/oil_xls_20231229162000.xls"]
+        parser._page_links = {}
+        with patch.object(parser, 'parse_page', side_effect=[[], links]) as mock_parse:
+            assert parser._get_page_links(1) == []
+            assert parser._get_page_links(1) == links
+            assert parser._get_page_links(1) == links
+        assert mock_parse.call_count == 2
+
+    @patch('core.parser.requests.Session.get')
+    def test_download_file_resume(self, mock_get, parser, tmp_path):
+        """Тест проверяет докачку прерванного файла через Range и атомарное переименование."""
+        parser.config['download_dir'] = str(tmp_path)
+        (tmp_path / "oil_xls_20230101.xls.part").write_bytes(b"first ")
+        mock_response = Mock(status_code=206)
+        mock_response.iter_content.return_value = [b"second"]
+        mock_get.return_value = mock_response
+
+        assert parser.download_file("https://example.com/oil_xls_20230101.xls") is True
+
+        assert mock_get.call_args.kwargs['headers'] == {'Range': 'bytes=6-'}
+        assert (tmp_path / "oil_xls_20230101.xls").read_bytes() == b"first second"
+        assert not (tmp_path / "oil_xls_20230101.xls.part").exists()
+
+
+    @patch('core.parser.requests.Session.get')
+    def test_download_file_interrupted(self, mock_get, parser, tmp_path):
+        """Тест проверяет, что оборванная загрузка не оставляет файл под итоговым именем."""
+        parser.config['download_dir'] = str(tmp_path)
+
+        def broken_stream(chunk_size):
+            yield b"partial"
+            raise requests.exceptions.ConnectionError("connection reset")
+
+        mock_response = Mock(status_code=200)
+        mock_response.iter_content.side_effect = broken_stream
+        mock_get.return_value = mock_response
+
+        assert parser.download_file("https://example.com/oil_xls_20230101.xls") is True
+
+        assert not (tmp_path / "oil_xls_20230101.xls").exists()
+        assert (tmp_path / "oil_xls_20230101.xls.part").read_bytes() == b"partial"
+
+
+    def test_session_pool(self, parser):
+        """Тест проверяет, что запросы идут через сессию с пулом соединений."""
+        adapter = parser.session.get_adapter("https://spimex.com")
+        assert adapter._pool_maxsize == 10
+
+
+    @patch('core.parser.SpimexParser.get_total_pages')
+    @patch('core.parser.SpimexParser.parse_page')
+    def test_run_threaded_downloads(self, mock_parse, mock_pages, parser):
+        """Тест проверяет параллельную загрузку файлов пулом потоков."""
+        parser.config['download_workers'] = 3
+        parser.config['start_date'] = date(2023, 1, 2)
+        mock_pages.return_value = 3
+        url = "https://spimex.com/upload/reports/oil_xls/oil_xls_{}162000.xls"
+        mock_parse.side_effect = [
+            [url.format('20230105'), url.format('20230104')],
+            [url.format('20230103'), url.format('20230102'), url.format('20230101')],
+            [url.format('20221230')],
+        ]
+        downloaded = []
+
+        with patch.object(parser, '_stream_to_file', side_effect=lambda u, f: downloaded.append(u) or True), \
+                patch('core.parser.os.replace'), patch('core.parser.os.path.exists', return_value=False):
+            assert parser.run() is False
+
+        assert sorted(downloaded) == sorted([
+            url.format('20230105'), url.format('20230104'), url.format('20230103'), url.format('20230102')])
+        assert mock_parse.call_count == 2
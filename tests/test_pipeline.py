@@ -0,0 +1,89 @@
+import asyncio
+import threading
+
+from async_core.async_pipeline import AsyncPipeline
+from core.pipeline import Pipeline
+
+
+CONFIG = {'parse_concurrency': 2, 'load_concurrency': 1, 'queue_size': 1}
+
+
+class TestPipeline:
+    def test_files_flow_through_stages(self):
+        """Тест проверяет, что файл попадает в БД, не дожидаясь остальных файлов."""
+        first_loaded = threading.Event()
+        loaded = []
+
+        def process(file_path):
+            return None if file_path == 'broken.xls' else file_path.upper()
+
+        def load(file_path, result):
+            loaded.append(result)
+            first_loaded.set()
+            return 10
+
+        pipeline = Pipeline(process, load, config=CONFIG).start()
+        pipeline.submit('a.xls')
+        assert first_loaded.wait(timeout=5)
+
+        for file_path in ('b.xls', 'broken.xls', 'a.xls'):
+            pipeline.submit(file_path)
+        summary = pipeline.join()
+
+        assert sorted(loaded) == ['A.XLS', 'B.XLS']
+        assert summary == {'submitted': 3, 'parsed': 2, 'loaded': 2, 'failed': 1, 'rows': 20}
+
+
+class TestAsyncPipeline:
+    def test_files_flow_through_stages(self):
+        """Тест проверяет этапы асинхронного конвейера и ограничение параллельности."""
+        active = {'now': 0, 'max': 0}
+        loaded = []
+
+        async def process(file_path):
+            active['now'] += 1
+            active['max'] = max(active['max'], active['now'])
+            await asyncio.sleep(0.01)
+            active['now'] -= 1
+            return file_path
+
+        async def load(file_path, result):
+            if file_path == 'db_error.xls':
+                raise RuntimeError("connection lost")
+            loaded.append(result)
+            return 5
+
+        async def run():
+            pipeline = AsyncPipeline(process, load, config=CONFIG).start()
+            for i in range(6):
+                await pipeline.submit(f"{i}.xls")
+            await pipeline.submit('db_error.xls')
+            return await pipeline.join()
+
+        summary = asyncio.run(run())
+
+        assert len(loaded) == 6
+        assert active['max'] == 2
+        assert summary == {'submitted': 7, 'parsed': 7, 'loaded': 6, 'failed': 1, 'rows': 30}
+
+    def test_cancel_stops_workers(self):
+        """Тест проверяет, что отмененный конвейер не продолжает загрузку в фоне."""
+        loaded = []
+
+        async def process(file_path):
+            return file_path
+
+        async def load(file_path, result):
+            await asyncio.sleep(10)
+            loaded.append(result)
+
+        async def run():
+            pipeline = AsyncPipeline(process, load, config=CONFIG).start()
+            await pipeline.submit('a.xls')
+            await asyncio.sleep(0.01)
+            await pipeline.cancel()
+            return [*pipeline._parse_tasks, *pipeline._load_tasks]
+
+        tasks = asyncio.run(run())
+        assert all(task.done() for task in tasks)
+        assert loaded == []
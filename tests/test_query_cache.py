@@ -0,0 +1,149 @@
+import asyncio
+from datetime import date
+from unittest.mock import patch
+
+from core.query_cache import MemoryCacheBackend, RedisCacheBackend, QueryCache
+from async_core.async_trading_results import AsyncTradingResults
+
+
+class FakeRedis:
+    """Минимальная замена клиента Redis: get, set(ex=...) и incr"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+
+class FakeConnection:
+    def __init__(self, rows, calls):
+        self.rows = rows
+        self.calls = calls
+
+    async def fetch(self, query, *args):
+        self.calls.append((query, args))
+        await asyncio.sleep(0.01)
+        return self.rows
+
+
+class FakePool:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def acquire(self):
+        pool = self
+
+        class Acquire:
+            async def __aenter__(self):
+                return FakeConnection(pool.rows, pool.calls)
+
+            async def __aexit__(self, *exc):
+                return False
+        return Acquire()
+
+
+class FakeDb:
+    def __init__(self, rows):
+        self.pool = FakePool(rows)
+
+    def acquire(self):
+        return self.pool.acquire()
+
+
+class TestQueryCache:
+    def test_memory_backend_evicts_least_recently_used(self):
+        """Тест проверяет вытеснение давно не использованных записей."""
+        backend = MemoryCacheBackend(max_entries=2)
+        backend.set('a', 1, 60)
+        backend.set('b', 2, 60)
+        backend.get('a')
+        backend.set('c', 3, 60)
+
+        assert backend.get('a') == (True, 1)
+        assert backend.get('b') == (False, None)
+        assert len(backend) == 2
+
+    def test_memory_backend_expires_entries(self):
+        """Тест проверяет истечение записей по TTL."""
+        backend = MemoryCacheBackend()
+        with patch('core.query_cache.time.monotonic', return_value=100.0):
+            backend.set('a', 1, 5)
+        with patch('core.query_cache.time.monotonic', return_value=106.0):
+            assert backend.get('a') == (False, None)
+
+    def test_memory_backend_sees_invalidation_from_other_instance(self, tmp_path):
+        """Тест проверяет сброс кеша в памяти через общий файл-маркер поколения."""
+        generation_path = str(tmp_path / 'generation')
+        reader = MemoryCacheBackend(generation_path=generation_path)
+        reader.set('key', 1, 60)
+        assert reader.get('key') == (True, 1)
+
+        QueryCache(MemoryCacheBackend(generation_path=generation_path)).invalidate()
+        assert reader.get('key') == (False, None)
+
+        reader.set('key', 2, 60)
+        assert reader.get('key') == (True, 2)
+
+    def test_redis_backend_invalidation_changes_generation(self):
+        """Тест проверяет сброс Redis-кеша сменой поколения ключей."""
+        backend = RedisCacheBackend(FakeRedis())
+        backend.set('key', [date(2023, 1, 1)], 60)
+        assert backend.get('key') == (True, [date(2023, 1, 1)])
+
+        backend.invalidate()
+        assert backend.get('key') == (False, None)
+
+
+class TestAsyncTradingResults:
+    def test_results_are_cached_until_invalidated(self):
+        """Тест проверяет read-through кеш и его сброс после загрузки."""
+        db = FakeDb([{'date': date(2023, 1, 2)}, {'date': date(2023, 1, 1)}])
+        api = AsyncTradingResults(db, QueryCache(MemoryCacheBackend(), config={'ttl': 60}))
+
+        async def run():
+            first = await api.get_last_trading_dates(2)
+            second = await api.get_last_trading_dates(2)
+            api.invalidate()
+            third = await api.get_last_trading_dates(2)
+            return first, second, third
+
+        first, second, third = asyncio.run(run())
+        assert first == second == third == [date(2023, 1, 2), date(2023, 1, 1)]
+        assert len(db.pool.calls) == 2
+
+    def test_concurrent_requests_share_one_query(self):
+        """Тест проверяет, что одинаковые одновременные запросы выполняются один раз."""
+        db = FakeDb([{'oil_id': 'A592'}])
+        api = AsyncTradingResults(db, QueryCache(MemoryCacheBackend(), config={'ttl': 60}))
+
+        async def run():
+            return await asyncio.gather(*[
+                api.get_trading_results({'oil_id': 'A592'}) for _ in range(5)
+            ])
+
+        results = asyncio.run(run())
+        assert all(result == [{'oil_id': 'A592'}] for result in results)
+        assert len(db.pool.calls) == 1
+        query, args = db.pool.calls[0]
+        assert "oil_id = $1" in query
+        assert args == ('A592',)
+
+    def test_dynamics_without_dates_is_not_limited(self):
+        """Тест проверяет, что пустые даты периода не ограничивают выборку."""
+        db = FakeDb([{'oil_id': 'A592'}])
+        api = AsyncTradingResults(db, QueryCache(MemoryCacheBackend(), config={'ttl': 60}))
+
+        assert asyncio.run(api.get_dynamics(oil_id='A592')) == [{'oil_id': 'A592'}]
+        query, args = db.pool.calls[0]
+        assert "$1::date IS NULL OR date >= $1" in query
+        assert "$2::date IS NULL OR date <= $2" in query
+        assert args == (None, None, 'A592', None, None)
@@ -0,0 +1,130 @@
+import asyncio
+from unittest.mock import Mock, patch
+
+import pytest
+import requests
+
+from async_core.async_request_controller import AsyncRequestController
+from core.request_controller import RequestController, parse_retry_after
+
+
+CONFIG = {
+    'max_retries': 2,
+    'backoff_base': 0.5,
+    'backoff_max': 30,
+    'initial_concurrency': 2,
+    'min_concurrency': 1,
+    'max_concurrency': 4,
+    'latency_factor': 2.0,
+    'decrease_factor': 0.5
+}
+
+
+class TestRequestController:
+    def test_parse_retry_after(self):
+        """Тест проверяет разбор Retry-After в секундах и в виде HTTP-даты."""
+        assert parse_retry_after('7') == 7.0
+        assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+        assert parse_retry_after(None) is None
+        assert parse_retry_after('soon') is None
+
+    @patch('core.request_controller.time.sleep')
+    def test_retries_honor_retry_after(self, mock_sleep):
+        """Тест проверяет повтор при 429/503 с учетом Retry-After."""
+        send = Mock(side_effect=[
+            Mock(status_code=429, headers={'Retry-After': '3'}),
+            Mock(status_code=503, headers={}),
+            Mock(status_code=200, headers={}),
+        ])
+        controller = RequestController(CONFIG)
+
+        response = controller.request(send, "https://spimex.com", timeout=10)
+
+        assert response.status_code == 200
+        assert send.call_count == 3
+        assert mock_sleep.call_args_list[0].args == (3.0,)
+        assert 0 <= mock_sleep.call_args_list[1].args[0] <= 1.0
+        send.assert_called_with("https://spimex.com", timeout=10)
+
+    @patch('core.request_controller.time.sleep')
+    def test_network_errors_exhaust_retries(self, mock_sleep):
+        """Тест проверяет, что после исчерпания повторов сетевая ошибка пробрасывается."""
+        send = Mock(side_effect=requests.exceptions.ConnectionError("reset"))
+        controller = RequestController(CONFIG)
+
+        with pytest.raises(requests.exceptions.ConnectionError):
+            controller.request(send, "https://spimex.com")
+        assert send.call_count == 3
+        assert controller.limiter.limit == 1
+
+    def test_aimd_limit(self):
+        """Тест проверяет рост лимита на быстрых ответах и снижение при росте задержки."""
+        controller = RequestController(CONFIG)
+        limiter = controller.limiter
+
+        for _ in range(20):
+            limiter.on_success(0.1)
+        assert limiter.limit == 4
+
+        limiter.on_success(1.0)
+        assert limiter.limit == 2
+
+
+class TestAsyncRequestController:
+    def test_retries_and_releases(self):
+        """Тест проверяет повторы и освобождение ответов в асинхронном контроллере."""
+        responses = [
+            Mock(status=502, headers={'Retry-After': '0'}),
+            Mock(status=200, headers={}),
+        ]
+        session = Mock()
+
+        async def fake_request(method, url, **kwargs):
+            return responses.pop(0)
+
+        session.request = fake_request
+        controller = AsyncRequestController(CONFIG)
+
+        async def run():
+            async with controller.request(session, 'GET', "https://spimex.com") as response:
+                return response
+
+        response = asyncio.run(run())
+
+        assert response.status == 200
+        response.release.assert_called_once()
+        assert controller._active == 0
+
+    def test_slot_held_until_body_is_read(self):
+        """Тест проверяет, что слот лимита занят, пока читается тело ответа."""
+        session = Mock()
+
+        async def fake_request(method, url, **kwargs):
+            return Mock(status=200, headers={})
+
+        session.request = fake_request
+        controller = AsyncRequestController(CONFIG)
+
+        async def run():
+            async with controller.request(session, 'GET', "https://spimex.com"):
+                return controller._active
+
+        assert asyncio.run(run()) == 1
+        assert controller._active == 0
+
+
+def test_stream_response_holds_slot_until_close():
+    """Тест проверяет, что потоковый ответ занимает слот до close()."""
+    response = Mock(status_code=200, headers={})
+    controller = RequestController(CONFIG)
+
+    streamed = controller.request(Mock(return_value=response), "https://spimex.com/a.xls", stream=True)
+    assert controller._active == 1 and streamed.status_code == 200
+
+    streamed.close()
+    streamed.close()
+    response.close.assert_called_once()
+    assert controller._active == 0
+
+    controller.request(Mock(return_value=response), "https://spimex.com")
+    assert controller._active == 0
@@ -0,0 +1,50 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from core.row_converter import RowConverter
+
+
+def make_df():
+    return pd.DataFrame({
+        'exchange_product_id': ['A100ANK060F', 'A592ACH005A', None, 'DT00UNA065F'],
+        'exchange_product_name': ['Бензин', np.nan, 'Без кода', 'ДТ'],
+        'oil_id': ['A100', 'A592', None, 'DT00'],
+        'delivery_basis_id': ['ANK', 'ACH', None, 'UNA'],
+        'delivery_basis_name': ['Ангарск', 'Ачинск', 'Нет', 'Уфа'],
+        'delivery_type_id': ['F', 'A', None, 'F'],
+        'volume': [60, '5.5', 1, '-'],
+        'total': [3900000.0, 250000, 1, 100],
+        'count': [1.0, 2, 1, 3],
+        'date': date(2023, 1, 1),
+    })
+
+
+class TestRowConverter:
+    def test_iter_batches_casts_and_rejects(self):
+        """Тест проверяет приведение типов и отбраковку некорректных строк."""
+        batches = list(RowConverter().iter_batches(make_df()))
+
+        assert batches == [[
+            ('A100ANK060F', 'Бензин', 'A100', 'ANK', 'Ангарск', 'F', 60.0, 3900000.0, 1, date(2023, 1, 1)),
+            ('A592ACH005A', '', 'A592', 'ACH', 'Ачинск', 'A', 5.5, 250000.0, 2, date(2023, 1, 1)),
+        ]]
+        row = batches[0][0]
+        assert type(row[6]) is float and type(row[8]) is int
+
+    def test_to_columns_returns_rejected(self):
+        """Тест проверяет, что отбракованные строки возвращаются отдельно."""
+        columns, rejected = RowConverter().to_columns(make_df())
+
+        assert len(columns) == 10
+        assert len(columns[0]) == 2
+        assert list(rejected['exchange_product_name']) == ['Без кода', 'ДТ']
+
+    def test_iter_batches_batch_size(self):
+        """Тест проверяет разбиение строк на пачки."""
+        df = pd.concat([make_df().iloc[:2]] * 3, ignore_index=True)
+        batches = list(RowConverter(batch_size=4).iter_batches(df))
+
+        assert [len(batch) for batch in batches] == [4, 2]
+        assert list(RowConverter().iter_batches(df.iloc[:0])) == []
@@ -0,0 +1,112 @@
+import asyncio
+from unittest.mock import AsyncMock, Mock
+
+from async_core.async_write_buffer import AsyncWriteBuffer
+from core.write_buffer import WriteBuffer
+
+
+CONFIG = {'max_rows': 5, 'max_delay': 60}
+
+
+class TestWriteBuffer:
+    def test_coalesces_files_into_one_insert(self):
+        """Тест проверяет объединение строк нескольких файлов в одну вставку."""
+        db = Mock()
+        acked = []
+        buffer = WriteBuffer(db, lambda file_path, rows: acked.append((file_path, rows)), config=CONFIG)
+
+        buffer.add('a.xls', [1, 2])
+        buffer.add('b.xls', [3])
+        assert not db.insert_data.called and not acked
+        buffer.add('c.xls', [4, 5])
+
+        db.insert_data.assert_called_once_with([1, 2, 3, 4, 5])
+        assert acked == [('a.xls', 2), ('b.xls', 1), ('c.xls', 2)]
+
+        buffer.add('d.xls', [6])
+        assert buffer.close() == {'flushes': 2, 'rows': 6, 'files': 4, 'failed_files': 0}
+        assert acked[-1] == ('d.xls', 1)
+
+    def test_failed_batch_is_not_acknowledged(self):
+        """Тест проверяет, что файлы неудачной пачки не отмечаются загруженными."""
+        db = Mock()
+        db.insert_data.side_effect = RuntimeError("connection lost")
+        acked = []
+        buffer = WriteBuffer(db, lambda file_path, rows: acked.append(file_path), config=CONFIG)
+
+        buffer.add('a.xls', [1, 2, 3, 4, 5])
+
+        assert acked == []
+        assert buffer.close()['failed_files'] == 1
+
+    def test_flushes_by_delay(self):
+        """Тест проверяет сброс неполной пачки по времени."""
+        db = Mock()
+        buffer = WriteBuffer(db, config={'max_rows': 100, 'max_delay': 0.05}).start()
+        buffer.add('a.xls', [1])
+
+        for _ in range(100):
+            if db.insert_data.called:
+                break
+            buffer._stopped.wait(0.01)
+        buffer.close()
+        db.insert_data.assert_called_once_with([1])
+
+
+class TestAsyncWriteBuffer:
+    def test_coalesces_files_and_acks_after_commit(self):
+        """Тест проверяет асинхронный буфер: пачка по размеру и остаток при закрытии."""
+        db = Mock()
+        db.insert_data = AsyncMock(side_effect=[None, RuntimeError("connection lost")])
+        acked = []
+
+        async def run():
+            buffer = AsyncWriteBuffer(db, lambda file_path, rows: acked.append(file_path), config=CONFIG).start()
+            await buffer.add('a.xls', [1, 2, 3])
+            await buffer.add('b.xls', [4, 5])
+            await buffer.add('c.xls', [6])
+            return await buffer.close()
+
+        stats = asyncio.run(run())
+
+        assert db.insert_data.await_args_list[0].args == ([1, 2, 3, 4, 5],)
+        assert acked == ['a.xls', 'b.xls']
+        assert stats == {'flushes': 1, 'rows': 5, 'files': 2, 'failed_files': 1}
+
+    def test_close_waits_for_timer_flush(self):
+        """Тест проверяет, что закрытие не теряет пачку, которую пишет сброс по времени."""
+        written = []
+
+        class SlowDb:
+            async def insert_data(self, rows):
+                await asyncio.sleep(0.3)
+                written.extend(rows)
+
+        acked = []
+
+        async def run():
+            buffer = AsyncWriteBuffer(SlowDb(), lambda file_path, rows: acked.append(file_path),
+                                      config={'max_rows': 100, 'max_delay': 0.2}).start()
+            await buffer.add('a.xls', [1, 2])
+            await asyncio.sleep(0.3)
+            return await buffer.close()
+
+        stats = asyncio.run(run())
+
+        assert written == [1, 2] and acked == ['a.xls']
+        assert stats == {'flushes': 1, 'rows': 2, 'files': 1, 'failed_files': 0}
+
+    def test_abort_drops_rows_without_ack(self):
+        """Тест проверяет, что прерванный буфер ничего не пишет и не подтверждает."""
+        db = Mock()
+        db.insert_data = AsyncMock()
+        acked = []
+
+        async def run():
+            buffer = AsyncWriteBuffer(db, lambda file_path, rows: acked.append(file_path), config=CONFIG).start()
+            await buffer.add('a.xls', [1, 2])
+            await buffer.abort()
+
+        asyncio.run(run())
+        db.insert_data.assert_not_awaited()
+        assert acked == []